@@ -0,0 +1,280 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Scaling benchmark suite.
+
+Generates synthetic scenes of increasing size, then times scene setup
+(BufferUtils.init and Scene.warmup), every preset, every transition,
+the exact and table-lookup HLS to RGB8 conversions and
+Networking.write_buffer against each of them.  Results are written as JSON
+with sorted keys, so runs from different versions can be diffed directly.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import traceback
+
+import numpy as np
+
+from core.mixer import Mixer
+from core.networking import Networking
+from lib.buffer_utils import BufferUtils
+from lib.color_lut import HlsToRgbTable
+from lib.colors import hls_to_rgb
+from lib.clock import monotonic
+from lib.frame_stats import FrameStats
+from lib.plugin_loader import PluginLoader
+from lib.preset_loader import PresetLoader
+from lib.scene import Scene
+from lib.settings import Settings
+from lib.synthetic_scene import TOPOLOGIES, generate_scene
+from render_offline import NullOutput
+
+log = logging.getLogger("firemix.benchmark")
+
+
+class BenchmarkApp:
+    """
+    Minimal stand-in for FireMixApp that can switch between scenes.
+    """
+    playlist_changed = None
+
+    def __init__(self, args):
+        self._running = True
+        self.args = args
+        self.settings = Settings()
+        self.plugins = PluginLoader()
+        self.playlist = None
+        self.scene = None
+        self.mixer = None
+        self.net = NullOutput()
+        BufferUtils.set_app(self)
+
+        # Send to a local socket that nobody reads, so write_buffer pays the
+        # full cost of the sends without needing a receiver.
+        self._sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sink.bind(("127.0.0.1", 0))
+        port = self._sink.getsockname()[1]
+        self.settings.data['networking'] = {'clients': [
+            {"host": "127.0.0.1", "port": port, "enabled": True, "color-mode": "RGB8", "protocol": "Legacy"},
+            {"host": "127.0.0.1", "port": port, "enabled": True, "color-mode": "RGB8", "protocol": "OPC"}]}
+        self.networking = Networking(self)
+
+    def load_scene(self, filepath):
+        self.scene = Scene(self, filepath)
+
+    def create_mixer(self):
+        self.mixer = Mixer(self)
+
+
+def timed(fn, *args):
+    start = monotonic()
+    fn(*args)
+    return (monotonic() - start) * 1000.0
+
+
+def bench_presets(app, preset_classes, frames):
+    results = {}
+    dt = 1.0 / app.mixer.get_tick_rate()
+    for name in sorted(preset_classes):
+        stats = FrameStats(frames)
+        try:
+            preset = preset_classes[name](app.mixer, name=name)
+            preset._reset()
+            preset.parameter_changed(None)
+            buffer = BufferUtils.create_buffer()
+            for i in xrange(frames):
+                start = monotonic()
+                preset.tick(dt)
+                preset.draw_to_buffer(buffer)
+                stats.record("frame", monotonic() - start)
+            results[name] = stats.stage_stats("frame")
+        except Exception as e:
+            log.debug(traceback.format_exc())
+            results[name] = {"error": "%s: %s" % (e.__class__.__name__, e)}
+    return results
+
+
+def bench_transitions(app, transition_classes, frames):
+    results = {}
+    size = BufferUtils.get_buffer_size()
+    rng = np.random.RandomState(0)
+    start_frame = rng.rand(size, 3).astype(np.float32)
+    end_frame = rng.rand(size, 3).astype(np.float32)
+    start_scratch = np.empty_like(start_frame)
+    end_scratch = np.empty_like(end_frame)
+
+    for cls in transition_classes:
+        name = str(cls(None))
+        stats = FrameStats(frames)
+        try:
+            transition = cls(app)
+            transition.setup()
+            transition.reset()
+            for i in xrange(frames):
+                # Some transitions modify their inputs, so give each frame fresh copies.
+                start_scratch[:] = start_frame
+                end_scratch[:] = end_frame
+                progress = float(i) / max(1, frames - 1)
+                start = monotonic()
+                transition.get(start_scratch, end_scratch, progress)
+                stats.record("frame", monotonic() - start)
+            results[name] = stats.stage_stats("frame")
+        except Exception as e:
+            log.debug(traceback.format_exc())
+            results[name] = {"error": "%s: %s" % (e.__class__.__name__, e)}
+    return results
+
+
+def bench_color_conversion(table, frames):
+    stats = FrameStats(frames)
+    buffer = np.random.RandomState(0).rand(BufferUtils.get_buffer_size(), 3).astype(np.float32)
+    rgb8 = np.zeros(buffer.shape, dtype=np.uint8)
+    for i in xrange(frames):
+        start = monotonic()
+        rgb = hls_to_rgb(buffer)
+        np.multiply(rgb, 255, rgb)
+        np.clip(rgb, 0, 255, rgb)
+        rgb8[:] = rgb
+        stats.record("exact", monotonic() - start)
+
+        start = monotonic()
+        table.convert(buffer, rgb8)
+        stats.record("table", monotonic() - start)
+    return stats.get_stats()
+
+
+def bench_networking(app, frames):
+    net = app.networking
+    net.frame_stats = FrameStats(frames)
+    buffer = np.random.RandomState(0).rand(BufferUtils.get_buffer_size(), 3).astype(np.float32)
+    try:
+        for i in xrange(frames):
+            start = monotonic()
+            net.write_buffer(buffer)
+            net.frame_stats.record("write-buffer", monotonic() - start)
+    except Exception as e:
+        log.debug(traceback.format_exc())
+        return {"error": "%s: %s" % (e.__class__.__name__, e)}
+    return net.frame_stats.get_stats()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=open(os.devnull, "w")).strip()
+    except Exception:
+        return None
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+
+    parser = argparse.ArgumentParser(description="Benchmark FireMix against synthetic scenes of increasing size")
+    parser.add_argument("--strands", type=str, default="8,30,120",
+                        help="Comma-separated list of strand counts to generate (default: 8,30,120)")
+    parser.add_argument("--fixtures-per-strand", type=int, default=4)
+    parser.add_argument("--pixels-per-fixture", type=int, default=32)
+    parser.add_argument("--topologies", type=str, default=",".join(TOPOLOGIES),
+                        help="Comma-separated list of topologies (%s)" % ", ".join(TOPOLOGIES))
+    parser.add_argument("--frames", type=int, default=60, help="Frames to time per preset/transition (default: 60)")
+    parser.add_argument("--presets", type=str, default=None, help="Comma-separated list of preset classes to run")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", default=True,
+                        help="Skip Scene.warmup (needed by most presets; O(n^2) memory)")
+    parser.add_argument("--output", type=str, default="benchmark.json", help="Results file (default: benchmark.json)")
+    parser.add_argument("--verbose", action='store_const', const=True, default=False, help="Enable verbose log output")
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger("firemix").setLevel(logging.DEBUG)
+
+    args.scene = "synthetic"
+    args.playlist = None
+    args.preset = None
+    args.profile = False
+    args.yappi = False
+    args.noaudio = True
+
+    app = BenchmarkApp(args)
+
+    loader = PresetLoader(app)
+    preset_classes = loader.load()
+    loader.stop()
+    if args.presets:
+        wanted = args.presets.split(",")
+        preset_classes = dict([(k, v) for k, v in preset_classes.iteritems() if k in wanted])
+    transition_classes = app.plugins.get('Transition')
+
+    results = {"revision": git_revision(),
+               "python": platform.python_version(),
+               "numpy": np.__version__,
+               "frames": args.frames,
+               "scenes": []}
+
+    results["color-lut-build"] = timed(HlsToRgbTable)
+    color_table = HlsToRgbTable()
+
+    tmpdir = tempfile.mkdtemp(prefix="firemix-bench-")
+    try:
+        for topology in args.topologies.split(","):
+            for strands in [int(s) for s in args.strands.split(",")]:
+                scene_data = generate_scene(strands, args.fixtures_per_strand, args.pixels_per_fixture, topology)
+                filepath = os.path.join(tmpdir, scene_data["name"] + ".json")
+                with open(filepath, "w") as f:
+                    json.dump(scene_data, f)
+
+                pixels = strands * args.fixtures_per_strand * args.pixels_per_fixture
+                print "%s: %d strands, %d pixels" % (topology, strands, pixels)
+                sys.stdout.flush()
+
+                app.load_scene(filepath)
+                entry = {"name": scene_data["name"],
+                         "topology": topology,
+                         "strands": strands,
+                         "fixtures-per-strand": args.fixtures_per_strand,
+                         "pixels-per-fixture": args.pixels_per_fixture,
+                         "pixels": pixels,
+                         "setup": {}}
+
+                entry["setup"]["buffer-utils-init"] = timed(BufferUtils.init)
+                app.create_mixer()
+                if args.warmup:
+                    entry["setup"]["scene-warmup"] = timed(app.scene.warmup)
+
+                entry["presets"] = bench_presets(app, preset_classes, args.frames)
+                entry["transitions"] = bench_transitions(app, transition_classes, args.frames)
+                entry["color-conversion"] = bench_color_conversion(color_table, args.frames)
+                entry["networking"] = bench_networking(app, args.frames)
+                results["scenes"].append(entry)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+    print "Results written to %s" % args.output
+
+
+if __name__ == "__main__":
+    main()
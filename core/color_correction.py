@@ -0,0 +1,142 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+import numpy as np
+
+log = logging.getLogger("firemix.core.color_correction")
+
+
+class ColorCorrection:
+    """
+    Per-strand output correction of RGB frames, from these keys of each
+    entry in the scene's strand-settings:
+
+        "gamma": output = input ** gamma (default 1.0)
+        "white-balance": [r, g, b] channel gains (default [1, 1, 1])
+        "current-limit": scale applied to every channel, so that full white
+                         draws at most this fraction of full current
+                         (default 1.0)
+
+    Each distinct correction is compiled into a lookup table per channel,
+    from LUT_SIZE input levels to 8-bit or 16-bit output.  The tables are
+    stacked into one array, and each channel of each pixel gets the offset
+    of its table, so correcting a frame is one quantize and a single take.
+    Strands without correction share an identity table.  build() must be
+    called again when the strand settings or the buffer size change.
+    """
+
+    LUT_SIZE = 4096
+
+    def __init__(self, bits=8):
+        self.bits = bits
+        self.dtype = np.uint8 if bits == 8 else np.uint16
+        self.active = False
+        self._lut = None
+        self._offsets = None
+        self._scratch = None
+        self._index = None
+
+    @staticmethod
+    def _correction(settings):
+        wb = settings.get("white-balance", [1.0, 1.0, 1.0])
+        return (float(settings.get("gamma", 1.0)),
+                tuple([float(gain) for gain in wb]),
+                float(settings.get("current-limit", 1.0)))
+
+    def _table(self, correction):
+        gamma, wb, limit = correction
+        levels = np.linspace(0.0, 1.0, self.LUT_SIZE)
+        if gamma != 1.0:
+            levels = np.power(levels, gamma)
+        top = (1 << self.bits) - 1
+        return np.vstack([np.clip(levels * gain * limit, 0.0, 1.0) * top + 0.5 for gain in wb])
+
+    def build(self, strand_settings, extents, size):
+        identity = (1.0, (1.0, 1.0, 1.0), 1.0)
+        corrections = [identity]
+        strand_tables = []
+        for settings, (start, end) in zip(strand_settings, extents):
+            correction = self._correction(settings)
+            if correction not in corrections:
+                corrections.append(correction)
+            strand_tables.append((corrections.index(correction), start, end))
+
+        self.active = len(corrections) > 1
+        if not self.active:
+            self._lut = None
+            return
+
+        self._lut = np.vstack([self._table(c) for c in corrections]).astype(self.dtype).reshape(-1)
+        table = np.zeros(size, dtype=np.intp)
+        for index, start, end in strand_tables:
+            table[start:end] = index
+        # Offset of the table for each channel of each pixel.
+        self._offsets = ((table * 3)[:, np.newaxis] + np.arange(3)) * self.LUT_SIZE
+        self._scratch = np.zeros((size, 3), dtype=np.float32)
+        self._index = np.zeros((size, 3), dtype=np.intp)
+        log.info("Color correction: %d tables for %d strands" % (len(corrections) - 1, len(strand_settings)))
+
+    def apply(self, rgb, out):
+        """
+        Writes the corrected rgb frame ([[R,G,B]] in [0..1]) into out
+        """
+        np.multiply(rgb, self.LUT_SIZE - 1, self._scratch)
+        np.add(self._scratch, 0.5, self._scratch)
+        self._index[:] = self._scratch
+        np.add(self._index, self._offsets, self._index)
+        np.take(self._lut, self._index, out=out)
+
+
+class TestColorCorrection(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = [{"id": 0, "enabled": True},
+                         {"id": 1, "enabled": True, "gamma": 2.0, "white-balance": [1.0, 0.5, 0.25]},
+                         {"id": 2, "enabled": True, "current-limit": 0.5}]
+        self.extents = [(0, 4), (4, 8), (8, 12)]
+        self.rgb = np.tile(np.linspace(0.0, 1.0, 4, dtype=np.float32), 9).reshape(12, 3)
+
+    def test_identity(self):
+        correction = ColorCorrection()
+        correction.build([{"id": 0, "enabled": True}], [(0, 12)], 12)
+        self.assertFalse(correction.active)
+
+    def test_strands(self):
+        correction = ColorCorrection()
+        correction.build(self.settings, self.extents, 12)
+        out = np.zeros((12, 3), dtype=np.uint8)
+        correction.apply(self.rgb, out)
+
+        expected = np.zeros((12, 3))
+        expected[0:4] = self.rgb[0:4]
+        expected[4:8] = np.power(self.rgb[4:8], 2.0) * [1.0, 0.5, 0.25]
+        expected[8:12] = self.rgb[8:12] * 0.5
+        self.assertTrue(np.all(np.abs(out - expected * 255) <= 1))
+
+    def test_16_bit(self):
+        correction = ColorCorrection(bits=16)
+        correction.build(self.settings, self.extents, 12)
+        out = np.zeros((12, 3), dtype=np.uint16)
+        correction.apply(self.rgb, out)
+        self.assertEqual(out[11, 2], 32768)
+        self.assertEqual(out[3, 2], 65535)
+
+
+if __name__ == "__main__":
+    unittest.main()
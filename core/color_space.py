@@ -0,0 +1,132 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import numpy as np
+
+from lib.color_kernels import ColorWorkspace, hls_to_rgb, rgb_to_hls
+from lib.transition import Transition
+from plugins.dissolve import Dissolve
+
+
+class FrameColorSpace:
+    """
+    Chooses the color space each frame is mixed in, and converts preset
+    buffers to it.
+
+    With the rgb-pipeline setting on, a frame stays in RGB when every preset
+    in it renders RGB and the transition (if any) can blend RGB.  Otherwise
+    the frame is mixed in HLS, and RGB buffers are converted into buffers
+    kept here (one per preset slot).
+    """
+
+    def __init__(self, rgb_pipeline=False):
+        self.rgb_pipeline = rgb_pipeline
+        self._workspace = ColorWorkspace()
+        self._buffers = [None, None]
+
+    def _buffer(self, slot, shape):
+        if self._buffers[slot] is None or self._buffers[slot].shape != shape:
+            self._buffers[slot] = np.zeros(shape, dtype=np.float32)
+        return self._buffers[slot]
+
+    def choose(self, presets, transition=None):
+        """
+        Returns the color space to mix presets (and blend them with transition) in
+        """
+        if not self.rgb_pipeline:
+            return "HLS"
+        if transition is not None and "RGB" not in transition.color_spaces:
+            return "HLS"
+        for preset in presets:
+            if preset.color_space != "RGB":
+                return "HLS"
+        return "RGB"
+
+    def convert(self, buffer, from_space, to_space, slot=0):
+        """
+        Returns buffer in to_space, converted into the slot's buffer if needed
+        """
+        if from_space == to_space:
+            return buffer
+        out = self._buffer(slot, buffer.shape)
+        if to_space == "HLS":
+            return rgb_to_hls(buffer, out, self._workspace)
+        return hls_to_rgb(buffer, out, self._workspace)
+
+    def blend(self, transition, start, end, progress, color_space):
+        """
+        Blends start and end (both in color_space) with transition
+        """
+        if color_space == "RGB":
+            return transition.get_rgb(start, end, progress)
+        return transition.get(start, end, progress)
+
+
+class StubPreset:
+
+    def __init__(self, color_space):
+        self.color_space = color_space
+
+
+class HlsOnlyTransition(Transition):
+
+    def get(self, start, end, progress):
+        return end
+
+
+class TestFrameColorSpace(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.rgb = rng.rand(100, 3).astype(np.float32)
+        self.other = rng.rand(100, 3).astype(np.float32)
+        self.rgb_preset = StubPreset("RGB")
+        self.hls_preset = StubPreset("HLS")
+
+    def test_choose(self):
+        spaces = FrameColorSpace(rgb_pipeline=True)
+        self.assertEqual(spaces.choose([self.rgb_preset]), "RGB")
+        self.assertEqual(spaces.choose([self.hls_preset]), "HLS")
+        self.assertEqual(spaces.choose([self.rgb_preset, self.rgb_preset], Dissolve(None)), "RGB")
+        self.assertEqual(spaces.choose([self.rgb_preset, self.hls_preset], Dissolve(None)), "HLS")
+        self.assertEqual(spaces.choose([self.rgb_preset, self.rgb_preset], HlsOnlyTransition(None)), "HLS")
+        self.assertEqual(FrameColorSpace().choose([self.rgb_preset]), "HLS")
+
+    def test_convert(self):
+        spaces = FrameColorSpace()
+        self.assertIs(spaces.convert(self.rgb, "RGB", "RGB"), self.rgb)
+        hls = spaces.convert(self.rgb, "RGB", "HLS")
+        other = spaces.convert(self.other, "RGB", "HLS", slot=1)
+        self.assertIsNot(hls, other)
+        back = FrameColorSpace().convert(hls, "HLS", "RGB")
+        self.assertTrue(np.allclose(back, self.rgb, atol=1e-5))
+
+    def test_blend(self):
+        spaces = FrameColorSpace(rgb_pipeline=True)
+        dissolve = Dissolve(None)
+        frame = spaces.blend(dissolve, self.rgb, self.other, 0.25, "RGB")
+        self.assertTrue(np.allclose(frame, self.rgb * 0.75 + self.other * 0.25, atol=1e-5))
+
+        # An HLS transition between an RGB and an HLS preset
+        start = spaces.convert(self.rgb, "RGB", "HLS")
+        frame = spaces.blend(HlsOnlyTransition(None), start, self.other, 0.5, "HLS")
+        self.assertIs(frame, self.other)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import numpy as np
+
+
+class DeltaFilter:
+    """
+    Picks out the packets of a frame that differ from the last frame sent,
+    so that unchanged strands can be skipped.
+
+    Frames are a uint8 array of packets laid out back to back, described
+    by a list of (start, end) bounds.  The comparison is one elementwise
+    compare against a copy of the last frame and one reduceat over the
+    packet starts.  Every keyframe_interval frames (and whenever the
+    layout changes) every packet is sent, so receivers that missed a
+    packet catch up.
+    """
+
+    def __init__(self, keyframe_interval=30):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._bounds = None
+        self._last = None
+        self._mask = None
+        self._starts = None
+        self._since_keyframe = 0
+
+        self.sent_packets = 0
+        self.skipped_packets = 0
+        self.keyframes = 0
+
+    def select(self, frame, bounds):
+        """
+        Returns the indices of the packets in bounds to send for frame
+        """
+        if not bounds:
+            return []
+
+        if bounds is not self._bounds or self._last is None or self._last.shape != frame.shape:
+            self._bounds = bounds
+            self._last = np.empty_like(frame)
+            self._mask = np.zeros(frame.shape, dtype=bool)
+            self._starts = np.array([start for start, end in bounds], dtype=np.intp)
+            self._since_keyframe = self.keyframe_interval
+
+        if self._since_keyframe >= self.keyframe_interval:
+            self._since_keyframe = 1
+            self._last[:] = frame
+            self.keyframes += 1
+            self.sent_packets += len(bounds)
+            return range(len(bounds))
+
+        self._since_keyframe += 1
+        np.not_equal(frame, self._last, self._mask)
+        changed = np.flatnonzero(np.logical_or.reduceat(self._mask, self._starts))
+        self._last[:] = frame
+        self.sent_packets += len(changed)
+        self.skipped_packets += len(bounds) - len(changed)
+        return changed
+
+    def get_stats(self):
+        return {"sent-packets": self.sent_packets,
+                "skipped-packets": self.skipped_packets,
+                "keyframes": self.keyframes}
+
+
+class TestDeltaFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.bounds = [(0, 4), (4, 8), (8, 12)]
+        self.frame = np.arange(12, dtype=np.uint8)
+
+    def select(self, delta, frame, bounds=None):
+        return list(delta.select(frame, bounds if bounds is not None else self.bounds))
+
+    def test_changed_packets(self):
+        delta = DeltaFilter(keyframe_interval=30)
+        self.assertEqual(self.select(delta, self.frame), [0, 1, 2])
+        self.assertEqual(self.select(delta, self.frame), [])
+
+        frame = self.frame.copy()
+        frame[5] = 200
+        self.assertEqual(self.select(delta, frame), [1])
+        frame[0] = 200
+        frame[11] = 200
+        self.assertEqual(self.select(delta, frame), [0, 2])
+        self.assertEqual(delta.get_stats(), {"sent-packets": 6, "skipped-packets": 6, "keyframes": 1})
+
+    def test_keyframes(self):
+        delta = DeltaFilter(keyframe_interval=4)
+        sent = [self.select(delta, self.frame) for i in xrange(9)]
+        self.assertEqual(sent, [[0, 1, 2], [], [], [], [0, 1, 2], [], [], [], [0, 1, 2]])
+        self.assertEqual(delta.keyframes, 3)
+
+    def test_layout_change(self):
+        delta = DeltaFilter(keyframe_interval=30)
+        self.select(delta, self.frame)
+        self.assertEqual(self.select(delta, self.frame), [])
+
+        # A rebuilt (even identical) layout forces a full frame
+        self.assertEqual(self.select(delta, self.frame, list(self.bounds)), [0, 1, 2])
+
+        # So does a frame of a different length
+        bounds = [(0, 4), (4, 8)]
+        self.assertEqual(self.select(delta, self.frame[:8], bounds), [0, 1])
+        self.assertEqual(self.select(delta, self.frame[:8], bounds), [])
+        self.assertEqual(self.select(delta, self.frame, bounds), [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import numpy as np
+
+
+class TemporalDither:
+    """
+    Quantizes frames to 8 bits with temporal error diffusion: the rounding
+    error of each channel of each pixel is carried into the next frame, so
+    over a few frames the average output matches levels between two 8-bit
+    steps.  This removes the banding of dim fades at the frame rate of the
+    output.
+
+    All buffers are allocated up front, so apply() makes no garbage.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.levels = np.zeros((size, 3), dtype=np.float32)
+        self._error = np.zeros((size, 3), dtype=np.float32)
+        self._value = np.zeros((size, 3), dtype=np.float32)
+
+    def apply(self, levels, out):
+        """
+        Quantizes levels (floats from 0 to 255) into out, a uint8 array
+        """
+        np.clip(levels, 0.0, 255.0, self._value)
+        np.add(self._value, self._error, self._value)
+        np.add(self._value, 0.5, self._error)
+        np.floor(self._error, self._error)
+        np.clip(self._error, 0.0, 255.0, self._error)
+        out[:] = self._error
+        np.subtract(self._value, self._error, self._error)
+
+
+class TestTemporalDither(unittest.TestCase):
+
+    def test_average(self):
+        dither = TemporalDither(4)
+        levels = np.array([[0.25, 0.5, 1.75], [10.1, 100.0, 254.9],
+                           [0.0, 255.0, 300.0], [-5.0, 3.3, 128.5]], dtype=np.float32)
+        out = np.zeros((4, 3), dtype=np.uint8)
+        total = np.zeros((4, 3))
+        frames = 100
+        for i in xrange(frames):
+            dither.apply(levels, out)
+            total += out
+        expected = np.clip(levels, 0.0, 255.0)
+        self.assertTrue(np.all(np.abs(total / frames - expected) < 0.02))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,319 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Art-Net and sACN (E1.31) encoders.
+
+Pixels are mapped to DMX universes 170 to a universe (510 channels).  Each
+enabled strand starts a new universe, numbered consecutively from the
+client's first universe unless the strand's settings give a "universe".
+DMX fixtures take 8-bit channels, so clients are always sent RGB8, but the
+strand color modes (BGR8) are honored.
+
+The universe map is compiled once per layout into a contiguous frame of
+packets (headers filled in) and an index array, so packing a frame is one
+gather from the RGB8 buffer and one scatter into the packets, plus one
+scatter to update the sequence numbers.
+"""
+
+import logging
+import socket
+import struct
+import unittest
+import uuid
+import numpy as np
+
+from lib.color_modes import client_mode, pixel_channels
+
+log = logging.getLogger("firemix.core.dmx")
+
+ARTNET_PORT = 6454
+E131_PORT = 5568
+PIXELS_PER_UNIVERSE = 170
+
+
+def build_universe_map(strand_settings, extents, first_universe):
+    """
+    Returns a list of (universe, channel index array into the flat RGB8 buffer).
+    extents are the (start, end) pixel extents of each strand.
+    """
+    universes = []
+    universe = first_universe
+    for settings, (start, end) in zip(strand_settings, extents):
+        if not settings["enabled"]:
+            continue
+        universe = settings.get("universe", universe)
+        for chunk in xrange(start, end, PIXELS_PER_UNIVERSE):
+            chunk_end = min(end, chunk + PIXELS_PER_UNIVERSE)
+            universes.append((universe, pixel_channels(chunk, chunk_end, "RGB8",
+                                                       settings.get("color-mode", "RGB8"))))
+            universe += 1
+    return universes
+
+
+class DmxEncoder:
+    """
+    Base class for encoders that send one packet per DMX universe.
+    Subclasses provide the packet headers.
+    """
+
+    HEADER_SIZE = 0
+    SEQUENCE_OFFSET = 0
+    FIRST_SEQUENCE = 0
+
+    def __init__(self, first_universe=0, sync=False):
+        self.first_universe = first_universe
+        self.sync = sync
+        self.frame = None
+        self.packets = []
+        self.universes = []
+        self.sync_packet = None
+        self._index = None
+        self._dest = None
+        self._scratch = None
+        self._sequence_positions = None
+        self._sequence = self.FIRST_SEQUENCE
+
+    def build(self, strand_settings, extents):
+        universe_map = build_universe_map(strand_settings, extents, self.first_universe)
+        lengths = [self.channel_count(len(index)) for universe, index in universe_map]
+        self.frame = np.zeros(sum(lengths) + self.HEADER_SIZE * len(lengths), dtype=np.uint8)
+
+        dest = []
+        bounds = []
+        offset = 0
+        for (universe, index), length in zip(universe_map, lengths):
+            self.frame[offset:offset + self.HEADER_SIZE] = np.fromstring(
+                self.header(universe, length), dtype=np.uint8)
+            data_start = offset + self.HEADER_SIZE
+            dest.append(np.arange(data_start, data_start + len(index), dtype=np.intp))
+            bounds.append((offset, data_start + length))
+            offset = data_start + length
+
+        empty = [np.zeros(0, dtype=np.intp)]
+        self._index = np.concatenate([index for universe, index in universe_map] or empty)
+        self._dest = np.concatenate(dest or empty)
+        self._scratch = np.zeros(len(self._index), dtype=np.uint8)
+        self._sequence_positions = np.array([start + self.SEQUENCE_OFFSET for start, end in bounds],
+                                            dtype=np.intp)
+
+        view = memoryview(self.frame)
+        self.packets = [view[a:b] for a, b in bounds]
+        self.universes = [universe for universe, index in universe_map]
+        self.sync_packet = self.build_sync_packet() if self.sync else None
+
+    def pack(self, rgb_flat):
+        """
+        Gathers a flat RGB8 frame into the packets and advances the sequence number
+        """
+        np.take(rgb_flat, self._index, out=self._scratch)
+        self.frame[self._dest] = self._scratch
+        self.frame[self._sequence_positions] = self._sequence
+        self._sequence = self.next_sequence(self._sequence)
+
+    def channel_count(self, channels):
+        return channels
+
+    def next_sequence(self, sequence):
+        return (sequence + 1) & 0xFF
+
+    def header(self, universe, length):
+        raise NotImplementedError
+
+    def build_sync_packet(self):
+        raise NotImplementedError
+
+
+class ArtNetEncoder(DmxEncoder):
+    """
+    ArtDmx packets, with an optional ArtSync after each frame.
+    Universes are 15-bit port-addresses (net, sub-net and universe).
+    """
+
+    HEADER_SIZE = 18
+    SEQUENCE_OFFSET = 12
+    FIRST_SEQUENCE = 1
+
+    def channel_count(self, channels):
+        # ArtDmx data length must be even.
+        return channels + (channels & 1)
+
+    def next_sequence(self, sequence):
+        # Zero disables sequencing in Art-Net, so wrap 255 to 1.
+        return sequence % 255 + 1
+
+    def header(self, universe, length):
+        return struct.pack("<8sH", "Art-Net\x00", 0x5000) + struct.pack(
+            ">BBBBBBH", 0, 14, 0, 0, universe & 0xFF, (universe >> 8) & 0x7F, length)
+
+    def build_sync_packet(self):
+        return struct.pack("<8sH", "Art-Net\x00", 0x5200) + struct.pack(">BBBB", 0, 14, 0, 0)
+
+
+class E131Encoder(DmxEncoder):
+    """
+    E1.31 data packets.  If sync_universe is set, data packets name it as
+    their synchronization address and a sync packet for that universe
+    follows each frame, so receivers latch all universes at once.
+    """
+
+    HEADER_SIZE = 126
+    SEQUENCE_OFFSET = 111
+    SYNC_SEQUENCE_OFFSET = 44
+    SOURCE_NAME = "FireMix"
+    PRIORITY = 100
+
+    ACN_PACKET_IDENTIFIER = "ASC-E1.17\x00\x00\x00"
+    VECTOR_ROOT_E131_DATA = 0x00000004
+    VECTOR_ROOT_E131_EXTENDED = 0x00000008
+    VECTOR_E131_DATA_PACKET = 0x00000002
+    VECTOR_E131_EXTENDED_SYNCHRONIZATION = 0x00000001
+
+    def __init__(self, first_universe=1, sync_universe=None):
+        DmxEncoder.__init__(self, first_universe, sync_universe is not None)
+        self.sync_universe = sync_universe or 0
+        self._sync_sequence = 0
+        self.cid = uuid.uuid4().bytes
+
+    def root_layer(self, length, vector):
+        return struct.pack(">HH12sHI16s", 0x0010, 0x0000, self.ACN_PACKET_IDENTIFIER,
+                           0x7000 | (length - 16), vector, self.cid)
+
+    def header(self, universe, length):
+        packet_length = self.HEADER_SIZE + length
+        return (self.root_layer(packet_length, self.VECTOR_ROOT_E131_DATA) +
+                struct.pack(">HI64sBHBBH", 0x7000 | (packet_length - 38), self.VECTOR_E131_DATA_PACKET,
+                            self.SOURCE_NAME, self.PRIORITY, self.sync_universe, 0, 0, universe) +
+                struct.pack(">HBBHHHB", 0x7000 | (packet_length - 115), 0x02, 0xA1, 0x0000, 0x0001,
+                            length + 1, 0x00))
+
+    def build_sync_packet(self):
+        return bytearray(self.root_layer(49, self.VECTOR_ROOT_E131_EXTENDED) +
+                         struct.pack(">HIBHH", 0x7000 | (49 - 38), self.VECTOR_E131_EXTENDED_SYNCHRONIZATION,
+                                     0, self.sync_universe, 0))
+
+    def pack(self, rgb_flat):
+        DmxEncoder.pack(self, rgb_flat)
+        if self.sync_packet is not None:
+            # Sync packets are numbered separately, on the sync universe.
+            self.sync_packet[self.SYNC_SEQUENCE_OFFSET] = self._sync_sequence
+            self._sync_sequence = (self._sync_sequence + 1) & 0xFF
+
+
+class DmxSender:
+    """
+    Sends DMX frames to a set of clients.  Clients with the same universe
+    and sync settings (as returned by key(client)) share an encoder, which
+    create_encoder(key) makes, so each is packed once per frame.
+    """
+
+    def __init__(self, key, create_encoder):
+        self._key = key
+        self._create_encoder = create_encoder
+        self._plan = []
+
+    def build(self, clients, strand_settings, extents):
+        encoders = {}
+        addresses = {}
+        for client in clients:
+            if client_mode(client) != "RGB8":
+                log.warn("%s:%d: DMX clients are sent RGB8, not %s" %
+                         (client["host"], client["port"], client_mode(client)))
+            key = self._key(client)
+            if key not in encoders:
+                encoders[key] = self._create_encoder(key)
+                encoders[key].build(strand_settings, extents)
+                addresses[key] = []
+            addresses[key].append((client["host"], client["port"]))
+        self._plan = [(encoders[key], addresses[key]) for key in sorted(encoders.keys())]
+
+    def pack(self, rgb_flat):
+        for encoder, addresses in self._plan:
+            encoder.pack(rgb_flat)
+
+    def send(self, sock):
+        for encoder, addresses in self._plan:
+            for address in addresses:
+                for packet in encoder.packets:
+                    sock.sendto(packet, address)
+                if encoder.sync_packet is not None:
+                    sock.sendto(encoder.sync_packet, address)
+
+
+class TestDmxEncoders(unittest.TestCase):
+
+    def setUp(self):
+        # Two strands: 200 pixels (two universes) and 10 pixels.
+        self.settings = [{"id": 0, "enabled": True}, {"id": 1, "enabled": True}]
+        self.extents = [(0, 200), (200, 210)]
+        self.rgb = (np.arange(210 * 3) % 256).astype(np.uint8)
+
+    def receive(self, encoder, expected):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1.0)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for packet in encoder.packets:
+            sender.sendto(packet, receiver.getsockname())
+        if encoder.sync_packet is not None:
+            sender.sendto(encoder.sync_packet, receiver.getsockname())
+        received = [receiver.recv(1024) for i in xrange(expected)]
+        receiver.close()
+        sender.close()
+        return received
+
+    def test_artnet(self):
+        encoder = ArtNetEncoder(first_universe=3, sync=True)
+        encoder.build(self.settings, self.extents)
+        encoder.pack(self.rgb)
+        packets = self.receive(encoder, 4)
+
+        self.assertEqual(encoder.universes, [3, 4, 5])
+        self.assertEqual(packets[0][:8], "Art-Net\x00")
+        self.assertEqual(struct.unpack("<H", packets[0][8:10])[0], 0x5000)
+        self.assertEqual(ord(packets[0][12]), 1)
+        self.assertEqual(ord(packets[1][14]), 4)
+        self.assertEqual(struct.unpack(">H", packets[0][16:18])[0], 510)
+        self.assertEqual(struct.unpack(">H", packets[1][16:18])[0], 90)
+        # 10 pixels = 30 channels; no padding needed.
+        self.assertEqual(packets[2][18:], self.rgb[600:630].tostring())
+        self.assertEqual(packets[1][18:], self.rgb[510:600].tostring())
+        self.assertEqual(struct.unpack("<H", packets[3][8:10])[0], 0x5200)
+
+        encoder.pack(self.rgb)
+        self.assertEqual(encoder.frame[12], 2)
+
+    def test_e131(self):
+        encoder = E131Encoder(first_universe=1, sync_universe=7)
+        encoder.build(self.settings, self.extents)
+        encoder.pack(self.rgb)
+        packets = self.receive(encoder, 4)
+
+        self.assertEqual(packets[0][4:16], E131Encoder.ACN_PACKET_IDENTIFIER)
+        self.assertEqual(len(packets[0]), 126 + 510)
+        self.assertEqual(struct.unpack(">H", packets[0][16:18])[0], 0x7000 | (636 - 16))
+        self.assertEqual(struct.unpack(">H", packets[1][113:115])[0], 2)
+        self.assertEqual(struct.unpack(">H", packets[0][109:111])[0], 7)
+        self.assertEqual(struct.unpack(">H", packets[2][123:125])[0], 31)
+        self.assertEqual(packets[0][126:], self.rgb[:510].tostring())
+        self.assertEqual(len(packets[3]), 49)
+        self.assertEqual(struct.unpack(">H", packets[3][45:47])[0], 7)
+        self.assertEqual(ord(packets[3][44]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Recording and replay of mixed frames.
+
+A recording is a memory-mapped file with a fixed 64-byte header followed by
+frames of float32 HLS data (pixels x 3), back to back.  Frames are recorded
+before post-processing, and the mixer post-processes them again on replay.
+The file is preallocated for the requested number of frames when recording
+starts, so appending a frame is a single copy into the map.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+log = logging.getLogger("firemix.core.frame_recorder")
+
+MAGIC = "FMXREC01"
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([("magic", "S8"),
+                         ("scene_hash", "S40"),
+                         ("pixels", "<u4"),
+                         ("tick_rate", "<f4"),
+                         ("capacity", "<u4"),
+                         ("frames", "<u4")])
+
+
+def scene_hash(scene):
+    """
+    Returns the SHA-1 hex digest of the scene's fixture layout, used to check that
+    a recording matches the scene it is replayed on.
+    """
+    fixtures = sorted(scene.fixtures(), key=lambda f: (f.strand, f.address))
+    layout = [(f.strand, f.address, f.pixels) for f in fixtures]
+    return hashlib.sha1(json.dumps(layout)).hexdigest()
+
+
+class FrameRecorder:
+    """
+    Appends frames to a preallocated memory-mapped recording.
+    """
+
+    def __init__(self, filename, scene, pixels, tick_rate, max_frames):
+        self.filename = filename
+        self._capacity = max_frames
+        self._count = 0
+
+        frame_bytes = pixels * 3 * np.dtype(np.float32).itemsize
+        with open(filename, "wb") as f:
+            f.truncate(HEADER_SIZE + max_frames * frame_bytes)
+
+        self._header = np.memmap(filename, dtype=HEADER_DTYPE, mode="r+", offset=0, shape=(1,))
+        self._header["magic"] = MAGIC
+        self._header["scene_hash"] = scene_hash(scene)
+        self._header["pixels"] = pixels
+        self._header["tick_rate"] = tick_rate
+        self._header["capacity"] = max_frames
+        self._header["frames"] = 0
+
+        self._frames = np.memmap(filename, dtype=np.float32, mode="r+", offset=HEADER_SIZE,
+                                 shape=(max_frames, pixels, 3))
+
+    def __len__(self):
+        return self._count
+
+    def is_full(self):
+        return self._count >= self._capacity
+
+    def write(self, buffer):
+        """
+        Appends a frame.  Returns False (and drops the frame) if the recording is full.
+        """
+        if self._count >= self._capacity:
+            return False
+        self._frames[self._count] = buffer
+        self._count += 1
+        self._header["frames"] = self._count
+        if self._count == self._capacity:
+            log.warn("Recording %s is full (%d frames)" % (self.filename, self._capacity))
+        return True
+
+    def close(self):
+        if self._frames is not None:
+            self._frames.flush()
+            self._header.flush()
+            log.info("Recorded %d frames to %s" % (self._count, self.filename))
+            self._frames = None
+            self._header = None
+
+
+class FrameReplayer:
+    """
+    Plays back a recording made by FrameRecorder.  Frames are read-only views
+    into the memory map, so replay costs almost nothing beyond the output.
+    """
+
+    def __init__(self, filename, scene=None, loop=True):
+        self.filename = filename
+        self._loop = loop
+        self._position = 0
+
+        size = os.path.getsize(filename)
+        if size < HEADER_SIZE:
+            raise ValueError("%s is not a FireMix recording" % filename)
+        header = np.memmap(filename, dtype=HEADER_DTYPE, mode="r", offset=0, shape=(1,))
+        if header["magic"][0] != MAGIC:
+            raise ValueError("%s is not a FireMix recording" % filename)
+
+        self.pixels = int(header["pixels"][0])
+        self.tick_rate = float(header["tick_rate"][0])
+        self.num_frames = int(header["frames"][0])
+        self.scene_hash = header["scene_hash"][0]
+
+        if scene is not None and self.scene_hash != scene_hash(scene):
+            log.warn("Recording %s was made with a different scene layout" % filename)
+
+        if self.num_frames == 0:
+            raise ValueError("Recording %s contains no frames" % filename)
+        if size < HEADER_SIZE + self.num_frames * self.pixels * 3 * np.dtype(np.float32).itemsize:
+            raise ValueError("Recording %s is truncated" % filename)
+
+        self._frames = np.memmap(filename, dtype=np.float32, mode="r", offset=HEADER_SIZE,
+                                 shape=(self.num_frames, self.pixels, 3))
+
+    def __len__(self):
+        return self.num_frames
+
+    def finished(self):
+        return not self._loop and self._position >= self.num_frames
+
+    def next_frame(self):
+        """
+        Returns the next frame, or None once a non-looping replay has finished.
+        """
+        if self._position >= self.num_frames:
+            if not self._loop:
+                return None
+            self._position = 0
+        frame = self._frames[self._position]
+        self._position += 1
+        return frame
+
+    def seek(self, frame):
+        self._position = max(0, min(frame, self.num_frames))
+
+
+class TestFrameRecorder(unittest.TestCase):
+
+    class Fixture:
+
+        def __init__(self, strand, address, pixels):
+            self.strand = strand
+            self.address = address
+            self.pixels = pixels
+
+    class Scene:
+
+        def __init__(self, fixtures):
+            self._fixtures = fixtures
+
+        def fixtures(self):
+            return self._fixtures
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="firemix-test-")
+        self.filename = os.path.join(self.dir, "recording.fmx")
+        self.scene = self.Scene([self.Fixture(0, 0, 4), self.Fixture(0, 1, 4)])
+        rng = np.random.RandomState(0)
+        self.frames = rng.rand(3, 8, 3).astype(np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record(self, max_frames=5):
+        recorder = FrameRecorder(self.filename, self.scene, 8, 40.0, max_frames)
+        for frame in self.frames:
+            self.assertTrue(recorder.write(frame))
+        recorder.close()
+
+    def test_round_trip(self):
+        self.record()
+        replay = FrameReplayer(self.filename, self.scene, loop=False)
+        self.assertEqual(replay.tick_rate, 40.0)
+        self.assertEqual(replay.pixels, 8)
+        self.assertEqual(len(replay), 3)
+        self.assertEqual(replay.scene_hash, scene_hash(self.scene))
+        for frame in self.frames:
+            self.assertTrue(np.array_equal(replay.next_frame(), frame))
+        self.assertIsNone(replay.next_frame())
+        self.assertTrue(replay.finished())
+
+        looping = FrameReplayer(self.filename)
+        for i in range(4):
+            frame = looping.next_frame()
+        self.assertTrue(np.array_equal(frame, self.frames[0]))
+
+    def test_full(self):
+        recorder = FrameRecorder(self.filename, self.scene, 8, 40.0, 2)
+        self.assertTrue(recorder.write(self.frames[0]))
+        self.assertTrue(recorder.write(self.frames[1]))
+        self.assertTrue(recorder.is_full())
+        self.assertFalse(recorder.write(self.frames[2]))
+        recorder.close()
+        self.assertEqual(len(FrameReplayer(self.filename)), 2)
+
+    def test_rejected(self):
+        self.record(max_frames=3)
+        with open(self.filename, "rb") as f:
+            data = f.read()
+
+        with open(self.filename, "wb") as f:
+            f.write(data[:-4])
+        self.assertRaises(ValueError, FrameReplayer, self.filename)
+
+        with open(self.filename, "wb") as f:
+            f.write(data[:HEADER_SIZE // 2])
+        self.assertRaises(ValueError, FrameReplayer, self.filename)
+
+        with open(self.filename, "wb") as f:
+            f.write("NOTAREC!" + data[8:])
+        self.assertRaises(ValueError, FrameReplayer, self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
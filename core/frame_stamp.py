@@ -0,0 +1,57 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Frame sequence stamps, for measuring the output path (see output_probe.py).
+
+With the sequence-stamps networking setting on, every frame carries the
+mixer's frame sequence number and the time it was finished, as measured by
+lib.clock.monotonic (so latency can only be measured on the same host):
+
+    Legacy: a packet 'T', 0, length (little-endian uint16), stamp, sent
+            after LEGACY_FRAME_BEGIN (and as a part after it over ZMQ)
+    OPC:    a system exclusive message (command 0xFF) with system ID
+            OPC_STAMP_SYSTEM_ID, followed by the stamp, before the pixels
+
+The stamp itself is the sequence number (big-endian uint32) followed by the
+time in seconds (big-endian float64).
+"""
+
+import struct
+import numpy as np
+
+STAMP_FORMAT = ">Id"
+STAMP_SIZE = struct.calcsize(STAMP_FORMAT)
+
+LEGACY_STAMP_COMMAND = "T"
+
+OPC_SYSEX_COMMAND = 0xFF
+OPC_STAMP_SYSTEM_ID = 0x464D
+
+
+def pack_stamp(stamp, out):
+    """
+    Writes stamp, a (sequence, time) tuple, into out (a uint8 array of STAMP_SIZE)
+    """
+    out[:] = np.fromstring(struct.pack(STAMP_FORMAT, stamp[0] & 0xFFFFFFFF, stamp[1]), dtype=np.uint8)
+
+
+def unpack_stamp(data):
+    """
+    Returns the (sequence, time) stamp at the start of data
+    """
+    return struct.unpack(STAMP_FORMAT, data[:STAMP_SIZE])
@@ -0,0 +1,170 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+import time
+import unittest
+import numpy as np
+
+log = logging.getLogger("firemix.core.governor")
+
+
+class FrameGovernor:
+    """
+    Watches the rolling cost of mixer ticks and steps output quality down
+    when frames don't fit in the budget (1 / tick rate), and back up once
+    there is headroom again.
+
+    Quality levels:
+        0: full quality
+        1: transitions are shed (they complete as a cut)
+        2+: transitions shed, and the tick rate is reduced by rate_step
+            per level, down to min_tick_rate
+
+    A level change happens when the mean cost over the last window frames is
+    above high_water of the budget (degrade), or has stayed below low_water
+    of the budget of the next better level for restore_hold frames in a row
+    (restore).  The hold keeps a show that is close to the limit from
+    flipping between levels.  After each change the window is refilled
+    before the next decision.
+    """
+
+    def __init__(self, tick_rate, min_tick_rate=None, window=32, high_water=0.9, low_water=0.6, rate_step=0.75,
+                 restore_hold=128):
+        self._base_tick_rate = float(tick_rate)
+        self._min_tick_rate = float(min_tick_rate or tick_rate / 2.0)
+        self._window = window
+        self._high_water = high_water
+        self._low_water = low_water
+        self._rate_step = rate_step
+        self._restore_hold = restore_hold
+        self._costs = np.zeros(window, dtype=np.float64)
+        self._count = 0
+        self._headroom_frames = 0
+
+        self._max_level = 1
+        while self._rate_at(self._max_level + 1) < self._rate_at(self._max_level):
+            self._max_level += 1
+
+        self.level = 0
+        self.tick_rate = self._base_tick_rate
+        self.mean_cost = 0.0
+        self.changes = 0
+        self.history = collections.deque(maxlen=32)
+
+    def _rate_at(self, level):
+        if level < 2:
+            return self._base_tick_rate
+        return max(self._min_tick_rate, self._base_tick_rate * pow(self._rate_step, level - 1))
+
+    def shed_transitions(self):
+        return self.level >= 1
+
+    def update(self, cost):
+        """
+        Records the cost of a tick (in seconds).  Returns True if the quality
+        level changed.
+        """
+        self._costs[self._count % self._window] = cost
+        self._count += 1
+        if self._count < self._window:
+            return False
+
+        self.mean_cost = np.mean(self._costs)
+        if self.mean_cost > self._high_water / self.tick_rate and self.level < self._max_level:
+            self._set_level(self.level + 1)
+            return True
+        if self.level > 0 and self.mean_cost < self._low_water / self._rate_at(self.level - 1):
+            self._headroom_frames += 1
+            if self._headroom_frames >= self._restore_hold:
+                self._set_level(self.level - 1)
+                return True
+        else:
+            self._headroom_frames = 0
+        return False
+
+    def _set_level(self, level):
+        degrading = level > self.level
+        self.level = level
+        self.tick_rate = self._rate_at(level)
+        self.changes += 1
+        self._count = 0
+        self._headroom_frames = 0
+        self.history.append((time.time(), level, self.tick_rate, self.mean_cost))
+
+        message = "Frame governor %s to level %d (tick rate %0.1f, mean tick cost %0.1f ms)" % (
+            "degraded" if degrading else "restored", level, self.tick_rate, self.mean_cost * 1000.0)
+        if degrading:
+            log.warn(message)
+        else:
+            log.info(message)
+
+    def get_state(self):
+        """
+        Returns a dictionary describing the current quality level
+        """
+        return {"level": self.level,
+                "max-level": self._max_level,
+                "tick-rate": self.tick_rate,
+                "shed-transitions": self.shed_transitions(),
+                "mean-cost": self.mean_cost,
+                "budget": 1.0 / self.tick_rate,
+                "changes": self.changes,
+                "history": list(self.history)}
+
+
+class TestFrameGovernor(unittest.TestCase):
+
+    def feed(self, governor, cost, frames):
+        changed = False
+        for i in range(frames):
+            changed = governor.update(cost) or changed
+        return changed
+
+    def test_degrade_and_restore(self):
+        governor = FrameGovernor(40, 20, window=8, restore_hold=16)
+        self.assertFalse(self.feed(governor, 0.030, 7))
+        self.assertTrue(self.feed(governor, 0.030, 1))
+        self.assertEqual(governor.level, 1)
+        self.assertTrue(governor.shed_transitions())
+        self.assertEqual(governor.tick_rate, 40)
+
+        self.feed(governor, 0.030, 8)
+        self.assertEqual(governor.level, 2)
+        self.assertEqual(governor.tick_rate, 30)
+
+        # Restoring waits for the window to refill and then for the hold
+        self.assertFalse(self.feed(governor, 0.005, 7 + 15))
+        self.assertTrue(self.feed(governor, 0.005, 1))
+        self.assertEqual(governor.level, 1)
+        self.feed(governor, 0.005, 7 + 16)
+        self.assertEqual(governor.level, 0)
+        self.assertEqual(governor.tick_rate, 40)
+        self.assertEqual(governor.changes, 4)
+
+    def test_restore_hold(self):
+        governor = FrameGovernor(40, 20, window=8, restore_hold=16)
+        self.feed(governor, 0.030, 8)
+        self.assertEqual(governor.level, 1)
+
+        # A mean that only dips below the restore threshold now and then never restores
+        for i in range(20):
+            self.feed(governor, 0.005, 10)
+            self.feed(governor, 0.020, 8)
+        self.assertEqual(governor.level, 1)
+        self.assertEqual(governor.changes, 1)
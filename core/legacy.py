@@ -0,0 +1,111 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from lib.color_modes import pixel_channels, pixel_sizes
+from core.frame_stamp import LEGACY_STAMP_COMMAND, STAMP_SIZE, pack_stamp
+
+LEGACY_FRAME_BEGIN = "B"
+LEGACY_FRAME_END = "E"
+
+
+class LegacyEncoder:
+    """
+    Encodes frames into the Legacy wire format: one packet per enabled
+    strand, sent between LEGACY_FRAME_BEGIN and LEGACY_FRAME_END.
+
+    Legacy packet: 'S', strand, length (little-endian uint16), pixel data
+    in the client's color mode
+
+    The packets are laid out back to back in one uint8 frame buffer, with
+    their headers filled in when the layout is built, so packing a frame is
+    one gather from the RGB8 frame and one scatter into the packets.  The
+    packets are memoryviews into the frame buffer, shared by all clients.
+    If built with stamp=True, the first packet is a frame stamp (see
+    core.frame_stamp), filled in by set_stamp().
+    """
+
+    HEADER_SIZE = 4
+
+    def __init__(self):
+        self.frame = None
+        self.bounds = []
+        self.packets = []
+        self._index = None
+        self._dest = None
+        self._scratch = None
+        self._stamp = None
+
+    def build(self, strand_settings, extents, mode="RGB8", stamp=False):
+        enabled = [strand for strand in xrange(len(strand_settings)) if strand_settings[strand]["enabled"]]
+        pixel_size = pixel_sizes[mode]
+
+        size = sum([self.HEADER_SIZE + (extents[strand][1] - extents[strand][0]) * pixel_size
+                    for strand in enabled])
+        if stamp:
+            size += self.HEADER_SIZE + STAMP_SIZE
+        self.frame = np.zeros(size, dtype=np.uint8)
+        dest = []
+        src = []
+        bounds = []
+        offset = 0
+        self._stamp = None
+        if stamp:
+            self.frame[:self.HEADER_SIZE] = (ord(LEGACY_STAMP_COMMAND), 0, STAMP_SIZE, 0)
+            self._stamp = (self.HEADER_SIZE, self.HEADER_SIZE + STAMP_SIZE)
+            bounds.append((0, self._stamp[1]))
+            offset = self._stamp[1]
+        for strand in enabled:
+            start, end = extents[strand]
+            length = (end - start) * pixel_size
+            self.frame[offset:offset + self.HEADER_SIZE] = (
+                ord('S'), strand, length & 0x00FF, (length & 0xFF00) >> 8)
+            data_start = offset + self.HEADER_SIZE
+            dest.append(np.arange(data_start, data_start + length, dtype=np.intp))
+            src.append(pixel_channels(start, end, mode, strand_settings[strand].get("color-mode", "RGB8")))
+            bounds.append((offset, data_start + length))
+            offset = data_start + length
+
+        empty = [np.zeros(0, dtype=np.intp)]
+        self._dest = np.concatenate(dest or empty)
+        self._index = np.concatenate(src or empty)
+        self._scratch = np.zeros(len(self._index), dtype=np.uint8)
+        self.bounds = bounds
+        self.set_frame(self.frame)
+
+    def set_frame(self, frame):
+        """
+        Packs into frame from now on.  frame must have been copied from
+        self.frame (for the packet headers).
+        """
+        self.frame = frame
+        view = memoryview(frame)
+        self.packets = [view[a:b] for a, b in self.bounds]
+
+    def set_stamp(self, stamp):
+        """
+        Writes the (sequence, time) stamp of the frame being packed
+        """
+        pack_stamp(stamp, self.frame[self._stamp[0]:self._stamp[1]])
+
+    def pack(self, flat):
+        """
+        Gathers a flat frame (see ColorModeCache) into the packets
+        """
+        np.take(flat, self._index, out=self._scratch)
+        self.frame[self._dest] = self._scratch
@@ -20,7 +20,7 @@ import logging
 import threading
 import time
 import random
-import math
+import unittest
 import numpy as np
 
 USE_YAPPI = True
@@ -34,12 +34,137 @@ from PySide import QtCore
 from lib.commands import SetAll, SetStrand, SetFixture, SetPixel, commands_overlap, blend_commands, render_command_list
 from lib.raw_preset import RawPreset
 from lib.buffer_utils import BufferUtils
+from lib.clock import monotonic
+from lib.frame_stats import FrameStats
 from core.audio import Audio
+from core.color_space import FrameColorSpace
+from core.governor import FrameGovernor
+from core.output_pipeline import OutputPipeline
+from core.post_process import PostProcessor
+from core.sanitizer import FrameSanitizer
 
 
 log = logging.getLogger("firemix.core.mixer")
 
 
+class TickScheduler(threading.Thread):
+    """
+    Runs the mixer tick callback at a fixed rate.
+
+    Frames are scheduled against absolute deadlines on the monotonic clock,
+    so sleep jitter and slow frames don't accumulate into drift.  When a
+    frame overruns its deadline, the overrun policy decides what happens:
+
+        skip:     drop the missed deadlines and resume on the original grid.
+                  The next callback is told how many frames were skipped.
+        catch-up: run the missed frames back-to-back (at most max_catch_up
+                  of them; anything beyond that is skipped).
+        stretch:  restart the grid from the current time, so the overrun
+                  shifts every following frame.
+
+    The callback is called as callback(lateness, skipped), where lateness is
+    the number of seconds the frame started after its deadline.  clock and
+    sleep default to the monotonic clock and time.sleep.
+    """
+
+    OVERRUN_POLICIES = ["skip", "catch-up", "stretch"]
+
+    def __init__(self, callback, rate, policy="skip", max_catch_up=4, clock=monotonic, sleep=time.sleep):
+        threading.Thread.__init__(self, name="MixerTickScheduler")
+        self.daemon = True
+        if policy not in self.OVERRUN_POLICIES:
+            log.warn("Unknown overrun policy %s, using skip." % policy)
+            policy = "skip"
+        self._callback = callback
+        self._period = 1.0 / rate
+        self._policy = policy
+        self._max_catch_up = max_catch_up
+        self._clock = clock
+        self._sleep = sleep
+        self._running = False
+        self._deadline = 0.0
+        self._pending_skips = 0
+
+        self.num_frames = 0
+        self.late_frames = 0
+        self.overruns = 0
+        self.skipped_frames = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def set_rate(self, rate):
+        """
+        Changes the tick rate.  Takes effect from the next deadline.
+        """
+        self._period = 1.0 / rate
+
+    def get_policy(self):
+        return self._policy
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        self._running = True
+        self._deadline = self._clock() + self._period
+
+        while self._running:
+            wait = self._deadline - self._clock()
+            if wait > 0:
+                self._sleep(wait)
+            if not self._running:
+                break
+
+            lateness = max(0.0, self._clock() - self._deadline)
+            skipped = self._pending_skips
+            self._pending_skips = 0
+
+            self.num_frames += 1
+            self.last_lateness = lateness
+            self.max_lateness = max(self.max_lateness, lateness)
+            if lateness > self._period:
+                self.late_frames += 1
+
+            try:
+                self._callback(lateness, skipped)
+            except:
+                log.exception("Exception raised in tick callback")
+
+            self._deadline += self._period
+            self._handle_overrun(self._clock())
+
+    def _handle_overrun(self, now):
+        behind = now - self._deadline
+        if behind <= 0:
+            return
+
+        self.overruns += 1
+        if self._policy == "stretch":
+            self._deadline = now
+            return
+
+        missed = int(behind / self._period)
+        if self._policy == "catch-up":
+            missed = max(0, missed - self._max_catch_up)
+
+        if missed > 0:
+            self._deadline += missed * self._period
+            self._pending_skips += missed
+            self.skipped_frames += missed
+
+    def get_stats(self):
+        """
+        Returns a dictionary of scheduling statistics
+        """
+        return {"policy": self._policy,
+                "frames": self.num_frames,
+                "late-frames": self.late_frames,
+                "overruns": self.overruns,
+                "skipped-frames": self.skipped_frames,
+                "last-lateness": self.last_lateness,
+                "max-lateness": self.max_lateness}
+
+
 class Mixer(QtCore.QObject):
     """
     Mixer is the brains of FireMix.  It handles the playback of presets
@@ -59,7 +184,24 @@ class Mixer(QtCore.QObject):
         self._start_transition = False
         self._transition_duration = self._app.settings.get('mixer')['transition-duration']
         self._transition_slop = self._app.settings.get('mixer')['transition-slop']
-        self._tick_timer = None
+        self._tick_scheduler = None
+        self._overrun_policy = self._app.settings.get('mixer').get('overrun-policy', 'skip')
+        self._pipelined_output = self._app.settings.get('mixer').get('pipelined-output', False)
+        self._pipeline_depth = self._app.settings.get('mixer').get('pipeline-depth', 2)
+        self._output_pipeline = None
+        self._output_sequence = 0
+        self._color_spaces = FrameColorSpace(self._app.settings.get('mixer').get('rgb-pipeline', False))
+        self._governor_enabled = self._app.settings.get('mixer').get('governor', False)
+        self._governor_min_tick_rate = self._app.settings.get('mixer').get('governor-min-tick-rate', None)
+        self._governor = None
+        self._post_process = None
+        self._recorder = None
+        self._replay = None
+        self._sanitizer = FrameSanitizer(self._app.settings.get('mixer').get('quarantine-threshold', 30),
+                                         self.quarantine_preset)
+        self.frame_stats = FrameStats()
+        if self._net is not None:
+            self._net.frame_stats = self.frame_stats
         self._duration = self._app.settings.get('mixer')['preset-duration']
         self._elapsed = 0.0
         self._running = False
@@ -113,21 +255,39 @@ class Mixer(QtCore.QObject):
             self._buffer_b = BufferUtils.create_buffer()
             self._max_pixels = maxp
 
+            self._post_process = PostProcessor(self._scene,
+                                               self._app.settings.get('mixer').get('gamma', 1.0),
+                                               self._app.settings.get('mixer').get('brightness-curve', None))
+
     def run(self):
         if not self._running:
-            self._tick_rate = self._app.settings.get('mixer')['tick-rate']
+            self._tick_rate = self._output_tick_rate()
             self._last_tick_time = 1.0 / self._tick_rate
-            self._tick_timer = threading.Timer(1.0 / self._tick_rate, self.on_tick_timer)
-            self._tick_timer.start()
+            self._tick_scheduler = TickScheduler(self.on_tick, self._tick_rate, self._overrun_policy)
+            if self._governor_enabled:
+                self._governor = FrameGovernor(self._tick_rate, self._governor_min_tick_rate)
             self._running = True
             self._elapsed = 0.0
             self._num_frames = 0
             self._start_time = self._last_frame_time = time.time()
             self.reset_output_buffer()
+            if self._pipelined_output and self._net is not None and self._enable_rendering:
+                self._output_pipeline = OutputPipeline(self._net, self._pipeline_depth)
+                self._output_pipeline.start()
+            self._tick_scheduler.start()
 
     def stop(self):
         self._running = False
-        self._tick_timer.cancel()
+        if self._tick_scheduler is not None:
+            self._tick_scheduler.stop()
+            if self._tick_scheduler is not threading.current_thread():
+                self._tick_scheduler.join(1.0)
+        if self._recorder is not None:
+            self._recorder.close()
+        if self._output_pipeline is not None:
+            self._output_pipeline.stop()
+            self._output_pipeline.join(1.0)
+            self._output_pipeline = None
         self._stop_time = time.time()
 
         if self._app.args.yappi and USE_YAPPI:
@@ -142,7 +302,7 @@ class Mixer(QtCore.QObject):
 
     @QtCore.Slot()
     def onset_detected(self):
-        t = time.clock()
+        t = monotonic()
         if (t - self._last_onset_time) > self._onset_holdoff:
             self._last_onset_time = t
             self._onset = True
@@ -153,6 +313,8 @@ class Mixer(QtCore.QObject):
 
     def set_global_dimmer(self, dimmer):
         self._global_dimmer = dimmer
+        if self._post_process is not None:
+            self._post_process.set_dimmer(dimmer)
 
     def set_global_speed(self, speed):
         self._global_speed = speed
@@ -216,22 +378,113 @@ class Mixer(QtCore.QObject):
     def get_transition_duration(self):
         return self._transition_duration
 
-    def on_tick_timer(self, force_tick=False):
-        if self._frozen and not force_tick:
-            delay = 1.0 / self._tick_rate
-        else:
-            start = time.clock()
-            self._render_in_progress = True
-            self.tick(self._last_tick_time)
-            self._render_in_progress = False
-            dt = (time.clock() - start)
-            delay = max(0, (1.0 / self._tick_rate) - dt)
-            if not self._paused:
-                self._elapsed += dt + delay
+    def on_tick(self, lateness=0.0, skipped=0):
+        """
+        Called by the TickScheduler once per frame.  Skipped frames are
+        folded into this frame's dt so that playback stays in step with
+        wall-clock time.
+        """
+        if lateness > self._last_tick_time:
+            log.debug("Frame %d started %0.1f ms late" % (self._num_frames, lateness * 1000.0))
+        if not self._frozen:
+            start = monotonic()
+            self.on_tick_timer(force_tick=True, dt=self._last_tick_time * (1 + skipped))
+            if self._governor is not None and self._governor.update(monotonic() - start):
+                if self._governor.tick_rate != self._tick_rate:
+                    self.set_tick_rate(self._governor.tick_rate)
         self._running = self._app._running
+        if not self._running:
+            self._tick_scheduler.stop()
+
+    def on_tick_timer(self, force_tick=False, dt=None):
+        """
+        Renders a single frame outside of the normal schedule
+        """
+        if self._frozen and not force_tick:
+            return
+        if dt is None:
+            dt = self._last_tick_time
+        self._render_in_progress = True
+        self.tick(dt)
+        self._render_in_progress = False
+        if not self._paused:
+            self._elapsed += dt
+
+    def get_scheduler_stats(self):
+        """
+        Returns frame scheduling statistics (lateness, late and skipped frames)
+        """
+        if self._tick_scheduler is None:
+            return {}
+        return self._tick_scheduler.get_stats()
+
+    def get_governor_state(self):
+        """
+        Returns the frame governor's quality level, tick rate and recent level changes
+        """
+        if self._governor is None:
+            return {}
+        return self._governor.get_state()
+
+    def get_pipeline_stats(self):
+        """
+        Returns output pipeline statistics (stalls, dropped frames), if pipelined output is enabled
+        """
+        if self._output_pipeline is None:
+            return {}
+        return self._output_pipeline.get_stats()
+
+    def set_recorder(self, recorder):
+        """
+        Assigns a FrameRecorder; every mixed frame will be appended to it
+        before post-processing.
+        """
+        self._recorder = recorder
+
+    def set_replay_source(self, replay):
+        """
+        Assigns a FrameReplayer to output in place of the playlist (None to resume the playlist).
+        While replaying, the mixer ticks at the rate the recording was made at, and
+        frames are post-processed as they are played.
+        """
+        if replay is not None and replay.pixels != BufferUtils.get_buffer_size():
+            raise ValueError("Recording has %d pixels but the scene has %d" %
+                             (replay.pixels, BufferUtils.get_buffer_size()))
+        self._replay = replay
+        if replay is not None and replay.tick_rate != self._app.settings.get('mixer')['tick-rate']:
+            log.info("Replaying %s at its recorded tick rate of %0.1f" % (replay.filename, replay.tick_rate))
         if self._running:
-            self._tick_timer = threading.Timer(delay, self.on_tick_timer)
-            self._tick_timer.start()
+            self.set_tick_rate(self._output_tick_rate())
+
+    def _output_tick_rate(self):
+        """
+        Returns the recording's tick rate while replaying, otherwise the tick-rate setting
+        """
+        if self._replay is not None:
+            return self._replay.tick_rate
+        return self._app.settings.get('mixer')['tick-rate']
+
+    def get_sanitizer_stats(self):
+        """
+        Returns NaN/Inf incident counts per preset and transition
+        """
+        return self._sanitizer.get_stats()
+
+    def quarantine_preset(self, preset):
+        """
+        Disables a preset that keeps producing bad frames, and moves on from
+        it if it is playing.
+        """
+        self.playlist.disable_presets_by_class(preset.__class__.__name__)
+        if (preset is self.playlist.get_active_preset() and not self._in_transition
+                and len(self.playlist) > 1):
+            self.start_transition()
+
+    def get_frame_stats(self):
+        """
+        Returns per-stage frame timing percentiles (in ms), keyed by stage name
+        """
+        return self.frame_stats.get_stats()
 
     def set_constant_preset(self, classname):
         self._app.playlist.clear_playlist()
@@ -247,6 +500,16 @@ class Mixer(QtCore.QObject):
     def get_tick_rate(self):
         return self._tick_rate
 
+    def set_tick_rate(self, tick_rate):
+        """
+        Changes the tick rate of a running mixer (used by the frame governor).
+        Does not change the tick-rate setting.
+        """
+        self._tick_rate = tick_rate
+        self._last_tick_time = 1.0 / tick_rate
+        if self._tick_scheduler is not None:
+            self._tick_scheduler.set_rate(tick_rate)
+
     def is_onset(self):
         """
         Called by presets; resets after tick if called during tick
@@ -287,10 +550,35 @@ class Mixer(QtCore.QObject):
 
     def tick(self, dt):
         self._num_frames += 1
+        stats = self.frame_stats
+        frame_start = monotonic()
 
-        dt *= self._global_speed
+        try:
+            self._render_frame(dt * self._global_speed)
+        finally:
+            # Even for a frame cut short, so its stage times don't spill
+            # into the next frame's.
+            stats.record("frame", monotonic() - frame_start)
+            stats.end_frame()
 
-        if len(self.playlist) > 0:
+        if self._enable_profiling:
+            tick_time = (time.time() - self._last_frame_time)
+            self._last_frame_time = time.time()
+            if tick_time > 0.0:
+                index = int((1.0 / tick_time))
+                self._tick_time_data[index] = self._tick_time_data.get(index, 0) + 1
+
+    def _render_frame(self, dt):
+        stats = self.frame_stats
+
+        if self._replay is not None:
+            frame = self._replay.next_frame()
+            if frame is not None:
+                start = monotonic()
+                frame = self._post_process.process(frame, "HLS")
+                stats.record("post-process", monotonic() - start)
+                self.write_output(frame)
+        elif len(self.playlist) > 0:
 
             active_preset = self.playlist.get_active_preset()
             next_preset = self.playlist.get_next_preset()
@@ -299,7 +587,7 @@ class Mixer(QtCore.QObject):
                 return
 
             try:
-                active_preset.tick(dt)
+                self._tick_preset(active_preset, "preset-active", dt)
             except:
                 log.error("Exception raised in preset %s" % active_preset.name())
                 self.playlist.disable_presets_by_class(active_preset.__class__.__name__)
@@ -317,50 +605,44 @@ class Mixer(QtCore.QObject):
                     next_preset._reset()
                     self._buffer_b = BufferUtils.create_buffer()
 
-                if self._transition_duration > 0.0 and self._transition is not None:
+                # When the governor is shedding load, transitions finish as a cut.
+                shed = self._governor is not None and self._governor.shed_transitions()
+                if self._transition_duration > 0.0 and self._transition is not None and not shed:
                     if not self._paused:
                         self.transition_progress = self._elapsed / self._transition_duration
                 else:
                     self.transition_progress = 1.0
 
-                next_preset.tick(dt)
+                self._tick_preset(next_preset, "preset-next", dt)
 
             # If the scene tree is available, we can do efficient mixing of presets.
             # If not, a tree would need to be constructed on-the-fly.
             # TODO: Support mixing without a scene tree available
             if self._enable_rendering:
                 if self._in_transition:
-                    mixed_buffer = self.render_presets(
+                    mixed_buffer, color_space = self.render_presets(
                         active_preset, self._buffer_a,
                         next_preset, self._buffer_b,
                         self._in_transition, self._transition,
-                        self.transition_progress,
-                        check_for_nan=self._enable_profiling)
+                        self.transition_progress)
                 else:
-                    mixed_buffer = self.render_presets(
-                        active_preset, self._buffer_a,
-                        check_for_nan=self._enable_profiling)
-
-                # render_presets writes all the desired pixels to
-                # self._main_buffer.
-
-                # Apply the global dimmer to _main_buffer.
-                if self._global_dimmer < 1.0:
-                    mixed_buffer.T[1] *= self._global_dimmer
-                #else:
-                    # Global gamma correction.
-                    # TODO(jon): This should be a setting
-                    #mixed_buffer.T[1] = np.power(mixed_buffer.T[1], 4)
-
-                # Mod hue by 1 (to allow wrap-around) and clamp lightness and
-                # saturation to [0, 1].
-                mixed_buffer.T[0] = np.mod(mixed_buffer.T[0], 1.0)
-                np.clip(mixed_buffer.T[1], 0.0, 1.0, mixed_buffer.T[1])
-                np.clip(mixed_buffer.T[2], 0.0, 1.0, mixed_buffer.T[2])
-
-                # Write this buffer to enabled clients.
-                if self._net is not None:
-                    self._net.write_buffer(mixed_buffer)
+                    mixed_buffer, color_space = self.render_presets(
+                        active_preset, self._buffer_a)
+
+                # Recordings are made before post-processing, so that the dimmer
+                # and the other output settings still apply when they are replayed.
+                if self._recorder is not None:
+                    self._recorder.write(self._color_spaces.convert(mixed_buffer, color_space, "HLS"))
+
+                # Apply the global dimmer, strand trims, hue wrap, clamping
+                # and gamma/brightness curves.  mixed_buffer may be the active
+                # preset's own buffer, so the result goes into the post
+                # processor's output buffer rather than back into it.
+                start = monotonic()
+                frame = self._post_process.process(mixed_buffer, color_space)
+                stats.record("post-process", monotonic() - start)
+
+                self.write_output(frame, color_space)
             else:
                 if self._net is not None:
                     self._net.write_commands(active_preset.get_commands_packed())
@@ -386,12 +668,28 @@ class Mixer(QtCore.QObject):
             self._onset = False
             self._reset_onset = False
 
-        if self._enable_profiling:
-            tick_time = (time.time() - self._last_frame_time)
-            self._last_frame_time = time.time()
-            if tick_time > 0.0:
-                index = int((1.0 / tick_time))
-                self._tick_time_data[index] = self._tick_time_data.get(index, 0) + 1
+    def _tick_preset(self, preset, stage, dt):
+        """
+        Ticks preset, accounting its time to stage, less the time its
+        parameters took (which is accounted to parameter-tick)
+        """
+        stats = self.frame_stats
+        parameter_time = stats.pending("parameter-tick")
+        start = monotonic()
+        preset.tick(dt)
+        stats.add(stage, monotonic() - start - (stats.pending("parameter-tick") - parameter_time))
+
+    def write_output(self, buffer, color_space="HLS"):
+        """
+        Writes a finished frame (in color_space) to enabled clients, stamped
+        with its sequence number and the time it was finished
+        """
+        self._output_sequence += 1
+        stamp = (self._output_sequence, monotonic())
+        if self._output_pipeline is not None:
+            self._output_pipeline.submit(buffer, stamp, color_space)
+        elif self._net is not None:
+            self._net.write_buffer(buffer, stamp, color_space)
 
     def scene(self):
         return self._scene
@@ -399,35 +697,52 @@ class Mixer(QtCore.QObject):
     def render_presets(self, first_preset, first_buffer,
                        second_preset=None, second_buffer=None,
                        in_transition=False, transition=None,
-                       transition_progress=0.0, check_for_nan=False):
+                       transition_progress=0.0):
         """
         Grabs the command output from a preset with the index given by first.
         If a second preset index is given, render_preset will use a Transition class to generate the output
         according to transition_progress (0.0 = 100% first, 1.0 = 100% second)
+
+        Returns the frame and its color space (see core.color_space).
         """
 
+        stats = self.frame_stats
+        spaces = self._color_spaces
+
+        start = monotonic()
         first_buffer = first_preset.draw_to_buffer(first_buffer)
-        if check_for_nan:
-            for item in first_buffer.flat:
-                if math.isnan(item):
-                    raise ValueError
+        stats.add("preset-active", monotonic() - start)
+        self._sanitizer.check_preset(first_buffer, first_preset)
 
         if second_preset is not None:
+            start = monotonic()
             second_buffer = second_preset.draw_to_buffer(second_buffer)
-            if check_for_nan:
-                for item in second_buffer.flat:
-                    if math.isnan(item):
-                        raise ValueError
+            stats.add("preset-next", monotonic() - start)
+            self._sanitizer.check_preset(second_buffer, second_preset)
+
+        if second_preset is None or not in_transition or transition is None:
+            color_space = spaces.choose([first_preset])
+            return self._convert_preset(first_buffer, first_preset, color_space, 0), color_space
+
+        color_space = spaces.choose([first_preset, second_preset], transition)
+        first_buffer = self._convert_preset(first_buffer, first_preset, color_space, 0)
+        second_buffer = self._convert_preset(second_buffer, second_preset, color_space, 1)
+
+        start = monotonic()
+        first_buffer = spaces.blend(transition, first_buffer, second_buffer,
+                                    transition_progress, color_space)
+        stats.record("transition", monotonic() - start)
+        self._sanitizer.check_transition(first_buffer, transition)
 
-            if in_transition and transition is not None:
-                first_buffer = transition.get(first_buffer, second_buffer,
-                                              transition_progress)
-                if check_for_nan:
-                    for item in first_buffer.flat:
-                        if math.isnan(item):
-                            raise ValueError
+        return first_buffer, color_space
 
-        return first_buffer
+    def _convert_preset(self, buffer, preset, color_space, slot):
+        if preset.color_space == color_space:
+            return buffer
+        start = monotonic()
+        buffer = self._color_spaces.convert(buffer, preset.color_space, color_space, slot)
+        self.frame_stats.add("rgb-to-hls", monotonic() - start)
+        return buffer
 
     def reset_output_buffer(self):
         """
@@ -473,3 +788,68 @@ class Mixer(QtCore.QObject):
 
     def get_buffer_shape(self):
         return self._buffer_a.shape
+
+
+class TestTickScheduler(unittest.TestCase):
+
+    class Clock:
+
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.now += seconds
+
+    def run_frames(self, policy, costs, **kwargs):
+        """
+        Runs a scheduler at 8 Hz (so the times are exact in binary) on a fake
+        clock, with each frame taking the given time.  Returns the (start,
+        lateness, skipped) of every frame.
+        """
+        clock = self.Clock()
+        frames = []
+
+        def callback(lateness, skipped):
+            frames.append((clock.now, lateness, skipped))
+            clock.now += costs[len(frames) - 1]
+            if len(frames) == len(costs):
+                scheduler.stop()
+
+        scheduler = TickScheduler(callback, 8, policy, clock=clock, sleep=clock.sleep, **kwargs)
+        scheduler.run()
+        return frames, scheduler
+
+    def test_on_time(self):
+        frames, scheduler = self.run_frames("skip", [0.0625] * 4)
+        self.assertEqual(frames, [(0.125, 0.0, 0), (0.25, 0.0, 0), (0.375, 0.0, 0), (0.5, 0.0, 0)])
+        self.assertEqual(scheduler.overruns, 0)
+
+    def test_skip(self):
+        # The second frame overruns by 2.5 periods: two deadlines are dropped,
+        # and frames resume on the original grid.
+        frames, scheduler = self.run_frames("skip", [0.0625, 0.4375, 0.0625, 0.0625])
+        self.assertEqual(frames, [(0.125, 0.0, 0), (0.25, 0.0, 0), (0.6875, 0.0625, 2), (0.75, 0.0, 0)])
+        self.assertEqual(scheduler.get_stats()["skipped-frames"], 2)
+        self.assertEqual(scheduler.overruns, 1)
+
+    def test_catch_up(self):
+        # One missed frame is run late, back to back; the one beyond max_catch_up is skipped.
+        frames, scheduler = self.run_frames("catch-up", [0.0625, 0.4375, 0.0625, 0.0625, 0.0625, 0.0625],
+                                            max_catch_up=1)
+        self.assertEqual(frames, [(0.125, 0.0, 0), (0.25, 0.0, 0), (0.6875, 0.1875, 1),
+                                  (0.75, 0.125, 0), (0.8125, 0.0625, 0), (0.875, 0.0, 0)])
+        self.assertEqual(scheduler.skipped_frames, 1)
+
+    def test_stretch(self):
+        # The grid restarts from the end of the overrunning frame.
+        frames, scheduler = self.run_frames("stretch", [0.0625, 0.4375, 0.0625, 0.0625])
+        self.assertEqual(frames, [(0.125, 0.0, 0), (0.25, 0.0, 0), (0.6875, 0.0, 0), (0.8125, 0.0, 0)])
+        self.assertEqual(scheduler.skipped_frames, 0)
+        self.assertEqual(scheduler.overruns, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,126 +15,179 @@
 # You should have received a copy of the GNU General Public License
 # along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
 
-
-import sys
-import numpy as np
+import logging
 import socket
-import array
-import struct
-import time
-import zmq
 
 from collections import defaultdict
 
-from lib.colors import hls_to_rgb
 from lib.buffer_utils import BufferUtils
+from lib.clock import monotonic
+from lib.color_lut import HlsToRgbTable
+from lib.color_modes import ColorModeCache, client_mode
+from lib.frame_stats import FrameStats
+from lib.plugin_loader import PluginLoader
+from core.color_correction import ColorCorrection
+from core.dither import TemporalDither
 
-USE_ZMQ = True
-USE_OPC = True
+log = logging.getLogger("firemix.core.networking")
 
 
 class Networking:
+    """
+    Sends frames to the networking clients through the output drivers in
+    ./outputs/.
+
+    The output plan (which drivers have clients, and their encoders) is
+    compiled when the client list, the strand settings or the buffer size
+    change; the settings dialogs replace those lists rather than editing
+    them, so this is noticed without looking inside them.  Call
+    invalidate() after editing them in place.  Per-strand color correction
+    tables (see ColorCorrection) are rebuilt along with the plan.
+
+    Each frame is converted once to each color mode the clients use,
+    encoded once per mode by each active driver, and then sent.  If the
+    "dither" networking setting is on, RGB8 output is temporally dithered
+    (see TemporalDither); if "color-lut" is on, it is converted by table
+    lookup (see HlsToRgbTable).  If "sequence-stamps" is on, frames carry their
+    sequence number and time (see core.frame_stamp).
+
+    The lookup table takes a few hundred ms to fill, so it is built when
+    networking is set up and kept for later plans, rather than being
+    built in the middle of a frame.
+    """
 
     def __init__(self, app):
         self.socket = None
-        self.context = None
         self._app = app
         self.running = True
+        self.settings = None
         self.open_socket()
-        self._packet_cache = {}
-        self.port = 3020
-        self.opc_port = 7890
+        self.frame_stats = FrameStats()
+
+        self._frames = ColorModeCache()
+        self._correction8 = ColorCorrection(bits=8)
+        self._correction16 = ColorCorrection(bits=16)
+        self._dither = None
+        self._rgb_table = None
+        self._table_cache = None
+        self._stamps = False
+        self._sequence = 0
+        self._modes = []
+        self._plan_clients = None
+        self._plan_strand_settings = None
+        self._plan_size = None
+        self._active_drivers = []
+        self._drivers = {}
+        for cls in PluginLoader("outputs").get("OutputDriver"):
+            self._drivers[cls.protocol] = cls(self)
+
+        if self._app.settings['networking'].get('color-lut', False):
+            self._get_rgb_table(self._app.settings['networking'])
 
     def open_socket(self):
-        if USE_ZMQ:
-            self.context = zmq.Context()
-            self.zmq_socket = self.context.socket(zmq.PUB)
-            self.zmq_socket.bind("tcp://*:3020")
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
 
-    def write_buffer(self, buffer):
+    def _get_rgb_table(self, settings):
+        """
+        Returns the HlsToRgbTable for the color-lut-size setting, building it if the size changed
+        """
+        shape = tuple(settings.get('color-lut-size', [256, 257, 65]))
+        if self._table_cache is None or self._table_cache.shape != shape:
+            self._table_cache = HlsToRgbTable(*shape)
+        return self._table_cache
+
+    def invalidate(self):
+        """
+        Forces the output plan to be rebuilt on the next frame
+        """
+        self._plan_clients = None
+
+    def _build_plan(self, clients, strand_settings):
+        self.settings = self._app.settings['networking']
+        self._plan_clients = clients
+        self._plan_strand_settings = strand_settings
+        self._plan_size = BufferUtils.get_buffer_size()
+
+        clients_by_protocol = defaultdict(list)
+        for client in clients:
+            if client["enabled"]:
+                clients_by_protocol[client.get("protocol", "Legacy")].append(client)
+        for protocol in clients_by_protocol.keys():
+            if protocol not in self._drivers:
+                log.error("No output driver for protocol %s" % protocol)
+
+        extents = [BufferUtils.get_strand_extents(strand) for strand in xrange(len(strand_settings))]
+        self._correction8.build(strand_settings, extents, self._plan_size)
+        self._correction16.build(strand_settings, extents, self._plan_size)
+        if not self.settings.get('dither', False):
+            self._dither = None
+        elif self._dither is None or self._dither.size != self._plan_size:
+            self._dither = TemporalDither(self._plan_size)
+        if not self.settings.get('color-lut', False):
+            self._rgb_table = None
+        else:
+            self._rgb_table = self._get_rgb_table(self.settings)
+        self._frames.configure(self._correction8, self._correction16, self._dither, self._rgb_table)
+        self._stamps = self.settings.get('sequence-stamps', False)
+        self._active_drivers = []
+        modes = set()
+        for protocol, driver in sorted(self._drivers.iteritems()):
+            driver.build(clients_by_protocol[protocol], strand_settings, extents)
+            if clients_by_protocol[protocol]:
+                self._active_drivers.append(driver)
+                modes.update([client_mode(client) for client in clients_by_protocol[protocol]])
+        self._modes = sorted(modes)
+        log.info("Output plan: %s (%s)" % (", ".join([repr(d) for d in self._active_drivers]),
+                                           ", ".join(self._modes)))
+
+    def write_buffer(self, buffer, stamp=None, color_space="HLS"):
         """
         Performs a bulk strand write.
-        Decodes the HLS-Float data according to client settings
+        Converts the HLS-Float (or RGB-Float) data to the clients' color modes.
+        stamp is the frame's (sequence, time), if the caller numbers frames.
         """
+        clients = self._app.settings['networking']['clients']
         strand_settings = self._app.scene.get_strand_settings()
-        clients = [client for client in self._app.settings['networking']['clients'] if client["enabled"]]
-
-        clients_by_type = defaultdict(list)
-        for c in clients:
-            clients_by_type[c.get("protocol", "Legacy")].append(c)
-
-        have_zmq_clients = bool(clients_by_type.get("ZMQ", []))
-        legacy_clients = clients_by_type["Legacy"]
-        opc_clients = clients_by_type["OPC"]
-
-        # Protect against presets or transitions that write float data.
-        buffer_rgb = np.int_(hls_to_rgb(buffer) * 255)
-        np.clip(buffer_rgb, 0, 255, buffer_rgb)
-
-        def fill_packet(intbuffer, start, end, offset, packet, swap_order=False):
-            for pixel_index, pixel in enumerate(intbuffer[start:end]):
-                buffer_index = offset + pixel_index * 3
-                if swap_order:
-                    packet[buffer_index] = pixel[2]
-                    packet[buffer_index + 1] = pixel[1]
-                    packet[buffer_index + 2] = pixel[0]
-                else:
-                    packet[buffer_index] = pixel[0]
-                    packet[buffer_index + 1] = pixel[1]
-                    packet[buffer_index + 2] = pixel[2]
-
-        packets = []
-
-        for strand in xrange(len(strand_settings)):
-            if not strand_settings[strand]["enabled"]:
-                continue
-
-            start, end = BufferUtils.get_strand_extents(strand)
-
-            packet_header_size = 4
-            packet_size = (end-start) * 3 + packet_header_size
-
-            try:
-                packet = self._packet_cache[packet_size]
-            except KeyError:
-                packet = [0,] * packet_size
-                self._packet_cache[packet_size] = packet
-
-            length = packet_size - packet_header_size
-
-            packet[0] = ord('S')
-            packet[1] = strand
-            packet[2] = length & 0x00FF
-            packet[3] = (length & 0xFF00) >> 8
-
-            fill_packet(buffer_rgb, start, end, packet_header_size, packet, False)
-            packets.append(array.array('B', packet))
-
-        if USE_ZMQ and have_zmq_clients:
-            frame = ["B"] + packets + ["E"]
-            self.socket.send_multipart(frame)
-
-        for client in legacy_clients:
-            self.socket.sendto(array.array('B', [ord('B')]), (client["host"], client["port"]))
-            for packet in packets:
-                self.socket.sendto(packet, (client["host"], client["port"]))
-            self.socket.sendto(array.array('B', [ord('E')]), (client["host"], client["port"]))
-
-        for client in opc_clients:
-            # TODO: This is hacky, but for now we re-write the packet for OPC here...
-            # Fortunately, OPC happens to look a lot like our existing protocol...
-            # Byte 0 is channel (aka strand).  0 is broadcast address, indexing starts at 1.
-            # Byte 1 is command, always 0 for "set pixel colors"
-            # Bytes 2 and 3 are big-endian length of the data block.
-            # Note: LEDScape needs the strands all concatenated together which is annoying
-            packet[0] = packet[1] + 1
-            tpacket = [0x00, 0x00, 0x00, 0x00]
-            for packet in packets:
-                tpacket += packet[4:]
-            tlen = len(tpacket) - 4
-            tpacket[2] = (tlen & 0xFF00) >> 8
-            tpacket[3] = (tlen & 0xFF)
-            tpacket = array.array('B', tpacket)
-            self.socket.sendto(tpacket, (client["host"], client["port"]))
+        if (clients is not self._plan_clients or strand_settings is not self._plan_strand_settings
+                or BufferUtils.get_buffer_size() != self._plan_size):
+            self._build_plan(clients, strand_settings)
+
+        if not self._active_drivers:
+            return
+
+        start = monotonic()
+        if self._stamps and stamp is None:
+            self._sequence += 1
+            stamp = (self._sequence, start)
+        self._frames.set_frame(buffer, stamp if self._stamps else None, color_space)
+        for mode in self._modes:
+            self._frames.get(mode)
+        converted = monotonic()
+
+        for driver in self._active_drivers:
+            driver.encode(self._frames)
+        packed = monotonic()
+
+        for driver in self._active_drivers:
+            driver.send()
+
+        self.frame_stats.record("hls-to-rgb", converted - start)
+        self.frame_stats.record("packet-build", packed - converted)
+        self.frame_stats.record("socket-send", monotonic() - packed)
+
+    def get_protocols(self):
+        """
+        Returns the protocol names of the loaded output drivers
+        """
+        return sorted(self._drivers.keys())
+
+    def get_output_stats(self):
+        """
+        Returns the statistics of each output driver with clients, keyed by protocol
+        """
+        return dict([(driver.protocol, driver.get_stats()) for driver in self._active_drivers])
+
+    def stop(self):
+        for driver in self._drivers.itervalues():
+            driver.stop()
@@ -0,0 +1,216 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import logging
+import select
+import socket
+import numpy as np
+
+from lib.clock import monotonic
+from lib.color_modes import pixel_channels
+from core.frame_stamp import OPC_STAMP_SYSTEM_ID, OPC_SYSEX_COMMAND, STAMP_SIZE, pack_stamp
+
+log = logging.getLogger("firemix.core.opc")
+
+
+class OpcEncoder:
+    """
+    Encodes frames into a single OPC packet, with all enabled strands
+    concatenated behind one header (LEDScape needs this).
+
+    OPC packet: channel (0 = broadcast), command (0 = set pixel colors),
+                length (big-endian uint16), pixel data in the client's color mode
+
+    The header is written when the layout is built, so packing a frame is
+    one gather from the RGB8 frame straight into the packet buffer.
+
+    If built with stamp=True, a frame stamp message (see core.frame_stamp)
+    comes first.  packet is then both messages (for streams), and packets
+    has them separately (for datagrams).
+    """
+
+    HEADER_SIZE = 4
+
+    def __init__(self):
+        self.frame = None
+        self.packet = None
+        self.packets = []
+        self.bounds = []
+        self._index = None
+        self._data_start = self.HEADER_SIZE
+
+    def build(self, strand_settings, extents, mode="RGB8", stamp=False):
+        ranges = [pixel_channels(extents[strand][0], extents[strand][1], mode,
+                                 strand_settings[strand].get("color-mode", "RGB8"))
+                  for strand in xrange(len(strand_settings)) if strand_settings[strand]["enabled"]]
+        self._index = np.concatenate(ranges or [np.zeros(0, dtype=np.intp)])
+        length = len(self._index)
+        stamp_length = 2 + STAMP_SIZE
+        start = self.HEADER_SIZE + stamp_length if stamp else 0
+        self.frame = np.zeros(start + self.HEADER_SIZE + length, dtype=np.uint8)
+        if stamp:
+            self.frame[:self.HEADER_SIZE + 2] = (0x00, OPC_SYSEX_COMMAND, 0x00, stamp_length,
+                                                 OPC_STAMP_SYSTEM_ID >> 8, OPC_STAMP_SYSTEM_ID & 0xFF)
+        self.frame[start:start + self.HEADER_SIZE] = (0x00, 0x00, (length & 0xFF00) >> 8, length & 0xFF)
+        self._data_start = start + self.HEADER_SIZE
+        self.packet = memoryview(self.frame)
+        self.bounds = [(0, start), (start, len(self.frame))] if stamp else [(0, len(self.frame))]
+        self.packets = [self.packet[a:b] for a, b in self.bounds]
+
+    def set_stamp(self, stamp):
+        """
+        Writes the (sequence, time) stamp of the frame being packed
+        """
+        pack_stamp(stamp, self.frame[self.HEADER_SIZE + 2:self.HEADER_SIZE + 2 + STAMP_SIZE])
+
+    def pack(self, flat):
+        """
+        Gathers a flat frame (see ColorModeCache) into the packet
+        """
+        np.take(flat, self._index, out=self.frame[self._data_start:])
+
+
+class OpcTcpClient:
+    """
+    A persistent, non-blocking TCP connection to an OPC server.
+
+    send() never blocks.  If the kernel can't take a whole frame, the rest
+    is kept and written out on the following calls, and new frames are
+    dropped until it has gone (a partial frame can't be abandoned without
+    corrupting the stream).  If the connection fails or is closed by the
+    server, it is re-established in the background, at most once every
+    reconnect_interval seconds; frames are dropped while disconnected.
+    """
+
+    def __init__(self, host, port, reconnect_interval=1.0):
+        self.address = (host, port)
+        self._reconnect_interval = reconnect_interval
+        self._socket = None
+        self._connecting = False
+        self._connected = False
+        self._last_attempt = None
+        self._remainder = None
+
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.connects = 0
+        self.disconnects = 0
+
+    def _connect(self):
+        now = monotonic()
+        if self._last_attempt is not None and now - self._last_attempt < self._reconnect_interval:
+            return
+        self._last_attempt = now
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.setblocking(0)
+        error = self._socket.connect_ex(self.address)
+        if error in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self._connecting = True
+        else:
+            self._close(error)
+
+    def _check_connected(self):
+        writable = select.select([], [self._socket], [], 0)[1]
+        if not writable:
+            return
+        self._connecting = False
+        error = self._socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            self._close(error)
+            return
+        self._connected = True
+        self.connects += 1
+        log.info("Connected to OPC server %s:%d" % self.address)
+
+    def _close(self, error):
+        if self._connected:
+            self.disconnects += 1
+            log.warn("Lost connection to OPC server %s:%d: %s" %
+                     (self.address[0], self.address[1], errno.errorcode.get(error, error)))
+        elif self.connects == 0 and self._last_attempt is not None and error:
+            log.debug("Could not connect to OPC server %s:%d: %s" %
+                      (self.address[0], self.address[1], errno.errorcode.get(error, error)))
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = None
+        self._connecting = False
+        self._connected = False
+        self._remainder = None
+
+    def _write(self, data):
+        """
+        Writes as much of data as the socket will take.  Returns the number
+        of bytes written, or None if the connection was lost.
+        """
+        try:
+            return self._socket.send(data)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return 0
+            self._close(e.errno)
+            return None
+
+    def send(self, packet):
+        """
+        Sends an OPC packet (a buffer), or drops it if the connection is down or busy.
+        Returns True if the whole packet was handed to the kernel.
+        """
+        if self._socket is None:
+            self._connect()
+        if self._connecting:
+            self._check_connected()
+        if not self._connected:
+            self.dropped_frames += 1
+            return False
+
+        if self._remainder is not None:
+            sent = self._write(self._remainder)
+            if sent is not None:
+                self._remainder = self._remainder[sent:] if sent < len(self._remainder) else None
+            if self._remainder is not None or sent is None:
+                self.dropped_frames += 1
+                return False
+
+        data = memoryview(packet)
+        sent = self._write(data)
+        if not sent:
+            # Nothing written (socket full or connection lost), so nothing to finish later.
+            self.dropped_frames += 1
+            return False
+        self.sent_frames += 1
+        if sent < len(data):
+            # Copy the rest out, since the encoder reuses its buffer next frame.
+            self._remainder = memoryview(data[sent:].tobytes())
+            return False
+        return True
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        self._connecting = False
+        self._connected = False
+
+    def get_stats(self):
+        return {"connected": self._connected,
+                "sent-frames": self.sent_frames,
+                "dropped-frames": self.dropped_frames,
+                "connects": self.connects,
+                "disconnects": self.disconnects}
@@ -0,0 +1,104 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import Queue
+
+from lib.buffer_utils import BufferUtils
+
+log = logging.getLogger("firemix.core.output_pipeline")
+
+
+class OutputPipeline(threading.Thread):
+    """
+    Decouples rendering from output.  The mixer submits each finished frame,
+    which is copied into one of a small ring of handoff buffers (two for
+    double buffering, three for triple buffering).  A dedicated sender thread
+    then converts, encodes and transmits the frame while the mixer is already
+    rendering the next one.
+
+    If the mixer finishes a frame while every handoff buffer is busy, that is
+    counted as a stall.  The oldest frame still waiting to be sent is dropped
+    to make room, so the sender always works on the freshest data and the
+    render thread is never blocked by the network.
+    """
+
+    def __init__(self, net, depth=2):
+        threading.Thread.__init__(self, name="OutputPipeline")
+        self.daemon = True
+        self._net = net
+        self._depth = max(2, depth)
+        self._free = Queue.Queue()
+        self._ready = Queue.Queue()
+        self._running = False
+
+        for i in xrange(self._depth):
+            self._free.put(BufferUtils.create_buffer())
+
+        self.submitted_frames = 0
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.stalls = 0
+
+    def submit(self, buffer, stamp=None, color_space="HLS"):
+        """
+        Queues a copy of buffer, and its frame stamp and color space, for output.
+        Returns immediately.
+        """
+        try:
+            slot = self._free.get_nowait()
+        except Queue.Empty:
+            self.stalls += 1
+            try:
+                slot, dropped_stamp, dropped_color_space = self._ready.get_nowait()
+                self.dropped_frames += 1
+            except Queue.Empty:
+                # The sender holds every buffer; wait for it to hand one back.
+                slot = self._free.get()
+
+        slot[:] = buffer
+        self.submitted_frames += 1
+        self._ready.put((slot, stamp, color_space))
+
+    def run(self):
+        self._running = True
+        while self._running:
+            item = self._ready.get()
+            if item is None:
+                break
+            slot, stamp, color_space = item
+            try:
+                self._net.write_buffer(slot, stamp, color_space)
+                self.sent_frames += 1
+            except:
+                log.exception("Exception raised while sending frame")
+            self._free.put(slot)
+
+    def stop(self):
+        self._running = False
+        self._ready.put(None)
+
+    def get_stats(self):
+        """
+        Returns a dictionary of pipeline statistics
+        """
+        return {"depth": self._depth,
+                "submitted-frames": self.submitted_frames,
+                "sent-frames": self.sent_frames,
+                "dropped-frames": self.dropped_frames,
+                "stalls": self.stalls}
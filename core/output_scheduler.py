@@ -0,0 +1,202 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import socket
+import threading
+import numpy as np
+
+from core.delta_filter import DeltaFilter
+from lib.clock import monotonic
+from lib.frame_stats import FrameStats
+
+log = logging.getLogger("firemix.core.output_scheduler")
+
+
+class ClientWorker(threading.Thread):
+    """
+    Sends frames to a single client from its own thread, so that a slow or
+    unreachable host only delays itself.
+
+    The worker holds at most one pending frame.  Submitting a frame while
+    the previous one is still pending replaces it (latest frame wins) and
+    counts the replaced frame as dropped.  A frame is counted as late if a
+    newer frame was submitted while it was being sent.  Send latency is the
+    time from submit() until the last packet of the frame has been sent.
+
+    Frames are a uint8 array plus a list of (start, end) packet bounds into
+    it; begin and end, if given, are sent before and after the packets.
+    If a DeltaFilter is given, only packets that changed since the last
+    frame sent to this client are sent.
+    """
+
+    def __init__(self, protocol, host, port, begin=None, end=None, delta=None):
+        threading.Thread.__init__(self, name="ClientWorker %s %s:%d" % (protocol, host, port))
+        self.daemon = True
+        self.protocol = protocol
+        self.address = (host, port)
+        self._begin = begin
+        self._end = end
+        self._delta = delta
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+        self._condition = threading.Condition()
+        self._running = True
+        self._pending = None
+        self._pending_bounds = None
+        self._pending_time = 0.0
+        self._has_pending = False
+
+        self.submitted_frames = 0
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.errors = 0
+        self.latency = FrameStats(256)
+
+    def submit(self, frame, bounds):
+        """
+        Queues a copy of frame for sending.  Returns immediately.
+        """
+        with self._condition:
+            if self._has_pending:
+                self.dropped_frames += 1
+            if self._pending is None or self._pending.shape != frame.shape:
+                self._pending = np.empty_like(frame)
+            self._pending[:] = frame
+            self._pending_bounds = bounds
+            self._pending_time = monotonic()
+            self._has_pending = True
+            self.submitted_frames += 1
+            self._condition.notify()
+
+    def run(self):
+        sending = None
+        while True:
+            with self._condition:
+                while self._running and not self._has_pending:
+                    self._condition.wait()
+                if not self._running:
+                    break
+                # Swap buffers, so the next submit() copies into the one we just sent.
+                sending, self._pending = self._pending, sending
+                bounds = self._pending_bounds
+                submitted_time = self._pending_time
+                submitted_frames = self.submitted_frames
+                self._has_pending = False
+
+            view = memoryview(sending)
+            if self._delta is not None:
+                bounds = [bounds[i] for i in self._delta.select(sending, bounds)]
+            try:
+                if self._begin is not None:
+                    self._socket.sendto(self._begin, self.address)
+                for start, end in bounds:
+                    self._socket.sendto(view[start:end], self.address)
+                if self._end is not None:
+                    self._socket.sendto(self._end, self.address)
+                self.sent_frames += 1
+            except socket.error as e:
+                self.errors += 1
+                if self.errors == 1:
+                    log.warn("Error sending to %s:%d: %s" % (self.address[0], self.address[1], e))
+
+            self.latency.record("send-latency", monotonic() - submitted_time)
+            if self.submitted_frames != submitted_frames:
+                self.late_frames += 1
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def get_stats(self):
+        """
+        Returns a dictionary of send counters and latency percentiles (in ms)
+        """
+        stats = {"protocol": self.protocol,
+                 "submitted-frames": self.submitted_frames,
+                 "sent-frames": self.sent_frames,
+                 "dropped-frames": self.dropped_frames,
+                 "late-frames": self.late_frames,
+                 "errors": self.errors,
+                 "send-latency": self.latency.stage_stats("send-latency")}
+        if self._delta is not None:
+            stats.update(self._delta.get_stats())
+        return stats
+
+
+class OutputScheduler:
+    """
+    Keeps one ClientWorker per client of an output driver, and hands each
+    of them the driver's packets every frame.  If keyframe_interval is set,
+    clients get delta frames (see DeltaFilter).
+    """
+
+    def __init__(self, begin=None, end=None, keyframe_interval=None):
+        self._begin = begin
+        self._end = end
+        self.keyframe_interval = keyframe_interval
+        self._clients_key = None
+        self._workers = {}
+
+    def update_clients(self, clients):
+        """
+        Starts workers for new clients and stops workers for removed ones.
+        Cheap to call every frame if the clients haven't changed.
+        """
+        key = tuple([(c.get("protocol", "Legacy"), c["host"], c["port"]) for c in clients])
+        if key == self._clients_key:
+            return
+        self._clients_key = key
+
+        for client_key in self._workers.keys():
+            if client_key not in key:
+                self._workers.pop(client_key).stop()
+
+        for client_key in key:
+            if client_key not in self._workers:
+                protocol, host, port = client_key
+                delta = None
+                if self.keyframe_interval is not None:
+                    delta = DeltaFilter(self.keyframe_interval)
+                worker = ClientWorker(protocol, host, port, self._begin, self._end, delta)
+                worker.start()
+                self._workers[client_key] = worker
+
+    def submit(self, frame, bounds):
+        """
+        Queues frame for every worker
+        """
+        for worker in self._workers.itervalues():
+            worker.submit(frame, bounds)
+
+    def stop(self):
+        for worker in self._workers.itervalues():
+            worker.stop()
+        for worker in self._workers.itervalues():
+            worker.join(1.0)
+        self._workers = {}
+        self._clients_key = None
+
+    def get_stats(self):
+        """
+        Returns get_stats() of every worker, keyed by "host:port"
+        """
+        return dict([("%s:%d" % (host, port), worker.get_stats())
+                     for (protocol, host, port), worker in self._workers.iteritems()])
@@ -0,0 +1,206 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+import numpy as np
+
+from lib.buffer_utils import BufferUtils
+
+log = logging.getLogger("firemix.core.post_process")
+
+
+class PostProcessor:
+    """
+    Applies the final adjustments to the mixed HLS buffer:
+
+        lightness *= per-strand trim * global dimmer
+        hue = hue mod 1.0
+        lightness, saturation clamped to [0, 1]
+        lightness = brightness_curve(lightness ** gamma)
+
+    RGB buffers get the same adjustments applied to each channel in place
+    of lightness (without the hue wrap).
+
+    The dimmer and trims are folded into a single per-pixel gain array, and
+    gamma and the brightness curve into a single lookup table, so each frame
+    is one multiply, one mod, one clip and (if a curve is set) one table
+    lookup.  The result goes into an output buffer owned by the
+    PostProcessor, never into the mixed buffer, which may be a preset's own
+    pixel buffer that the preset reads back on its next frame.  The output
+    and scratch arrays are allocated up front; call rebuild() if the buffer
+    size changes.
+
+    Strand trims come from the "trim" key of each entry in the scene's
+    strand-settings (default 1.0).  The brightness curve is a list of
+    [input, output] control points, linearly interpolated.
+    """
+
+    LUT_SIZE = 4096
+
+    def __init__(self, scene, gamma=1.0, brightness_curve=None):
+        self._scene = scene
+        self._gamma = gamma
+        self._brightness_curve = brightness_curve
+        self._dimmer = 1.0
+        self._strand_settings = None
+        self.rebuild()
+
+    def rebuild(self):
+        size = BufferUtils.get_buffer_size()
+        self._trim = np.ones(size, dtype=np.float32)
+        self._gain = np.ones(size, dtype=np.float32)
+        self._scratch = np.zeros(size, dtype=np.float32)
+        self._index = np.zeros(size, dtype=np.intp)
+        self._output = np.zeros((size, 3), dtype=np.float32)
+        self._build_trims()
+        self._build_lut()
+
+    def _build_trims(self):
+        self._strand_settings = self._scene.get_strand_settings()
+        self._trim[:] = 1.0
+        for strand, settings in enumerate(self._strand_settings or []):
+            trim = settings.get("trim", 1.0)
+            if trim != 1.0:
+                start, end = BufferUtils.get_strand_extents(strand)
+                self._trim[start:end] = trim
+        self._has_trim = bool(np.any(self._trim != 1.0))
+        self._update_gain()
+
+    def _build_lut(self):
+        if self._gamma == 1.0 and not self._brightness_curve:
+            self._lut = None
+            return
+
+        lut = np.linspace(0.0, 1.0, self.LUT_SIZE)
+        if self._gamma != 1.0:
+            lut = np.power(lut, self._gamma)
+        if self._brightness_curve:
+            xs, ys = zip(*sorted(self._brightness_curve))
+            lut = np.interp(lut, xs, ys)
+        self._lut = np.clip(lut, 0.0, 1.0).astype(np.float32)
+
+    def _update_gain(self):
+        np.multiply(self._trim, self._dimmer, self._gain)
+        self._apply_gain = self._has_trim or self._dimmer < 1.0
+
+    def set_dimmer(self, dimmer):
+        self._dimmer = dimmer
+        self._update_gain()
+
+    def set_gamma(self, gamma):
+        self._gamma = gamma
+        self._build_lut()
+
+    def set_brightness_curve(self, curve):
+        self._brightness_curve = curve
+        self._build_lut()
+
+    def _apply_lut(self, values):
+        np.multiply(values, self.LUT_SIZE - 1, self._scratch)
+        np.add(self._scratch, 0.5, self._scratch)
+        self._index[:] = self._scratch
+        np.take(self._lut, self._index, out=self._scratch)
+        values[:] = self._scratch
+
+    def process(self, buffer, color_space="HLS"):
+        """
+        Returns buffer (in color_space, "HLS" or "RGB") post-processed, in the
+        output buffer.  buffer is left untouched, and the output buffer is
+        overwritten by the next call.
+        """
+        # The settings dialog replaces the strand settings list when strands are edited.
+        if self._scene.get_strand_settings() is not self._strand_settings:
+            self._build_trims()
+
+        self._output[:] = buffer
+        buffer = self._output
+
+        if color_space == "RGB":
+            if self._apply_gain:
+                np.multiply(buffer, self._gain[:, np.newaxis], buffer)
+            np.clip(buffer, 0.0, 1.0, buffer)
+            if self._lut is not None:
+                for channel in xrange(3):
+                    self._apply_lut(buffer[:, channel])
+            return buffer
+
+        hues = buffer[:, 0]
+        lightness = buffer[:, 1]
+
+        if self._apply_gain:
+            np.multiply(lightness, self._gain, lightness)
+
+        # Mod hue by 1 (to allow wrap-around) and clamp lightness and
+        # saturation to [0, 1].
+        np.mod(hues, 1.0, hues)
+        np.clip(buffer[:, 1:], 0.0, 1.0, buffer[:, 1:])
+
+        if self._lut is not None:
+            self._apply_lut(lightness)
+
+        return buffer
+
+
+class TestPostProcessor(unittest.TestCase):
+
+    class Scene:
+
+        def get_strand_settings(self):
+            return None
+
+    def setUp(self):
+        self._buffer_length = BufferUtils._buffer_length
+        BufferUtils._buffer_length = 3
+
+    def tearDown(self):
+        BufferUtils._buffer_length = self._buffer_length
+
+    def test_rgb(self):
+        post = PostProcessor(self.Scene(), gamma=2.0)
+        post.set_dimmer(0.5)
+        rgb = np.array([[1.0, 0.5, 0.0], [2.0, -1.0, 0.8], [0.2, 0.4, 0.6]], dtype=np.float32)
+        original = rgb.copy()
+        expected = np.clip(rgb * 0.5, 0.0, 1.0) ** 2.0
+        out = post.process(rgb, "RGB")
+        self.assertTrue(np.allclose(out, expected, atol=1e-3))
+        self.assertTrue(np.array_equal(rgb, original))
+
+    def test_hls(self):
+        post = PostProcessor(self.Scene(), gamma=2.0)
+        post.set_dimmer(0.5)
+        hls = np.array([[1.25, 1.0, 0.5], [-0.25, 0.5, 2.0], [0.5, 0.2, 0.6]], dtype=np.float32)
+        original = hls.copy()
+        out = post.process(hls)
+        self.assertTrue(np.allclose(out[:, 0], [0.25, 0.75, 0.5]))
+        self.assertTrue(np.allclose(out[:, 1], [0.25, 0.0625, 0.01], atol=1e-3))
+        self.assertTrue(np.allclose(out[:, 2], [0.5, 1.0, 0.6]))
+
+    def test_repeated_frames(self):
+        # A preset that draws into the same buffer every frame must not be dimmed again each frame
+        post = PostProcessor(self.Scene(), gamma=2.0)
+        post.set_dimmer(0.5)
+        hls = np.array([[0.1, 0.8, 1.0], [0.2, 0.4, 1.0], [0.3, 0.6, 1.0]], dtype=np.float32)
+        first = post.process(hls).copy()
+        for i in range(5):
+            out = post.process(hls)
+        self.assertTrue(np.array_equal(out, first))
+        self.assertTrue(np.allclose(hls[:, 1], [0.8, 0.4, 0.6]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+import numpy as np
+
+log = logging.getLogger("firemix.core.sanitizer")
+
+
+class FrameSanitizer:
+    """
+    Finds NaN and Inf values in frame buffers and replaces them with zero,
+    in place.
+
+    The clean case costs a single sum over the buffer: the sum of a buffer
+    is only finite if every element is.  Only when it isn't do we build a
+    mask (into a preallocated array) and patch the bad values.
+
+    Incidents are counted per preset and per transition.  Once a preset has
+    produced bad frames quarantine_threshold times, quarantine(preset) is
+    called (once).
+    """
+
+    def __init__(self, quarantine_threshold=30, quarantine=None):
+        self._quarantine_threshold = quarantine_threshold
+        self._quarantine = quarantine
+        self._mask = None
+        self.preset_incidents = {}
+        self.transition_incidents = {}
+        self.quarantined = set()
+
+    def sanitize(self, buffer):
+        """
+        Replaces non-finite values in buffer with 0.0.  Returns the number of
+        values replaced.
+        """
+        if np.isfinite(np.add.reduce(buffer, axis=None)):
+            return 0
+
+        if self._mask is None or self._mask.shape != buffer.shape:
+            self._mask = np.zeros(buffer.shape, dtype=bool)
+        np.isfinite(buffer, self._mask)
+        np.logical_not(self._mask, self._mask)
+        bad = np.count_nonzero(self._mask)
+        buffer[self._mask] = 0.0
+        return bad
+
+    def check_preset(self, buffer, preset):
+        bad = self.sanitize(buffer)
+        if bad:
+            name = preset.name()
+            count = self.preset_incidents.get(name, 0) + 1
+            self.preset_incidents[name] = count
+            if count == 1:
+                log.warn("Preset %s produced %d NaN/Inf values" % (name, bad))
+            if count >= self._quarantine_threshold and name not in self.quarantined:
+                log.error("Quarantining %s after %d bad frames" % (name, count))
+                self.quarantined.add(name)
+                if self._quarantine is not None:
+                    self._quarantine(preset)
+        return bad
+
+    def check_transition(self, buffer, transition):
+        bad = self.sanitize(buffer)
+        if bad:
+            name = str(transition)
+            count = self.transition_incidents.get(name, 0) + 1
+            self.transition_incidents[name] = count
+            if count == 1:
+                log.warn("Transition %s produced %d NaN/Inf values" % (name, bad))
+        return bad
+
+    def get_stats(self):
+        """
+        Returns the incident counts for presets and transitions, and the quarantined presets
+        """
+        return {"presets": dict(self.preset_incidents),
+                "transitions": dict(self.transition_incidents),
+                "quarantined": sorted(self.quarantined)}
+
+
+class TestFrameSanitizer(unittest.TestCase):
+
+    class Preset:
+
+        def name(self):
+            return "Broken"
+
+    def test_sanitize(self):
+        sanitizer = FrameSanitizer()
+        buffer = np.array([[0.5, np.nan, 1.0], [np.inf, 0.25, -np.inf], [0.0, 0.75, 2.0]], dtype=np.float32)
+        expected = np.array([[0.5, 0.0, 1.0], [0.0, 0.25, 0.0], [0.0, 0.75, 2.0]], dtype=np.float32)
+        self.assertEqual(sanitizer.sanitize(buffer), 3)
+        self.assertTrue(np.array_equal(buffer, expected))
+
+        # Clean buffers (including finite values out of [0, 1]) are left alone
+        self.assertEqual(sanitizer.sanitize(buffer), 0)
+        self.assertTrue(np.array_equal(buffer, expected))
+
+    def test_quarantine(self):
+        quarantined = []
+        sanitizer = FrameSanitizer(quarantine_threshold=3, quarantine=quarantined.append)
+        preset = self.Preset()
+        clean = np.zeros((4, 3), dtype=np.float32)
+        for i in range(5):
+            self.assertEqual(sanitizer.check_preset(clean, preset), 0)
+        self.assertEqual(quarantined, [])
+
+        for i in range(2):
+            sanitizer.check_preset(np.array([[np.nan, 0.0, 0.0]], dtype=np.float32), preset)
+        self.assertEqual(quarantined, [])
+        for i in range(3):
+            sanitizer.check_preset(np.array([[np.nan, 0.0, 0.0]], dtype=np.float32), preset)
+        self.assertEqual(quarantined, [preset])
+        self.assertEqual(sanitizer.get_stats(), {"presets": {"Broken": 5}, "transitions": {},
+                                                 "quarantined": ["Broken"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
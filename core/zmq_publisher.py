@@ -0,0 +1,92 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import zmq
+
+from core.legacy import LEGACY_FRAME_BEGIN, LEGACY_FRAME_END
+
+
+class ZmqPublisher:
+    """
+    Publishes frames on a ZMQ PUB socket, one multipart message per frame:
+    LEGACY_FRAME_BEGIN, one part per strand in the Legacy packet format, and
+    LEGACY_FRAME_END.
+
+    The strand parts are memoryviews of a LegacyEncoder's frame buffer,
+    sent with copy=False, so ZMQ holds a reference to the buffer until it
+    has been written out.  To keep the encoder from overwriting a frame
+    that is still queued, the publisher keeps a ring of frame buffers and
+    hands the encoder the next one after every send.
+
+    Sends never block: the PUB socket silently drops messages for
+    subscribers that are more than hwm frames behind (so drops can't be
+    counted here), and a small hwm keeps the frames a slow subscriber does
+    get close to the newest.  If a ring buffer is
+    still held by ZMQ when its turn comes round, it is left to ZMQ and
+    replaced with a new one rather than waited for.
+    """
+
+    def __init__(self, context, port=3020, hwm=2):
+        self.port = port
+        self.hwm = hwm
+        self.socket = context.socket(zmq.PUB)
+        self.socket.setsockopt(zmq.SNDHWM, hwm)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind("tcp://*:%d" % port)
+
+        self._frames = []
+        self._trackers = []
+        self._next = 0
+        self.frames_sent = 0
+        self.buffers_replaced = 0
+
+    def reset(self, encoder):
+        """
+        Builds the ring of frame buffers.  Must be called whenever the encoder's layout is rebuilt.
+        """
+        # The encoder's current buffer is the first slot; the others are
+        # copies of it, so that they carry the same packet headers.
+        self._frames = [encoder.frame] + [np.copy(encoder.frame) for i in xrange(self.hwm + 1)]
+        self._trackers = [None] * len(self._frames)
+        self._next = 0
+
+    def send(self, encoder):
+        """
+        Publishes the frame most recently packed by encoder.
+        """
+        self._trackers[self._next] = self.socket.send_multipart(
+            [LEGACY_FRAME_BEGIN] + encoder.packets + [LEGACY_FRAME_END],
+            flags=zmq.NOBLOCK, copy=False, track=True)
+        self.frames_sent += 1
+
+        self._next = (self._next + 1) % len(self._frames)
+        tracker = self._trackers[self._next]
+        if tracker is not None and not tracker.done:
+            self._frames[self._next] = np.copy(encoder.frame)
+            self._trackers[self._next] = None
+            self.buffers_replaced += 1
+        encoder.set_frame(self._frames[self._next])
+
+    def close(self):
+        self.socket.close()
+
+    def get_stats(self):
+        return {"port": self.port,
+                "hwm": self.hwm,
+                "frames-sent": self.frames_sent,
+                "buffers-replaced": self.buffers_replaced}
@@ -20,6 +20,7 @@ import functools
 import logging
 import signal
 import sys
+import time
 
 from PySide import QtCore, QtGui
 
@@ -47,6 +48,10 @@ def main():
     parser.add_argument("--preset", type=str, help="Specify a preset name to run only that preset (useful for debugging)")
     parser.add_argument("--verbose", action='store_const', const=True, default=False, help="Enable verbose log output")
     parser.add_argument("--noaudio", action='store_const', const=True, default=False, help="Disable audio processing client")
+    parser.add_argument("--record", type=str, default=None, help="Record output frames to this file")
+    parser.add_argument("--record-seconds", type=float, default=600.0,
+                        help="Length of the recording to preallocate, in seconds (default: 600)")
+    parser.add_argument("--replay", type=str, default=None, help="Replay a recording instead of the playlist")
 
     args = parser.parse_args()
 
@@ -83,6 +88,41 @@ def main():
         print "%d frames in %0.2f seconds (%0.2f FPS) " %  (app.mixer._num_frames, elapsed, app.mixer._num_frames / elapsed)
         for c in sorted(app.mixer._tick_time_data.iterkeys()):
             print "[%d fps]:\t%4d\t%0.2f%%" % (c, app.mixer._tick_time_data[c], (float(app.mixer._tick_time_data[c]) / app.mixer._num_frames) * 100.0)
+        print "------ FRAME STAGE TIMES (ms) ------"
+        print app.mixer.frame_stats.format_table()
+        print "------ SCHEDULER ------"
+        for k, v in sorted(app.mixer.get_scheduler_stats().iteritems()):
+            print "%s: %s" % (k, v)
+        sanitizer_stats = app.mixer.get_sanitizer_stats()
+        if sanitizer_stats["presets"] or sanitizer_stats["transitions"]:
+            print "------ NaN/Inf INCIDENTS ------"
+            for name, count in sorted(sanitizer_stats["presets"].iteritems()):
+                print "preset %s: %d" % (name, count)
+            for name, count in sorted(sanitizer_stats["transitions"].iteritems()):
+                print "transition %s: %d" % (name, count)
+            if sanitizer_stats["quarantined"]:
+                print "quarantined: %s" % ", ".join(sanitizer_stats["quarantined"])
+        governor_state = app.mixer.get_governor_state()
+        if governor_state:
+            print "------ FRAME GOVERNOR ------"
+            print "level %d of %d, tick rate %0.1f, %d changes" % (
+                governor_state["level"], governor_state["max-level"],
+                governor_state["tick-rate"], governor_state["changes"])
+            for (when, level, tick_rate, cost) in governor_state["history"]:
+                print "%s: level %d, tick rate %0.1f (mean tick cost %0.1f ms)" % (
+                    time.strftime("%H:%M:%S", time.localtime(when)), level, tick_rate, cost * 1000.0)
+        output_stats = app.net.get_output_stats()
+        if output_stats:
+            print "------ OUTPUTS ------"
+            for protocol, stats in sorted(output_stats.iteritems()):
+                for name, values in sorted(stats.iteritems()):
+                    print "%s %s: %s" % (protocol, name, ", ".join(
+                        ["%s %s" % (k, v) for k, v in sorted(values.iteritems())]))
+        pipeline_stats = app.mixer.get_pipeline_stats()
+        if pipeline_stats:
+            print "------ OUTPUT PIPELINE ------"
+            for k, v in sorted(pipeline_stats.iteritems()):
+                print "%s: %s" % (k, v)
 
 if __name__ == "__main__":
     main()
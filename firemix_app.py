@@ -23,6 +23,7 @@ from PySide import QtCore
 from core.mixer import Mixer
 from core.networking import Networking
 from core.scene_loader import SceneLoader
+from core.frame_recorder import FrameRecorder, FrameReplayer
 from lib.playlist import Playlist
 from lib.settings import Settings
 from lib.scene import Scene
@@ -66,6 +67,16 @@ class FireMixApp(QtCore.QThread):
 
         self.mixer.set_playlist(self.playlist)
 
+        if self.args.record:
+            tick_rate = self.mixer.get_tick_rate()
+            recorder = FrameRecorder(self.args.record, self.scene, BufferUtils.get_buffer_size(),
+                                     tick_rate, int(self.args.record_seconds * tick_rate))
+            self.mixer.set_recorder(recorder)
+
+        if self.args.replay:
+            log.info("Replaying %s" % self.args.replay)
+            self.mixer.set_replay_source(FrameReplayer(self.args.replay, self.scene))
+
         if self.args.preset:
             log.info("Setting constant preset %s" % args.preset)
             self.mixer.set_constant_preset(args.preset)
@@ -80,5 +91,6 @@ class FireMixApp(QtCore.QThread):
         self._running = False
         self.aubio_thread.quit()
         self.mixer.stop()
+        self.net.stop()
         self.playlist.save()
         self.settings.save()
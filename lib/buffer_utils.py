@@ -47,6 +47,15 @@ class BufferUtils:
         """
         Generates the caches and initializes local storage.  Must be called before any other methods.
         """
+        cls._strand_lengths = {}
+        cls._strand_num_fixtures = {}
+        cls._fixture_lengths = {}
+        cls._fixture_extents = {}
+        cls._fixture_pixels = {}
+        cls._pixel_offset_cache = {}
+        cls._pixel_index_cache = {}
+        cls._pixel_logical_cache = {}
+
         cls.num_strands, cls._max_pixels_per_strand = cls._app.scene.get_matrix_extents()
         cls._buffer_length = cls.num_strands * cls._max_pixels_per_strand
         fh = cls._app.scene.fixture_hierarchy()
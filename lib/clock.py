@@ -0,0 +1,65 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Monotonic clock for frame scheduling and timing.
+
+Python 2 has no time.monotonic(), and time.clock() measures CPU time on
+Unix, so we go to clock_gettime() directly where we can.
+"""
+
+import ctypes
+import ctypes.util
+import sys
+import time
+
+__all__ = ["monotonic"]
+
+
+def _make_clock_gettime(clock_id):
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    librt = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+    clock_gettime = librt.clock_gettime
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def monotonic():
+        t = timespec()
+        if clock_gettime(clock_id, ctypes.pointer(t)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, "clock_gettime failed")
+        return t.tv_sec + t.tv_nsec * 1e-9
+
+    return monotonic
+
+
+try:
+    from time import monotonic
+except ImportError:
+    if sys.platform.startswith("linux"):
+        monotonic = _make_clock_gettime(1)  # CLOCK_MONOTONIC
+    elif sys.platform == "darwin":
+        try:
+            monotonic = _make_clock_gettime(6)  # CLOCK_MONOTONIC (macOS 10.12+)
+        except AttributeError:
+            monotonic = time.time
+    elif sys.platform == "win32":
+        # On Windows, time.clock() is a wall-clock performance counter.
+        monotonic = time.clock
+    else:
+        monotonic = time.time
@@ -15,10 +15,14 @@
 # You should have received a copy of the GNU General Public License
 # along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
 
+import ast
+import threading
 import unittest
 import colorsys
 import numpy as np
 
+from collections import OrderedDict
+
 from lib.colors import clip
 
 class ColorFade:
@@ -31,28 +35,15 @@ class ColorFade:
 
         self._steps = steps
         self.keyframes = keyframes
-        self.color_cache = np.zeros((steps + 1, 3), dtype=np.float32)
-
-        # Warmup the cache
-        for i in xrange(steps + 1):
-            overall_progress = float(i) * (len(self.keyframes) - 1) / self._steps
-            stage = int(overall_progress)
-            stage_progress = overall_progress - stage # 0 to 1 float
+        self.color_cache = np.zeros((int(steps) + 1, 3), dtype=np.float32)
 
-            # special case stage_progress=0, so if progress=1, we don't get
-            # an IndexError
-            if stage_progress == 0:
-                color = self.keyframes[stage]
-            else:
-                frame1 = self.keyframes[stage]
-                frame1_weight = 1 - stage_progress
-
-                frame2 = self.keyframes[stage + 1]
-                frame2_weight = stage_progress
-
-                color = tuple([c1 * frame1_weight + c2 * frame2_weight for c1, c2 in zip(frame1, frame2)])
-            self.color_cache[i] = color
-#            print progress, self.color_cache[progress]
+        # Warmup the cache: each step's position along the keyframes,
+        # linearly interpolated between the two keyframes around it.
+        colors = np.asarray(keyframes, dtype=np.float64).reshape(-1, 3)
+        positions = np.arange(len(self.color_cache)) * (float(len(colors) - 1) / steps)
+        stages = np.arange(len(colors))
+        for channel in xrange(3):
+            self.color_cache[:, channel] = np.interp(positions, stages, colors[:, channel])
 
     def get_color(self, progress):
         """
@@ -64,5 +55,156 @@ class ColorFade:
 
         return self.color_cache[progress]
 
+    def get_colors(self, progress, out=None, index=None):
+        """
+        As get_color(), for an array of progress values (between 0 and
+        steps; others are clamped).  Returns an array of colors, written
+        into out ([[h, l, s]], float32) if it is given.  index is an intp
+        array the length of progress to use as scratch; pass one (and out)
+        to make no garbage.
+        """
+        if index is None:
+            index = np.empty(len(progress), dtype=np.intp)
+        index[:] = progress
+        return np.take(self.color_cache, index, axis=0, out=out, mode="clip")
+
+
+Rainbow = ColorFade([(0, 0.5, 1), (1, 0.5, 1)], 256)
+
+
+class GradientCache:
+    """
+    Process-wide cache of ColorFades, so presets with the same gradient
+    share one (read-only) color cache, and changing an unrelated parameter
+    doesn't rebuild it.
+
+    Fades are keyed by their normalized keyframes and steps, and gradient
+    spec strings (as in the color-gradient parameters) by their text.  Both
+    are evicted least recently used first.  Cached fades are shared, so
+    their color_cache must not be written to.
+    """
+
+    def __init__(self, max_fades=128, max_specs=256):
+        self._max_fades = max_fades
+        self._max_specs = max_specs
+        self._fades = OrderedDict()
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, cache, key):
+        value = cache.pop(key, None)
+        if value is not None:
+            cache[key] = value
+        return value
+
+    def _store(self, cache, key, value, limit):
+        cache[key] = value
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def parse(self, spec):
+        """
+        Returns the normalized keyframes (a tuple of (h, l, s) float tuples)
+        of a gradient spec string such as "[(0, 0.5, 1), (1, 0.5, 1)]"
+        """
+        with self._lock:
+            keyframes = self._lookup(self._specs, spec)
+        if keyframes is None:
+            keyframes = tuple([tuple([float(c) for c in color]) for color in ast.literal_eval(spec)])
+            with self._lock:
+                self._store(self._specs, spec, keyframes, self._max_specs)
+        return keyframes
+
+    def get(self, keyframes, steps):
+        """
+        Returns the shared ColorFade for keyframes and steps
+        """
+        key = (tuple([tuple([float(c) for c in color]) for color in keyframes]), steps)
+        with self._lock:
+            fade = self._lookup(self._fades, key)
+            if fade is not None:
+                self.hits += 1
+                return fade
+            self.misses += 1
+
+        fade = ColorFade(key[0], steps)
+        fade.color_cache.flags.writeable = False
+        with self._lock:
+            self._store(self._fades, key, fade, self._max_fades)
+        return fade
+
+    def get_fade(self, spec, steps):
+        """
+        Returns the shared ColorFade for a gradient spec string and steps
+        """
+        return self.get(self.parse(spec), steps)
+
+    def get_stats(self):
+        return {"fades": len(self._fades),
+                "specs": len(self._specs),
+                "hits": self.hits,
+                "misses": self.misses}
+
+
+gradients = GradientCache()
+
+
+class TestColorFade(unittest.TestCase):
+
+    def loop_cache(self, keyframes, steps):
+        # The original per-step construction
+        cache = np.zeros((steps + 1, 3), dtype=np.float32)
+        for i in xrange(steps + 1):
+            overall_progress = float(i) * (len(keyframes) - 1) / steps
+            stage = int(overall_progress)
+            stage_progress = overall_progress - stage
+            if stage_progress == 0:
+                cache[i] = keyframes[stage]
+            else:
+                cache[i] = [c1 * (1 - stage_progress) + c2 * stage_progress
+                            for c1, c2 in zip(keyframes[stage], keyframes[stage + 1])]
+        return cache
+
+    def test_cache(self):
+        for keyframes, steps in (([(0, 0.5, 1), (1, 0.5, 1)], 256),
+                                 ([(0.1, 0.0, 1.0), (0.6, 0.5, 0.2), (0.3, 1.0, 0.0)], 100),
+                                 ([(0.2, 0.3, 0.4)], 10)):
+            fade = ColorFade(keyframes, steps)
+            self.assertTrue(np.allclose(fade.color_cache, self.loop_cache(keyframes, steps), atol=1e-6))
+
+    def test_get_colors(self):
+        fade = ColorFade([(0.0, 0.0, 0.0), (1.0, 1.0, 1.0)], 10)
+        progress = np.array([-3.0, 0.0, 2.5, 9.99, 10.0, 42.0])
+        expected = np.array([fade.get_color(p) for p in progress])
+        self.assertTrue(np.array_equal(fade.get_colors(progress), expected))
+        out = np.zeros((len(progress), 3), dtype=np.float32)
+        index = np.zeros(len(progress), dtype=np.intp)
+        self.assertIs(fade.get_colors(progress, out, index), out)
+        self.assertTrue(np.array_equal(out, expected))
+
+
+class TestGradientCache(unittest.TestCase):
+
+    def test_shared(self):
+        cache = GradientCache()
+        fade = cache.get_fade("[(0, 0.5, 1), (1, 0.5, 1)]", 256)
+        self.assertIs(cache.get_fade("[(0.0,0.5,1.0),(1,0.5,1)]", 256), fade)
+        self.assertIs(cache.get([[0, 0.5, 1], [1, 0.5, 1]], 256), fade)
+        self.assertIsNot(cache.get_fade("[(0, 0.5, 1), (1, 0.5, 1)]", 128), fade)
+        self.assertTrue(np.array_equal(fade.color_cache, Rainbow.color_cache))
+        self.assertFalse(fade.color_cache.flags.writeable)
+        self.assertEqual(cache.get_stats()["hits"], 2)
 
-Rainbow = ColorFade([(0, 0.5, 1), (1, 0.5, 1)], 256)
\ No newline at end of file
+    def test_eviction(self):
+        cache = GradientCache(max_fades=2, max_specs=2)
+        first = cache.get([(0, 0, 0), (1, 1, 1)], 10)
+        second = cache.get([(0, 0, 0), (1, 1, 1)], 20)
+        self.assertIs(cache.get([(0, 0, 0), (1, 1, 1)], 10), first)
+        cache.get([(0, 0, 0), (1, 1, 1)], 30)
+        self.assertIs(cache.get([(0, 0, 0), (1, 1, 1)], 10), first)
+        self.assertIsNot(cache.get([(0, 0, 0), (1, 1, 1)], 20), second)
+        for spec in ("[(0, 0, 0)]", "[(1, 1, 1)]", "[(0.5, 0.5, 0.5)]"):
+            cache.parse(spec)
+        self.assertEqual(cache.get_stats()["specs"], 2)
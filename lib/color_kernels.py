@@ -0,0 +1,325 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Allocation-free float32 color kernels.
+
+These compute the same results as hls_to_rgb, rgb_to_hls, hls_to_hsv and
+hls_blend in lib.colors, and colorsys.hsv_to_rgb (rgb_blend is the
+counterpart of hls_blend for RGB frames), but stay in float32 and write
+every intermediate into the scratch arrays of a ColorWorkspace and the
+result into out, so once the frame size is stable they allocate no
+frame-sized arrays.  out must not be one of the inputs.
+"""
+
+import colorsys
+import unittest
+import numpy as np
+
+from lib import colors
+
+TWO_PI = np.float32(2 * np.pi)
+TINY = np.float32(1e-30)
+
+
+class ColorWorkspace:
+    """
+    Float32 scratch arrays for the color kernels, one set per frame size
+    """
+
+    COUNT = 10
+
+    def __init__(self, size=0):
+        self.size = None
+        self._scratch = []
+        self._mask = None
+        self.resize(size)
+
+    def resize(self, size):
+        if size != self.size:
+            self.size = size
+            self._scratch = [np.zeros(size, dtype=np.float32) for i in xrange(self.COUNT)]
+            self._mask = np.zeros(size, dtype=bool)
+
+    def scratch(self, size):
+        """
+        Returns the scratch arrays and a boolean mask array, for frames of size pixels
+        """
+        self.resize(size)
+        return self._scratch, self._mask
+
+
+def hls_to_rgb(hls, out, workspace):
+    """
+    Converts HLS color array [[H,L,S]] to RGB ([[R,G,B]] in [0..1]) in out.
+
+    Uses the branchless form of the conversion,
+    f(n) = L - a * max(-1, min(k - 3, 9 - k, 1)), k = (n + 12 H) mod 12,
+    a = S * min(L, 1 - L), with n = 0, 8, 4 for R, G and B.
+    """
+    a, h12, k, t = workspace.scratch(len(hls))[0][:4]
+    lightness = hls[:, 1]
+
+    np.subtract(1.0, lightness, a)
+    np.minimum(a, lightness, a)
+    np.multiply(a, hls[:, 2], a)
+    np.multiply(hls[:, 0], 12.0, h12)
+
+    for channel, n in ((0, 0.0), (1, 8.0), (2, 4.0)):
+        np.add(h12, n, k)
+        np.mod(k, 12.0, k)
+        np.subtract(9.0, k, t)
+        np.subtract(k, 3.0, k)
+        np.minimum(k, t, t)
+        np.clip(t, -1.0, 1.0, t)
+        np.multiply(t, a, t)
+        np.subtract(lightness, t, out[:, channel])
+    return out
+
+
+def rgb_to_hls(rgb, out, workspace):
+    """
+    Converts RGB color array [[R,G,B]] (in [0..1]) to HLS in out
+    """
+    scratch, mask = workspace.scratch(len(rgb))
+    high, low, delta, t = scratch[:4]
+    r = rgb[:, 0]
+    g = rgb[:, 1]
+    b = rgb[:, 2]
+
+    np.maximum(r, g, high)
+    np.maximum(high, b, high)
+    np.minimum(r, g, low)
+    np.minimum(low, b, low)
+    np.subtract(high, low, delta)
+
+    # Lightness
+    np.add(high, low, out[:, 1])
+    np.multiply(out[:, 1], 0.5, out[:, 1])
+
+    # Saturation: delta / (1 - |2L - 1|), or 0 for greys (where delta is 0)
+    np.add(high, low, low)
+    np.subtract(low, 1.0, low)
+    np.abs(low, low)
+    np.subtract(1.0, low, low)
+    np.maximum(low, TINY, low)
+    np.divide(delta, low, out[:, 2])
+
+    # Hue, from whichever channel is largest (red first, as colorsys does)
+    np.maximum(delta, TINY, delta)
+    hue = out[:, 0]
+    np.subtract(r, g, t)
+    np.divide(t, delta, t)
+    np.add(t, 4.0, hue)
+    np.equal(g, high, mask)
+    np.subtract(b, r, t)
+    np.divide(t, delta, t)
+    np.add(t, 2.0, t)
+    np.copyto(hue, t, where=mask)
+    np.equal(r, high, mask)
+    np.subtract(g, b, t)
+    np.divide(t, delta, t)
+    np.copyto(hue, t, where=mask)
+    np.divide(hue, 6.0, hue)
+    np.mod(hue, 1.0, hue)
+    return out
+
+
+def hls_to_hsv(hls, out, workspace):
+    """
+    Converts HLS color array [[H,L,S]] to HSV ([[H,S,V]]) in out
+    """
+    scratch, mask = workspace.scratch(len(hls))
+    v, t = scratch[:2]
+    lightness = hls[:, 1]
+
+    np.subtract(1.0, lightness, v)
+    np.minimum(v, lightness, v)
+    np.multiply(v, hls[:, 2], v)
+    np.add(v, lightness, v)
+
+    np.greater(v, 0.0, mask)
+    np.maximum(v, TINY, t)
+    np.divide(lightness, t, t)
+    np.subtract(1.0, t, t)
+    np.multiply(t, 2.0, t)
+    np.multiply(t, mask, out[:, 1])
+    out[:, 0] = hls[:, 0]
+    out[:, 2] = v
+    return out
+
+
+def hsv_to_rgb(hsv, out, workspace):
+    """
+    Converts HSV color array [[H,S,V]] to RGB ([[R,G,B]] in [0..1]) in out.
+
+    Uses the branchless form f(n) = V - V S max(0, min(k, 4 - k, 1)),
+    k = (n + 6 H) mod 6, with n = 5, 3, 1 for R, G and B.
+    """
+    c, h6, k, t = workspace.scratch(len(hsv))[0][:4]
+    value = hsv[:, 2]
+
+    np.multiply(value, hsv[:, 1], c)
+    np.multiply(hsv[:, 0], 6.0, h6)
+
+    for channel, n in ((0, 5.0), (1, 3.0), (2, 1.0)):
+        np.add(h6, n, k)
+        np.mod(k, 6.0, k)
+        np.subtract(4.0, k, t)
+        np.minimum(k, t, t)
+        np.clip(t, 0.0, 1.0, t)
+        np.multiply(t, c, t)
+        np.subtract(value, t, out[:, channel])
+    return out
+
+
+def hls_blend(start, end, out, progress, mode, workspace, fade_length=1.0, ease_power=0.5):
+    """
+    Blends two HLS frames into out, as lib.colors.hls_blend does, except
+    that start and end are not modified.
+    """
+    scratch = workspace.scratch(len(start))[0]
+    l1, l2, s1, s2, w1, w2, x1, y1, x2, y2 = scratch
+    p = abs(progress)
+    start_power = pow(colors.clip(0.0, (1.0 - p) / fade_length, 1.0), ease_power)
+    end_power = pow(colors.clip(0.0, p / fade_length, 1.0), ease_power)
+
+    np.clip(start[:, 1], 0, 1, l1)
+    np.clip(end[:, 1], 0, 1, l2)
+    np.clip(start[:, 2], 0, 1, s1)
+    np.clip(end[:, 2], 0, 1, s2)
+
+    # Saturation
+    np.multiply(s1, start_power, x1)
+    np.multiply(s2, end_power, x2)
+    np.add(x1, x2, out[:, 2])
+
+    # Hue vectors, weighted by chroma and power
+    for l, s, w, x, y, h, power in ((l1, s1, w1, x1, y1, start[:, 0], start_power),
+                                    (l2, s2, w2, x2, y2, end[:, 0], end_power)):
+        np.subtract(0.5, l, w)
+        np.abs(w, w)
+        np.multiply(w, -2.0, w)
+        np.add(w, 1.0, w)
+        np.multiply(w, s, w)
+        np.multiply(w, power, w)
+        np.multiply(h, TWO_PI, y)
+        np.cos(y, x)
+        np.sin(y, y)
+        np.multiply(x, w, x)
+        np.multiply(y, w, y)
+
+    lightness = out[:, 1]
+    if progress >= 0:
+        np.multiply(l1, start_power, l1)
+        np.multiply(l2, end_power, l2)
+        if mode == 'multiply':
+            np.minimum(l1, l2, lightness)
+        else:
+            np.maximum(l1, l2, lightness)
+            if mode == 'add':
+                # Opposition: half the distance between the hue vectors
+                np.subtract(x1, x2, s1)
+                np.multiply(s1, 0.5, s1)
+                np.square(s1, s1)
+                np.subtract(y1, y2, s2)
+                np.multiply(s2, 0.5, s2)
+                np.square(s2, s2)
+                np.add(s1, s2, s1)
+                np.sqrt(s1, s1)
+                np.maximum(lightness, s1, lightness)
+
+    np.add(x1, x2, x1)
+    np.add(y1, y2, y1)
+
+    if progress < 0:
+        # hacky support for old blend
+        np.square(x1, s1)
+        np.square(y1, s2)
+        np.add(s1, s2, s1)
+        np.sqrt(s1, s1)
+        np.multiply(s1, 0.5, lightness)
+
+    np.arctan2(y1, x1, out[:, 0])
+    np.divide(out[:, 0], TWO_PI, out[:, 0])
+    np.clip(lightness, 0, 1, lightness)
+    return out
+
+
+def rgb_blend(start, end, out, progress, workspace, fade_length=1.0, ease_power=0.5):
+    """
+    Blends two RGB frames into out: each is faded with the same power
+    curves as hls_blend uses, and the two are added.
+    """
+    t = workspace.scratch(len(start))[0][0]
+    p = abs(progress)
+    start_power = pow(colors.clip(0.0, (1.0 - p) / fade_length, 1.0), ease_power)
+    end_power = pow(colors.clip(0.0, p / fade_length, 1.0), ease_power)
+
+    np.multiply(start, start_power, out)
+    for channel in xrange(3):
+        np.multiply(end[:, channel], end_power, t)
+        np.add(out[:, channel], t, out[:, channel])
+    np.clip(out, 0, 1, out)
+    return out
+
+
+class TestColorKernels(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.hls = rng.rand(1000, 3).astype(np.float32)
+        self.other = rng.rand(1000, 3).astype(np.float32)
+        self.workspace = ColorWorkspace()
+        self.out = np.zeros((1000, 3), dtype=np.float32)
+
+    def test_hls_to_rgb(self):
+        hls_to_rgb(self.hls, self.out, self.workspace)
+        self.assertEqual(self.out.dtype, np.float32)
+        self.assertTrue(np.allclose(self.out, colors.hls_to_rgb(self.hls), atol=1e-5))
+
+    def test_rgb_to_hls(self):
+        rgb = self.hls
+        rgb[:10, 1] = rgb[:10, 0]
+        rgb[:10, 2] = rgb[:10, 0]
+        rgb_to_hls(rgb, self.out, self.workspace)
+        expected = np.array([colorsys.rgb_to_hls(*c) for c in rgb])
+        self.assertTrue(np.allclose(self.out, expected, atol=1e-5))
+
+    def test_hls_to_hsv(self):
+        hls_to_hsv(self.hls, self.out, self.workspace)
+        self.assertTrue(np.allclose(self.out, colors.hls_to_hsv(self.hls), atol=1e-5))
+
+    def test_hsv_to_rgb(self):
+        hsv_to_rgb(self.hls, self.out, self.workspace)
+        expected = np.array([colorsys.hsv_to_rgb(*c) for c in self.hls])
+        self.assertTrue(np.allclose(self.out, expected, atol=1e-5))
+
+    def test_hls_blend(self):
+        for progress, mode in ((0.3, 'add'), (0.7, 'multiply'), (0.5, 'overwrite'), (-0.4, 'add')):
+            hls_blend(self.hls, self.other, self.out, progress, mode, self.workspace, 0.8, 0.5)
+            expected = colors.hls_blend(self.hls.copy(), self.other.copy(), None, progress, mode, 0.8, 0.5)
+            self.assertTrue(np.allclose(self.out, expected, atol=1e-5), mode)
+
+    def test_rgb_blend(self):
+        rgb_blend(self.hls, self.other, self.out, 0.25, self.workspace, 1.0, 1.0)
+        expected = np.clip(self.hls * 0.75 + self.other * 0.25, 0, 1)
+        self.assertTrue(np.allclose(self.out, expected, atol=1e-5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import numpy as np
+
+from lib.colors import hls_to_rgb
+
+
+class HlsToRgbTable:
+    """
+    Quantized HLS to RGB8 conversion by table lookup.
+
+    The table holds the RGB8 color (as hls_to_rgb() scaled and truncated
+    to 8 bits) of every point of a hue x lightness x saturation grid.
+    Converting a frame rounds each pixel to the nearest grid point with
+    integer index math (hue wraps around; lightness and saturation are
+    clamped to [0, 1]) and fetches all the colors with a single gather.
+    Scratch arrays are kept between calls, so converting makes no garbage
+    once the frame size is stable.
+
+    The default resolution (256 x 257 x 65, 13 MB) keeps colors within a
+    few RGB8 levels of the exact conversion, and is exact for the fully
+    saturated, half-lightness colors most presets use (the odd step counts
+    put 0.5 on the grid).
+    """
+
+    def __init__(self, hue_steps=256, lightness_steps=257, saturation_steps=65):
+        self.shape = (hue_steps, lightness_steps, saturation_steps)
+        self.table = np.zeros((hue_steps * lightness_steps * saturation_steps, 3), dtype=np.uint8)
+
+        # One hue at a time, to keep the float temporaries small.
+        plane = np.zeros((lightness_steps, saturation_steps, 3), dtype=np.float32)
+        plane[:, :, 1] = np.linspace(0.0, 1.0, lightness_steps)[:, np.newaxis]
+        plane[:, :, 2] = np.linspace(0.0, 1.0, saturation_steps)[np.newaxis, :]
+        plane = plane.reshape(-1, 3)
+        for hue in xrange(hue_steps):
+            plane[:, 0] = float(hue) / hue_steps
+            rgb = hls_to_rgb(plane)
+            np.multiply(rgb, 255, rgb)
+            np.clip(rgb, 0, 255, rgb)
+            self.table[hue * len(plane):(hue + 1) * len(plane)] = rgb
+
+        self._size = None
+        self._scratch = None
+        self._index = None
+        self._step = None
+
+    def _allocate(self, size):
+        self._size = size
+        self._scratch = np.zeros(size, dtype=np.float32)
+        self._index = np.zeros(size, dtype=np.intp)
+        self._step = np.zeros(size, dtype=np.intp)
+
+    def _quantize(self, values, steps, out):
+        # Rounds values in [0, 1] to the nearest of steps grid points.
+        np.clip(values, 0.0, 1.0, self._scratch)
+        np.multiply(self._scratch, steps - 1, self._scratch)
+        np.add(self._scratch, 0.5, self._scratch)
+        out[:] = self._scratch
+
+    def convert(self, hls, out):
+        """
+        Converts hls ([[H,L,S]], float) into out, a uint8 array of the same shape
+        """
+        if len(hls) != self._size:
+            self._allocate(len(hls))
+        hue_steps, lightness_steps, saturation_steps = self.shape
+
+        np.multiply(hls[:, 0], hue_steps, self._scratch)
+        np.add(self._scratch, 0.5, self._scratch)
+        np.floor(self._scratch, self._scratch)
+        self._index[:] = self._scratch
+        np.mod(self._index, hue_steps, self._index)
+
+        self._quantize(hls[:, 1], lightness_steps, self._step)
+        np.multiply(self._index, lightness_steps, self._index)
+        np.add(self._index, self._step, self._index)
+
+        self._quantize(hls[:, 2], saturation_steps, self._step)
+        np.multiply(self._index, saturation_steps, self._index)
+        np.add(self._index, self._step, self._index)
+
+        np.take(self.table, self._index, axis=0, out=out)
+
+
+class TestHlsToRgbTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.table = HlsToRgbTable()
+
+    def exact(self, hls):
+        rgb = hls_to_rgb(hls)
+        np.multiply(rgb, 255, rgb)
+        np.clip(rgb, 0, 255, rgb)
+        return rgb.astype(np.uint8)
+
+    def test_grid_points(self):
+        hls = np.array([[0.0, 0.5, 1.0], [0.5, 0.0, 1.0], [0.25, 1.0, 0.0],
+                        [0.75, 0.25, 0.5], [1.0, 0.5, 1.0], [-0.25, 0.5, 1.0]], dtype=np.float32)
+        out = np.zeros(hls.shape, dtype=np.uint8)
+        self.table.convert(hls, out)
+        wrapped = hls.copy()
+        wrapped[:, 0] %= 1.0
+        self.assertTrue(np.array_equal(out, self.exact(wrapped)))
+
+    def test_accuracy(self):
+        rng = np.random.RandomState(0)
+        hls = rng.rand(100000, 3).astype(np.float32)
+        out = np.zeros(hls.shape, dtype=np.uint8)
+        self.table.convert(hls, out)
+        error = np.abs(out.astype(np.int) - self.exact(hls).astype(np.int))
+        # Half a grid step is worth up to 3 levels of hue, 1 of lightness and 1 of
+        # saturation.  The three don't peak at the same color, and 5 is the largest
+        # error seen over millions of samples, including ones half a step off every axis.
+        self.assertLessEqual(error.max(), 5)
+        self.assertLess(error.mean(), 0.5)
+
+    def test_out_of_range(self):
+        hls = np.array([[2.5, 1.5, -1.0], [0.0, -0.5, 2.0]], dtype=np.float32)
+        out = np.zeros(hls.shape, dtype=np.uint8)
+        self.table.convert(hls, out)
+        self.assertTrue(np.array_equal(out, [[255, 255, 255], [0, 0, 0]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,6 +15,182 @@
 # You should have received a copy of the GNU General Public License
 # along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
 
-modes = ["RGB8", "HSVF32", "HLSF32"]
+import numpy as np
+
+from lib.color_kernels import ColorWorkspace, hls_to_hsv, hls_to_rgb, rgb_to_hls
+
+modes = ["RGB8", "RGB16", "HSVF32", "HLSF32"]
 
 strand_modes = ["RGB8", "BGR8"]
+
+# Bytes per pixel on the wire.  RGB16 is sent big-endian, float modes as
+# native float32.
+pixel_sizes = {"RGB8": 3, "RGB16": 6, "HSVF32": 12, "HLSF32": 12}
+
+
+def client_mode(client):
+    return client.get("color-mode", "RGB8")
+
+
+def group_clients(clients):
+    """
+    Returns a sorted list of (color mode, clients in that mode)
+    """
+    groups = {}
+    for client in clients:
+        groups.setdefault(client_mode(client), []).append(client)
+    return sorted(groups.items())
+
+
+def pixel_channels(start, end, mode="RGB8", strand_mode="RGB8"):
+    """
+    Returns the indices of the bytes of pixels start to end in a flat frame
+    of the given client mode, in the order they are sent.  For BGR8 strands
+    of RGB clients the channels are swapped here, when the encoders are
+    built, so the reorder costs nothing per frame.
+    """
+    size = pixel_sizes[mode]
+    channels = np.arange(start * size, end * size, dtype=np.intp)
+    if mode in ("RGB8", "RGB16") and strand_mode == "BGR8":
+        channels = np.ascontiguousarray(channels.reshape(-1, 3, size / 3)[:, ::-1]).reshape(-1)
+    return channels
+
+
+class ColorModeCache:
+    """
+    Converts the mixer's HLS (or, from the RGB pipeline, RGB) float frames
+    to the client color modes.
+
+    Each mode is converted at most once per frame, however many clients
+    use it, into a buffer allocated when the frame size changes, using the
+    allocation-free kernels of lib.color_kernels.  get()
+    returns the frame as a flat uint8 array (pixel * pixel size + byte) for
+    the encoders to gather from.
+
+    RGB8 and RGB16 frames have color correction applied (see configure()).
+    With a TemporalDither, RGB8 frames are dithered down from the 16-bit
+    (corrected) levels instead of truncated.  Otherwise, uncorrected RGB8
+    frames can be converted with an HlsToRgbTable instead of exactly.
+    RGB frames skip the conversion to RGB, and are only converted to HLS
+    for the float modes.
+
+    stamp is the (sequence, time) stamp of the frame, if frames are stamped.
+    """
+
+    def __init__(self):
+        self._size = None
+        self._frames = {}
+        self._flat = {}
+        self._converted = set()
+        self._hls = None
+        self._frame = None
+        self._color_space = "HLS"
+        self.stamp = None
+        self._rgb = None
+        self._rgb16 = None
+        self._rgb16_valid = False
+        self._correction8 = None
+        self._correction16 = None
+        self._dither = None
+        self._rgb_table = None
+        self._workspace = ColorWorkspace()
+
+    def _allocate(self, size):
+        self._size = size
+        self._frames = {"RGB8": np.zeros((size, 3), dtype=np.uint8),
+                        "RGB16": np.zeros((size, 3), dtype=">u2"),
+                        "HSVF32": np.zeros((size, 3), dtype=np.float32),
+                        "HLSF32": np.zeros((size, 3), dtype=np.float32)}
+        self._flat = dict([(mode, frame.view(np.uint8).reshape(-1))
+                           for mode, frame in self._frames.iteritems()])
+        self._rgb16 = np.zeros((size, 3), dtype=np.uint16)
+        self._rgbf = np.zeros((size, 3), dtype=np.float32)
+        self._hlsf = np.zeros((size, 3), dtype=np.float32)
+        self._scaled = np.zeros((size, 3), dtype=np.float32)
+        self._workspace.resize(size)
+
+    def configure(self, correction8=None, correction16=None, dither=None, rgb_table=None):
+        """
+        Sets the ColorCorrection for 8-bit and 16-bit output, and the
+        TemporalDither and HlsToRgbTable for RGB8 (or None)
+        """
+        self._correction8 = correction8
+        self._correction16 = correction16
+        self._dither = dither
+        self._rgb_table = rgb_table
+
+    def set_frame(self, frame, stamp=None, color_space="HLS"):
+        """
+        Sets the frame (in color_space, "HLS" or "RGB") that get() converts
+        from, until the next call
+        """
+        if len(frame) != self._size:
+            self._allocate(len(frame))
+        self._frame = frame
+        self._color_space = color_space
+        self._hls = frame if color_space == "HLS" else None
+        self.stamp = stamp
+        self._rgb = None
+        self._rgb16_valid = False
+        self._converted.clear()
+
+    def get(self, mode):
+        if mode not in self._converted:
+            self._convert(mode)
+            self._converted.add(mode)
+        return self._flat[mode]
+
+    def _get_rgb(self):
+        # Shared by the RGB modes.  Clipped to protect against presets or
+        # transitions that write float data.
+        if self._rgb is None:
+            if self._color_space == "RGB":
+                self._rgb = np.clip(self._frame, 0.0, 1.0, self._rgbf)
+            else:
+                self._rgb = hls_to_rgb(self._hls, self._rgbf, self._workspace)
+                np.clip(self._rgb, 0.0, 1.0, self._rgb)
+        return self._rgb
+
+    def _get_hls(self):
+        # For the float modes and the RGB8 table, from RGB frames.
+        if self._hls is None:
+            self._hls = rgb_to_hls(self._get_rgb(), self._hlsf, self._workspace)
+        return self._hls
+
+    def _get_rgb16(self):
+        # Corrected 16-bit levels, shared by RGB16 and dithered RGB8.
+        if not self._rgb16_valid:
+            rgb = self._get_rgb()
+            if self._correction16 is not None and self._correction16.active:
+                self._correction16.apply(rgb, self._rgb16)
+            else:
+                np.multiply(rgb, 65535, self._scaled)
+                np.add(self._scaled, 0.5, self._scaled)
+                self._rgb16[:] = self._scaled
+            self._rgb16_valid = True
+        return self._rgb16
+
+    def _convert(self, mode):
+        frame = self._frames[mode]
+        if mode == "RGB8":
+            if self._dither is not None:
+                np.multiply(self._get_rgb16(), 1.0 / 257, self._dither.levels)
+                self._dither.apply(self._dither.levels, frame)
+            elif self._correction8 is not None and self._correction8.active:
+                self._correction8.apply(self._get_rgb(), frame)
+            elif self._rgb_table is not None and self._color_space == "HLS":
+                self._rgb_table.convert(self._hls, frame)
+            else:
+                np.multiply(self._get_rgb(), 255, frame, casting="unsafe")
+            return
+
+        if mode == "RGB16":
+            frame[:] = self._get_rgb16()
+            return
+
+        if mode == "HSVF32":
+            hls_to_hsv(self._get_hls(), frame, self._workspace)
+        else:
+            frame[:] = self._get_hls()
+        np.mod(frame[:, 0], 1.0, frame[:, 0])
+        np.clip(frame[:, 1:], 0.0, 1.0, frame[:, 1:])
@@ -230,3 +230,24 @@ def hls_to_rgb(hls):
     rgb[:, 1] = G
     rgb[:, 2] = B
     return rgb
+
+def hls_to_hsv(hls):
+    """
+    Converts HLS color array [[H,L,S]] to HSV array [[H,S,V]].
+
+    http://en.wikipedia.org/wiki/HSL_and_HSV#Converting_to_RGB
+    """
+    H = hls[:, 0]
+    L = hls[:, 1]
+    S = hls[:, 2]
+
+    V = L + S * np.minimum(L, 1.0 - L)
+    Sv = np.zeros(H.shape, float)
+    lit = V > 0
+    Sv[lit] = 2.0 * (1.0 - L[lit] / V[lit])
+
+    hsv = np.empty_like(hls)
+    hsv[:, 0] = H
+    hsv[:, 1] = Sv
+    hsv[:, 2] = V
+    return hsv
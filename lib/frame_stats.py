@@ -0,0 +1,118 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+class FrameStats:
+    """
+    Collects per-stage frame timings in fixed-size ring buffers.
+
+    Stages that run once per frame call record() with their duration.
+    Stages that may run several times in a frame (e.g. parameter ticks for
+    both the active and next preset) call add(), and the accumulated time
+    is recorded when the mixer calls end_frame().
+
+    The mixer's stages don't overlap: parameter-tick is every preset
+    parameter tick of the frame, and preset-active and preset-next are the
+    rest of each preset's tick and draw.
+
+    Times are recorded in seconds and reported in milliseconds.
+    """
+
+    STAGES = ["parameter-tick", "preset-active", "preset-next", "rgb-to-hls", "transition",
+              "post-process", "hls-to-rgb", "packet-build", "socket-send", "frame"]
+
+    def __init__(self, size=1024):
+        self._size = size
+        self._rings = {}
+        self._counts = {}
+        self._pending = {}
+
+    def record(self, stage, seconds):
+        ring = self._rings.get(stage, None)
+        if ring is None:
+            ring = np.zeros(self._size, dtype=np.float64)
+            self._rings[stage] = ring
+            self._counts[stage] = 0
+        ring[self._counts[stage] % self._size] = seconds
+        self._counts[stage] += 1
+
+    def add(self, stage, seconds):
+        self._pending[stage] = self._pending.get(stage, 0.0) + seconds
+
+    def pending(self, stage):
+        """
+        Returns the time add()ed to stage so far this frame
+        """
+        return self._pending.get(stage, 0.0)
+
+    def count(self, stage):
+        """
+        Returns the number of times stage has been recorded
+        """
+        return self._counts.get(stage, 0)
+
+    def latest(self, stage):
+        """
+        Returns the most recently recorded time for stage, or None
+        """
+        count = self._counts.get(stage, 0)
+        if count == 0:
+            return None
+        return self._rings[stage][(count - 1) % self._size]
+
+    def end_frame(self):
+        for stage, seconds in self._pending.iteritems():
+            self.record(stage, seconds)
+        self._pending.clear()
+
+    def stage_stats(self, stage):
+        """
+        Returns a dictionary of count, p50, p95, p99 and max (in ms) for a stage
+        """
+        count = self._counts.get(stage, 0)
+        if count == 0:
+            return None
+        samples = self._rings[stage][:min(count, self._size)] * 1000.0
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {"count": count, "p50": p50, "p95": p95, "p99": p99, "max": np.max(samples)}
+
+    def get_stats(self):
+        """
+        Returns a dictionary of stage name to stage_stats() for every recorded stage
+        """
+        stats = {}
+        for stage in self._rings.keys():
+            stats[stage] = self.stage_stats(stage)
+        return stats
+
+    def ordered_stages(self):
+        stages = self._rings.keys()
+        known = [stage for stage in self.STAGES if stage in stages]
+        return known + sorted([stage for stage in stages if stage not in self.STAGES])
+
+    def format_table(self):
+        """
+        Returns the stats as a printable table
+        """
+        lines = ["%-16s %8s %8s %8s %8s %8s" % ("stage", "count", "p50", "p95", "p99", "max")]
+        for stage in self.ordered_stages():
+            s = self.stage_stats(stage)
+            lines.append("%-16s %8d %8.2f %8.2f %8.2f %8.2f" %
+                         (stage, s["count"], s["p50"], s["p95"], s["p99"], s["max"]))
+        return "\n".join(lines)
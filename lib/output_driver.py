@@ -0,0 +1,74 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+
+class OutputDriver:
+    """
+    Defines the interface for an output driver.  Drivers live in the
+    ./outputs/ directory and are discovered by the PluginLoader.
+
+    Each driver handles the networking clients whose "protocol" setting
+    matches its protocol attribute.  Whenever the clients, the strand
+    settings or the buffer size change, build() is called to compile an
+    encoding plan for them.  Then every frame, encode() packs the frame
+    (once per color mode, however many clients there are) and send() sends
+    it to each client, without looking at the settings again.
+    """
+
+    protocol = None
+
+    def __init__(self, net):
+        self._net = net
+
+    def __repr__(self):
+        return "%s output" % self.protocol
+
+    def build(self, clients, strand_settings, extents):
+        """
+        Compiles the encoding plan for the given enabled clients (possibly
+        none).  extents are the (start, end) pixel extents of each strand.
+        Clients in different color modes (lib.color_modes.group_clients)
+        need their own encoders.
+        The networking settings are available as self._net.settings.
+        """
+        pass
+
+    def encode(self, frames):
+        """
+        Packs a frame.  frames is a ColorModeCache: frames.get(mode) returns
+        the frame in a client color mode, converted once per frame.  If the
+        sequence-stamps setting is on, frames.stamp is the frame's stamp.
+        """
+        pass
+
+    def send(self):
+        """
+        Sends the most recently encoded frame to every client
+        """
+        pass
+
+    def stop(self):
+        """
+        Closes connections and stops any worker threads
+        """
+        pass
+
+    def get_stats(self):
+        """
+        Returns a dictionary of statistics, keyed by client or by topic
+        """
+        return {}
@@ -181,6 +181,12 @@ class Playlist(JSONDict):
         if active_idx in self._shuffle_list:
             self._shuffle_list.remove(active_idx)
 
+    def stop(self):
+        """
+        Stops watching the presets directory for changes
+        """
+        self._loader.stop()
+
     def reload_presets(self):
         """Attempts to reload all preset classes in the playlist"""
         self._preset_classes = self._loader.reload()
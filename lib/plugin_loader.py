@@ -25,27 +25,29 @@ log = logging.getLogger("firemix.lib.plugin_loader")
 #TODO: This and PresetLoader share a lot of code...
 class PluginLoader:
     """
-    Scans the ./plugins/ directory and imports objects into lists based on base class
+    Scans the ./plugins/ directory (or another package directory, such as
+    ./outputs/) and imports objects into lists based on base class
 
     Based on code copyright 2005 Jesse Noller <jnoller@gmail.com>
     http://code.activestate.com/recipes/436873-import-modulesdiscover-methods-from-a-directory-na/
     """
 
-    def __init__(self):
+    def __init__(self, directory="plugins"):
+        self._directory = directory
         self._classes = {}
         self.load()
 
     def load(self):
         self._classes = {}
-        log.info("Loading plugins...")
-        for f in os.listdir(os.path.join(os.getcwd(), "plugins")):
+        log.info("Loading %s..." % self._directory)
+        for f in os.listdir(os.path.join(os.getcwd(), self._directory)):
             module_name, ext = os.path.splitext(f)
             if ext == ".py":
                 # Skip emacs lock files.
                 if f.startswith('.#'):
                     continue
 
-                module = __import__("plugins." + module_name, fromlist=['dummy'])
+                module = __import__(self._directory + "." + module_name, fromlist=['dummy'])
                 for name, obj in inspect.getmembers(module, inspect.isclass):
                     bases = inspect.getmro(obj)
                     if len(bases) > 1:
@@ -22,12 +22,22 @@ import numpy as np
 
 from lib.commands import SetAll, SetStrand, SetFixture, SetPixel, render_command_list
 from lib.parameters import BoolParameter
+from lib.clock import monotonic
 
 log = logging.getLogger("firemix.lib.preset")
 
 
 class Preset:
-    """Base Preset.  Does nothing."""
+    """
+    Base Preset.  Does nothing.
+
+    color_space is the color space the preset renders in: "HLS" (the
+    default) or "RGB" ([[R,G,B]] in [0..1]).  With the mixer's
+    rgb-pipeline setting on, frames made only by RGB presets stay in RGB
+    through to the output; otherwise the mixer converts them to HLS.
+    """
+
+    color_space = "HLS"
 
     def __init__(self, mixer, name=""):
         self._mixer = mixer
@@ -164,8 +174,10 @@ class Preset:
         if self._mixer._enable_profiling:
             start = time.time()
 
+        parameter_start = monotonic()
         for parameter in self._parameters.values():
             parameter.tick(dt)
+        self._mixer.frame_stats.add("parameter-tick", monotonic() - parameter_start)
         
         # Assume that self._tickers is already sorted via add_ticker()
         for ticker, priority in self._tickers:
@@ -57,6 +57,12 @@ class PresetLoader:
         self.observer.start()
 
     def __del__(self):
+        self.stop()
+
+    def stop(self):
+        """
+        Stops watching the presets directory for changes
+        """
         self.observer.stop()
         self.observer.join()
 
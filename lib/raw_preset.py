@@ -18,10 +18,12 @@
 import numpy as np
 import time
 import logging
-import colorsys
+import unittest
 
 from lib.preset import Preset
 from lib.buffer_utils import BufferUtils
+from lib.clock import monotonic
+from lib.color_kernels import ColorWorkspace, hls_to_rgb, hsv_to_rgb, rgb_to_hls
 
 log = logging.getLogger("firemix.lib.per_pixel_preset")
 
@@ -30,9 +32,15 @@ class RawPreset(Preset):
     """
     A RawPreset is a special type of Preset designed for per-pixel manipulation.
     It uses a single draw() method called every tick.
+
+    The pixel setters convert colors to the preset's color_space, so an RGB
+    preset can use setPixelRGB() without a round trip through HLS.  They take
+    a single color or an array of colors, for a pixel index or an array of
+    them.
     """
     _pixel_buffer = None
     _indices = None
+    _workspace = None
 
     def __init__(self, mixer, name):
         Preset.__init__(self, mixer, name)
@@ -57,30 +65,49 @@ class RawPreset(Preset):
 
     def current_color(self, address):
         """
-        Returns the current color of a pixel in RGB float
+        Returns the current color of a pixel, in the preset's color space
         address is a tuple of (strand, fixture, pixel)
         """
         return self._pixel_buffer[address]
 
+    def _convert_colors(self, color, kernel):
+        """
+        Converts a color, or an array of them, with a lib.color_kernels kernel
+        """
+        if self._workspace is None:
+            self._workspace = ColorWorkspace()
+        colors = np.asarray(color, dtype=np.float32)
+        flat = colors.reshape(-1, 3)
+        return kernel(flat, np.empty_like(flat), self._workspace).reshape(colors.shape)
+
     def setPixelHLS(self, index, color):
+        if self.color_space == "RGB":
+            color = self._convert_colors(color, hls_to_rgb)
         self._pixel_buffer[index] = color
         
     def setPixelRGB(self, index, color):
-        self.setPixelHLS(index, colorsys.rgb_to_hls(*color))
+        if self.color_space != "RGB":
+            color = self._convert_colors(color, rgb_to_hls)
+        self._pixel_buffer[index] = color
         
     def setPixelHSV(self, index, color):
-        # There's probably a more efficient way to do this:
-        hls = colorsys.rgb_to_hls(*colorsys.hsv_to_rgb(*color))
-
-        self.setPixelHLS(index, hls)
+        self.setPixelRGB(index, self._convert_colors(color, hsv_to_rgb))
 
     def setAllHLS(self, hues, luminances, saturations):
         """
-        Sets the entire buffer, assuming an input list.
+        Sets the entire buffer, assuming an input list.  For HLS presets only.
         """
         self._pixel_buffer[:,0] = hues
         self._pixel_buffer[:,1] = luminances
         self._pixel_buffer[:,2] = saturations
+
+    def setAllRGB(self, reds, greens, blues):
+        """
+        Sets the entire buffer, assuming an input list.  For RGB presets only.
+        """
+        self._pixel_buffer[:,0] = reds
+        self._pixel_buffer[:,1] = greens
+        self._pixel_buffer[:,2] = blues
  
     def get_buffer(self):
         """
@@ -95,8 +122,10 @@ class RawPreset(Preset):
         if self.disabled:
             return
 
+        parameter_start = monotonic()
         for parameter in self._parameters.values():
             parameter.tick(dt)
+        self._mixer.frame_stats.add("parameter-tick", monotonic() - parameter_start)
         
         self.draw(dt)
 
@@ -104,3 +133,40 @@ class RawPreset(Preset):
 
     def draw_to_buffer(self, buffer):
         return self.get_buffer()
+
+
+class TestRawPreset(unittest.TestCase):
+
+    class Pixels(RawPreset):
+
+        def init_pixels(self):
+            self._pixel_buffer = np.zeros((6, 3), dtype=np.float32)
+
+    class RgbPixels(Pixels):
+        color_space = "RGB"
+
+    def test_setters(self):
+        hls = self.Pixels(None, "hls")
+        rgb = self.RgbPixels(None, "rgb")
+        indices = np.array([1, 3, 4])
+        hls_colors = np.array([[0.0, 0.5, 1.0], [1.0 / 3, 0.25, 1.0], [2.0 / 3, 0.5, 0.5]], dtype=np.float32)
+        rgb_colors = np.array([[1.0, 0.0, 0.0], [0.0, 0.5, 0.0], [0.25, 0.25, 0.75]], dtype=np.float32)
+
+        for preset in (hls, rgb):
+            preset.setPixelHLS(indices, hls_colors)
+            preset.setPixelHLS(0, (0.0, 0.5, 1.0))
+            preset.setPixelHSV(np.array([2, 5]), (2.0 / 3, 1.0, 1.0))
+        self.assertTrue(np.allclose(hls.get_buffer()[indices], hls_colors))
+        self.assertTrue(np.allclose(rgb.get_buffer()[indices], rgb_colors, atol=1e-5))
+        self.assertTrue(np.allclose(rgb.get_buffer()[0], [1.0, 0.0, 0.0]))
+        self.assertTrue(np.allclose(rgb.get_buffer()[[2, 5]], [0.0, 0.0, 1.0]))
+        self.assertTrue(np.allclose(hls.get_buffer()[[2, 5]], [2.0 / 3, 0.5, 1.0], atol=1e-5))
+
+        hls.setPixelRGB(indices, rgb_colors)
+        self.assertTrue(np.allclose(hls.get_buffer()[indices], hls_colors, atol=1e-5))
+        rgb.setPixelRGB(indices, hls_colors)
+        self.assertTrue(np.array_equal(rgb.get_buffer()[indices], hls_colors))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -32,10 +32,12 @@ class Scene(JSONDict):
     Basic model for a scene.
     """
 
-    def __init__(self, app):
+    def __init__(self, app, filepath=None):
         self._app = app
         self._name = app.args.scene
-        self._filepath = os.path.join(os.getcwd(), "data", "scenes", "".join([self._name, ".json"]))
+        self._filepath = filepath
+        if self._filepath is None:
+            self._filepath = os.path.join(os.getcwd(), "data", "scenes", "".join([self._name, ".json"]))
         JSONDict.__init__(self, 'scene', self._filepath, False)
 
         self._fixtures = None
@@ -112,6 +114,7 @@ class Scene(JSONDict):
 
     def set_strand_settings(self, settings):
         self.data["strand-settings"] = settings
+        self._strand_settings = settings
 
     def fixtures(self):
         """
@@ -0,0 +1,126 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Generates synthetic scenes of arbitrary size for benchmarking.
+
+Scenes use the same JSON layout that FireSim writes, so they can be saved
+to data/scenes and loaded like any other scene.
+"""
+
+import math
+import random
+
+TOPOLOGIES = ["grid", "radial", "random"]
+
+# Distance between adjacent pixels on a fixture, in scene units.  Matches the
+# density of the real scenes (32 pixels over ~100 units).
+PIXEL_SPACING = 3.0
+
+
+def _fixture(strand, address, pixels, pos1, pos2):
+    return {"strand": strand,
+            "address": address,
+            "pixels": pixels,
+            "pos1": [int(round(pos1[0])), int(round(pos1[1]))],
+            "pos2": [int(round(pos2[0])), int(round(pos2[1]))],
+            "type": "linear"}
+
+
+def _grid(strands, fixtures_per_strand, pixels_per_fixture, rng):
+    """
+    Each strand is a horizontal row of fixtures laid end to end.
+    """
+    length = pixels_per_fixture * PIXEL_SPACING
+    row_spacing = 2 * PIXEL_SPACING
+    fixtures = []
+    for strand in xrange(strands):
+        y = strand * row_spacing
+        for address in xrange(fixtures_per_strand):
+            x = address * length
+            fixtures.append(_fixture(strand, address, pixels_per_fixture, (x, y), (x + length - PIXEL_SPACING, y)))
+    return fixtures
+
+
+def _radial(strands, fixtures_per_strand, pixels_per_fixture, rng):
+    """
+    Each strand is a spoke radiating out from the center, like the dome.
+    """
+    length = pixels_per_fixture * PIXEL_SPACING
+    inner_radius = length
+    fixtures = []
+    for strand in xrange(strands):
+        angle = 2 * math.pi * strand / strands
+        dx, dy = math.cos(angle), math.sin(angle)
+        for address in xrange(fixtures_per_strand):
+            r1 = inner_radius + address * length
+            r2 = r1 + length - PIXEL_SPACING
+            fixtures.append(_fixture(strand, address, pixels_per_fixture, (r1 * dx, r1 * dy), (r2 * dx, r2 * dy)))
+    return fixtures
+
+
+def _random(strands, fixtures_per_strand, pixels_per_fixture, rng):
+    """
+    Fixtures are placed at random positions and angles, at roughly the
+    pixel density of the other topologies.
+    """
+    length = pixels_per_fixture * PIXEL_SPACING
+    size = length * math.sqrt(strands * fixtures_per_strand)
+    fixtures = []
+    for strand in xrange(strands):
+        for address in xrange(fixtures_per_strand):
+            x, y = rng.uniform(0, size), rng.uniform(0, size)
+            angle = rng.uniform(0, 2 * math.pi)
+            fixtures.append(_fixture(strand, address, pixels_per_fixture, (x, y),
+                                     (x + math.cos(angle) * length, y + math.sin(angle) * length)))
+    return fixtures
+
+
+def generate_scene(strands, fixtures_per_strand=4, pixels_per_fixture=32, topology="grid", seed=0):
+    """
+    Returns a scene dictionary with the given number of strands, fixtures and
+    pixels, laid out according to topology (one of TOPOLOGIES).  Coordinates
+    are shifted so that the scene starts at the origin.
+    """
+    generators = {"grid": _grid, "radial": _radial, "random": _random}
+    if topology not in generators:
+        raise ValueError("topology must be one of %s" % ", ".join(TOPOLOGIES))
+
+    rng = random.Random(seed)
+    fixtures = generators[topology](strands, fixtures_per_strand, pixels_per_fixture, rng)
+
+    xs = [f["pos1"][0] for f in fixtures] + [f["pos2"][0] for f in fixtures]
+    ys = [f["pos1"][1] for f in fixtures] + [f["pos2"][1] for f in fixtures]
+    xmin, ymin = min(xs), min(ys)
+    margin = int(PIXEL_SPACING * 4)
+    for f in fixtures:
+        for pos in (f["pos1"], f["pos2"]):
+            pos[0] += margin - xmin
+            pos[1] += margin - ymin
+
+    width = max(xs) - xmin + 2 * margin
+    height = max(ys) - ymin + 2 * margin
+
+    return {"file-type": "scene",
+            "name": "synthetic-%s-%dx%dx%d" % (topology, strands, fixtures_per_strand, pixels_per_fixture),
+            "backdrop_enable": False,
+            "extents": [width, height],
+            "bounding_box": [width, height],
+            "center": [width / 2, height / 2],
+            "fixtures": fixtures,
+            "strand-settings": [{"id": strand, "enabled": True, "color-mode": "RGB8"}
+                                for strand in xrange(strands)]}
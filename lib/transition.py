@@ -21,8 +21,14 @@ class Transition:
     Defines the interface for a transition.
 
     Given two numpy arrays and a progress (0 to 1.0), it produces one output array.
+
+    color_spaces lists the color spaces the transition can blend in.  RGB
+    frames are blended with get_rgb(), which by default is get(): that
+    suits transitions that only choose or mix whole pixels.
     """
 
+    color_spaces = ["HLS"]
+
     def __init__(self, app):
         self._app = app
 
@@ -48,4 +54,10 @@ class Transition:
         """
         This method will return a frame that is between start and end, according to progress
         """
-        pass
\ No newline at end of file
+        pass
+
+    def get_rgb(self, start, end, progress):
+        """
+        As get(), for RGB frames
+        """
+        return self.get(start, end, progress)
\ No newline at end of file
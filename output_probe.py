@@ -0,0 +1,349 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Loopback receiver for measuring the output path.
+
+Receives the Legacy, OPC (UDP or TCP) or ZMQ output of a FireMix running on
+the same host, with the sequence-stamps networking setting on, and reports
+end-to-end latency (from the mixer finishing a frame to the last of its
+packets arriving here), jitter, dropped and reordered frames and
+throughput.  Point a client at this host and port, e.g.:
+
+    python output_probe.py --protocol Legacy --port 3020 --duration 30 --json probe.json
+"""
+
+import argparse
+import json
+import logging
+import select
+import signal
+import socket
+import sys
+
+from core.frame_stamp import (LEGACY_STAMP_COMMAND, OPC_STAMP_SYSTEM_ID, OPC_SYSEX_COMMAND,
+                              STAMP_SIZE, unpack_stamp)
+from core.legacy import LEGACY_FRAME_BEGIN, LEGACY_FRAME_END
+from lib.clock import monotonic
+from lib.frame_stats import FrameStats
+
+log = logging.getLogger("firemix.output_probe")
+
+
+class ProbeStats:
+    """
+    Collects per-frame receive statistics.
+
+    A frame whose sequence number skips ahead counts the frames in between
+    as dropped; if one of those arrives later it is counted as reordered
+    instead.  Jitter is the RFC 3550 interarrival jitter: a running mean of
+    the change in latency from one frame to the next.
+    """
+
+    def __init__(self):
+        self.stats = FrameStats(4096)
+        self.frames = 0
+        self.unstamped_frames = 0
+        self.bytes = 0
+        self.dropped_frames = 0
+        self.reordered_frames = 0
+        self.duplicate_frames = 0
+        self.restarts = 0
+        self.jitter = 0.0
+        self._last_sequence = None
+        self._last_latency = None
+        self._last_received = None
+        self._first_received = None
+
+    def frame(self, stamp, size, received):
+        self.frames += 1
+        self.bytes += size
+        if self._first_received is None:
+            self._first_received = received
+        if self._last_received is not None:
+            self.stats.record("interval", received - self._last_received)
+        self._last_received = received
+
+        if stamp is None:
+            self.unstamped_frames += 1
+            return
+        sequence, sent = stamp
+
+        if self._last_sequence is None or sequence == 1 and self._last_sequence > 1:
+            if self._last_sequence is not None:
+                self.restarts += 1
+            self._last_sequence = sequence
+        elif sequence > self._last_sequence:
+            self.dropped_frames += sequence - self._last_sequence - 1
+            self._last_sequence = sequence
+        elif sequence == self._last_sequence:
+            self.duplicate_frames += 1
+            return
+        else:
+            self.reordered_frames += 1
+            self.dropped_frames = max(0, self.dropped_frames - 1)
+
+        latency = received - sent
+        self.stats.record("latency", latency)
+        if self._last_latency is not None:
+            self.jitter += (abs(latency - self._last_latency) - self.jitter) / 16.0
+        self._last_latency = latency
+
+    def get_stats(self):
+        elapsed = 0.0
+        if self._first_received is not None:
+            elapsed = self._last_received - self._first_received
+        return {"frames": self.frames,
+                "unstamped-frames": self.unstamped_frames,
+                "dropped-frames": self.dropped_frames,
+                "reordered-frames": self.reordered_frames,
+                "duplicate-frames": self.duplicate_frames,
+                "restarts": self.restarts,
+                "bytes": self.bytes,
+                "frames-per-second": (self.frames - 1) / elapsed if elapsed > 0 else 0.0,
+                "megabits-per-second": self.bytes * 8 / elapsed / 1e6 if elapsed > 0 else 0.0,
+                "jitter": self.jitter * 1000.0,
+                "latency": self.stats.stage_stats("latency"),
+                "interval": self.stats.stage_stats("interval")}
+
+    def format_line(self):
+        stats = self.get_stats()
+        latency = stats["latency"] or {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        return ("%6d frames %6.1f fps %7.2f Mbit/s  latency p50 %6.2f p95 %6.2f max %6.2f ms  "
+                "jitter %5.2f ms  dropped %d reordered %d" % (
+                    stats["frames"], stats["frames-per-second"], stats["megabits-per-second"],
+                    latency["p50"], latency["p95"], latency["max"], stats["jitter"],
+                    stats["dropped-frames"], stats["reordered-frames"]))
+
+
+def open_udp_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # A large buffer, so that drops are the sender's rather than ours.
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind((host, port))
+    sock.setblocking(0)
+    return sock
+
+
+def drain(sock):
+    """
+    Yields the datagrams waiting on a non-blocking socket
+    """
+    while True:
+        try:
+            yield sock.recv(65536)
+        except socket.error:
+            return
+
+
+class LegacyReceiver:
+    """
+    Legacy frames: LEGACY_FRAME_BEGIN, the stamp and strand packets, then
+    LEGACY_FRAME_END, which completes the frame.
+    """
+
+    def __init__(self, stats, host, port):
+        self._stats = stats
+        self._socket = open_udp_socket(host, port)
+        self._in_frame = False
+        self._stamp = None
+        self._size = 0
+        self.malformed_packets = 0
+
+    def poll(self, timeout):
+        if not select.select([self._socket], [], [], timeout)[0]:
+            return
+        for data in drain(self._socket):
+            self.packet(data, monotonic())
+
+    def packet(self, data, received):
+        if data == LEGACY_FRAME_BEGIN:
+            self._in_frame = True
+            self._stamp = None
+            self._size = len(data)
+        elif data == LEGACY_FRAME_END:
+            if self._in_frame:
+                self._stats.frame(self._stamp, self._size + len(data), received)
+            self._in_frame = False
+        elif len(data) >= 4 and len(data) - 4 == ord(data[2]) | (ord(data[3]) << 8):
+            self._size += len(data)
+            if data[0] == LEGACY_STAMP_COMMAND and len(data) == 4 + STAMP_SIZE:
+                self._stamp = unpack_stamp(data[4:])
+        else:
+            self.malformed_packets += 1
+
+    def close(self):
+        self._socket.close()
+
+
+class OpcReceiver:
+    """
+    OPC messages, over UDP (one message per datagram) or from TCP
+    connections.  A stamp message comes before the set pixel colors
+    message that completes the frame.
+    """
+
+    def __init__(self, stats, host, port):
+        self._stats = stats
+        self._socket = open_udp_socket(host, port)
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(1)
+        self._connections = {}
+        self._stamp = None
+        self._size = 0
+
+    def poll(self, timeout):
+        readable = select.select([self._socket, self._listener] + self._connections.keys(), [], [], timeout)[0]
+        for sock in readable:
+            if sock is self._socket:
+                for data in drain(self._socket):
+                    self.messages(data, monotonic())
+            elif sock is self._listener:
+                connection, address = self._listener.accept()
+                log.info("OPC connection from %s:%d" % address)
+                self._connections[connection] = ""
+            else:
+                data = sock.recv(1024 * 1024)
+                if not data:
+                    del self._connections[sock]
+                    sock.close()
+                    continue
+                self._connections[sock] = self.messages(self._connections[sock] + data, monotonic())
+
+    def messages(self, data, received):
+        """
+        Handles the complete messages in data, and returns the rest
+        """
+        offset = 0
+        while len(data) - offset >= 4:
+            length = (ord(data[offset + 2]) << 8) | ord(data[offset + 3])
+            end = offset + 4 + length
+            if end > len(data):
+                break
+            command = ord(data[offset + 1])
+            self._size += 4 + length
+            if command == OPC_SYSEX_COMMAND and length == 2 + STAMP_SIZE:
+                system_id = (ord(data[offset + 4]) << 8) | ord(data[offset + 5])
+                if system_id == OPC_STAMP_SYSTEM_ID:
+                    self._stamp = unpack_stamp(data[offset + 6:end])
+            elif command == 0:
+                self._stats.frame(self._stamp, self._size, received)
+                self._stamp = None
+                self._size = 0
+            offset = end
+        return data[offset:]
+
+    def close(self):
+        for connection in self._connections.keys():
+            connection.close()
+        self._listener.close()
+        self._socket.close()
+
+
+class ZmqReceiver:
+    """
+    Subscribes to FireMix's ZMQ publisher.  Each message is one frame.
+    """
+
+    def __init__(self, stats, host, port):
+        import zmq
+        self._zmq = zmq
+        self._stats = stats
+        self._context = zmq.Context.instance()
+        self._socket = self._context.socket(zmq.SUB)
+        self._socket.setsockopt(zmq.SUBSCRIBE, "")
+        self._socket.connect("tcp://%s:%d" % (host, port))
+
+    def poll(self, timeout):
+        if not self._socket.poll(int(timeout * 1000)):
+            return
+        while True:
+            try:
+                parts = self._socket.recv_multipart(self._zmq.NOBLOCK)
+            except self._zmq.Again:
+                return
+            received = monotonic()
+            stamp = None
+            for part in parts:
+                if part[0] == LEGACY_STAMP_COMMAND and len(part) == 4 + STAMP_SIZE:
+                    stamp = unpack_stamp(part[4:])
+            self._stats.frame(stamp, sum([len(part) for part in parts]), received)
+
+    def close(self):
+        self._socket.close()
+
+
+RECEIVERS = {"Legacy": LegacyReceiver, "OPC": OpcReceiver, "ZMQ": ZmqReceiver}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Receive FireMix output locally and measure the output path")
+    parser.add_argument("--protocol", type=str, default="Legacy", choices=sorted(RECEIVERS.keys()))
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="Address to listen on, or for ZMQ, to subscribe to (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=3020)
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to run for (default: until Ctrl-C)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between reports (default: 1)")
+    parser.add_argument("--json", type=str, default=None, help="Write the final statistics to this file")
+    args = parser.parse_args()
+
+    stats = ProbeStats()
+    receiver = RECEIVERS[args.protocol](stats, args.host, args.port)
+    log.info("Receiving %s on %s:%d" % (args.protocol, args.host, args.port))
+
+    running = [True]
+
+    def sig_handler(s, f):
+        running[0] = False
+    signal.signal(signal.SIGINT, sig_handler)
+
+    start = monotonic()
+    next_report = start + args.interval
+    while running[0]:
+        now = monotonic()
+        if args.duration is not None and now - start >= args.duration:
+            break
+        try:
+            receiver.poll(max(0.0, min(next_report - now, 0.1)))
+        except (select.error, socket.error):
+            if running[0]:
+                raise
+        if monotonic() >= next_report:
+            print stats.format_line()
+            sys.stdout.flush()
+            next_report += args.interval
+    receiver.close()
+
+    results = stats.get_stats()
+    print
+    print stats.format_line()
+    if stats.frames and stats.unstamped_frames == stats.frames:
+        print "No frames were stamped; turn on the sequence-stamps networking setting"
+    print stats.stats.format_table()
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+        print "Results written to %s" % args.json
+
+
+if __name__ == "__main__":
+    main()
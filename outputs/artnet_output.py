@@ -0,0 +1,42 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+from lib.output_driver import OutputDriver
+from core import dmx
+
+
+class ArtNetOutput(OutputDriver):
+    """
+    Art-Net (ArtDmx) output.  Client settings: "universe" (the first
+    universe, default 0) and "sync" (send ArtSync after each frame).
+    """
+
+    protocol = "ArtNet"
+
+    def __init__(self, net):
+        OutputDriver.__init__(self, net)
+        self._sender = dmx.DmxSender(lambda client: (client.get("universe", 0), client.get("sync", False)),
+                                     lambda key: dmx.ArtNetEncoder(*key))
+
+    def build(self, clients, strand_settings, extents):
+        self._sender.build(clients, strand_settings, extents)
+
+    def encode(self, frames):
+        self._sender.pack(frames.get("RGB8"))
+
+    def send(self):
+        self._sender.send(self._net.socket)
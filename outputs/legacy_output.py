@@ -0,0 +1,108 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+from lib.color_modes import group_clients
+from lib.output_driver import OutputDriver
+from core.delta_filter import DeltaFilter
+from core.legacy import LegacyEncoder, LEGACY_FRAME_BEGIN, LEGACY_FRAME_END
+from core.output_scheduler import OutputScheduler
+
+
+class LegacyOutput(OutputDriver):
+    """
+    Legacy UDP protocol: each frame is LEGACY_FRAME_BEGIN, one packet per
+    strand, LEGACY_FRAME_END.  Clients get the frame in their color mode,
+    with one encoder per mode.  Honors the async-output and delta-frames
+    networking settings.
+    """
+
+    protocol = "Legacy"
+
+    def __init__(self, net):
+        OutputDriver.__init__(self, net)
+        self._encoders = {}
+        self._addresses = {}
+        self._schedulers = {}
+        self._delta_filters = {}
+
+    def build(self, clients, strand_settings, extents):
+        settings = self._net.settings
+        groups = group_clients(clients)
+        self._encoders = {}
+        self._addresses = {}
+        for mode, mode_clients in groups:
+            self._encoders[mode] = LegacyEncoder()
+            self._encoders[mode].build(strand_settings, extents, mode, settings.get('sequence-stamps', False))
+            self._addresses[mode] = [(client["host"], client["port"]) for client in mode_clients]
+
+        keyframe_interval = None
+        if settings.get('delta-frames', False):
+            keyframe_interval = max(1, settings.get('keyframe-interval', 30))
+
+        # Drop anything built for a mode, output setting or keyframe interval that no longer applies
+        async_output = settings.get('async-output', False)
+        for mode, scheduler in self._schedulers.items():
+            if not async_output or mode not in self._encoders or scheduler.keyframe_interval != keyframe_interval:
+                self._schedulers.pop(mode).stop()
+        for mode, delta_filter in self._delta_filters.items():
+            if async_output or mode not in self._encoders or delta_filter.keyframe_interval != keyframe_interval:
+                del self._delta_filters[mode]
+
+        for mode, mode_clients in groups:
+            if async_output:
+                if mode not in self._schedulers:
+                    self._schedulers[mode] = OutputScheduler(LEGACY_FRAME_BEGIN, LEGACY_FRAME_END,
+                                                             keyframe_interval)
+                self._schedulers[mode].update_clients(mode_clients)
+            elif keyframe_interval is not None and mode not in self._delta_filters:
+                # Synchronous sends give every client every frame, so one filter serves them all.
+                self._delta_filters[mode] = DeltaFilter(keyframe_interval)
+
+    def encode(self, frames):
+        for mode, encoder in self._encoders.iteritems():
+            encoder.pack(frames.get(mode))
+            if frames.stamp is not None:
+                encoder.set_stamp(frames.stamp)
+
+    def send(self):
+        sock = self._net.socket
+        for mode, encoder in self._encoders.iteritems():
+            if mode in self._schedulers:
+                self._schedulers[mode].submit(encoder.frame, encoder.bounds)
+                continue
+
+            packets = encoder.packets
+            if mode in self._delta_filters:
+                packets = [packets[i] for i in self._delta_filters[mode].select(encoder.frame, encoder.bounds)]
+
+            for address in self._addresses[mode]:
+                sock.sendto(LEGACY_FRAME_BEGIN, address)
+                for packet in packets:
+                    sock.sendto(packet, address)
+                sock.sendto(LEGACY_FRAME_END, address)
+
+    def stop(self):
+        for scheduler in self._schedulers.itervalues():
+            scheduler.stop()
+
+    def get_stats(self):
+        stats = {}
+        for scheduler in self._schedulers.itervalues():
+            stats.update(scheduler.get_stats())
+        for mode, delta_filter in self._delta_filters.iteritems():
+            stats["delta-frames %s" % mode] = delta_filter.get_stats()
+        return stats
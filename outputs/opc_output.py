@@ -0,0 +1,99 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+from lib.color_modes import client_mode, group_clients
+from lib.output_driver import OutputDriver
+from core.opc import OpcEncoder, OpcTcpClient
+from core.output_scheduler import OutputScheduler
+
+
+class OpcOutput(OutputDriver):
+    """
+    Open Pixel Control: one packet per frame with every enabled strand, in
+    the client's color mode (one encoder per mode).  Clients are sent to
+    over UDP (optionally through the async-output workers), or over a
+    persistent TCP connection if their "transport" setting is "tcp".
+    """
+
+    protocol = "OPC"
+
+    def __init__(self, net):
+        OutputDriver.__init__(self, net)
+        self._encoders = {}
+        self._udp_addresses = {}
+        self._tcp_connections = {}
+        self._schedulers = {}
+
+    def build(self, clients, strand_settings, extents):
+        stamp = self._net.settings.get('sequence-stamps', False)
+        async_output = self._net.settings.get('async-output', False)
+        self._encoders = {}
+        self._udp_addresses = {}
+        for mode, mode_clients in group_clients(clients):
+            self._encoders[mode] = OpcEncoder()
+            self._encoders[mode].build(strand_settings, extents, mode, stamp)
+            udp_clients = [client for client in mode_clients if client.get("transport", "udp") == "udp"]
+            self._udp_addresses[mode] = [(client["host"], client["port"]) for client in udp_clients]
+            if async_output:
+                if mode not in self._schedulers:
+                    self._schedulers[mode] = OutputScheduler()
+                self._schedulers[mode].update_clients(udp_clients)
+
+        for mode in self._schedulers.keys():
+            if not async_output or mode not in self._encoders:
+                self._schedulers.pop(mode).stop()
+
+        tcp_clients = dict([((client["host"], client["port"]), client_mode(client)) for client in clients
+                            if client.get("transport", "udp") == "tcp"])
+        for address, (mode, connection) in self._tcp_connections.items():
+            if tcp_clients.get(address, None) != mode:
+                self._tcp_connections.pop(address)[1].close()
+        for address, mode in tcp_clients.iteritems():
+            if address not in self._tcp_connections:
+                self._tcp_connections[address] = (mode, OpcTcpClient(address[0], address[1]))
+
+    def encode(self, frames):
+        for mode, encoder in self._encoders.iteritems():
+            encoder.pack(frames.get(mode))
+            if frames.stamp is not None:
+                encoder.set_stamp(frames.stamp)
+
+    def send(self):
+        for mode, encoder in self._encoders.iteritems():
+            if mode in self._schedulers:
+                self._schedulers[mode].submit(encoder.frame, encoder.bounds)
+            else:
+                for address in self._udp_addresses[mode]:
+                    for packet in encoder.packets:
+                        self._net.socket.sendto(packet, address)
+
+        for mode, connection in self._tcp_connections.itervalues():
+            connection.send(self._encoders[mode].packet)
+
+    def stop(self):
+        for scheduler in self._schedulers.itervalues():
+            scheduler.stop()
+        for mode, connection in self._tcp_connections.itervalues():
+            connection.close()
+
+    def get_stats(self):
+        stats = {}
+        for scheduler in self._schedulers.itervalues():
+            stats.update(scheduler.get_stats())
+        for address, (mode, connection) in self._tcp_connections.iteritems():
+            stats["TCP %s:%d" % address] = connection.get_stats()
+        return stats
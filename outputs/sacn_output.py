@@ -0,0 +1,43 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+from lib.output_driver import OutputDriver
+from core import dmx
+
+
+class SacnOutput(OutputDriver):
+    """
+    sACN (E1.31) output.  Client settings: "universe" (the first universe,
+    default 1) and "sync-universe" (send E1.31 synchronization packets for
+    this universe after each frame).
+    """
+
+    protocol = "sACN"
+
+    def __init__(self, net):
+        OutputDriver.__init__(self, net)
+        self._sender = dmx.DmxSender(lambda client: (client.get("universe", 1), client.get("sync-universe", None)),
+                                     lambda key: dmx.E131Encoder(*key))
+
+    def build(self, clients, strand_settings, extents):
+        self._sender.build(clients, strand_settings, extents)
+
+    def encode(self, frames):
+        self._sender.pack(frames.get("RGB8"))
+
+    def send(self):
+        self._sender.send(self._net.socket)
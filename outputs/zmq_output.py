@@ -0,0 +1,87 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from lib.color_modes import group_clients
+from lib.output_driver import OutputDriver
+from core.legacy import LegacyEncoder
+
+try:
+    import zmq
+    from core.zmq_publisher import ZmqPublisher
+    USE_ZMQ = True
+except ImportError:
+    USE_ZMQ = False
+
+log = logging.getLogger("firemix.outputs.zmq_output")
+
+
+class ZmqOutput(OutputDriver):
+    """
+    Publishes frames in the Legacy format on a ZMQ PUB socket (for FireSim).
+    The socket is bound, on the zmq-port networking setting, once there is
+    a ZMQ client; the clients' hosts and ports are not used.  There is one
+    stream, so it is in a single color mode (that of the ZMQ clients).
+    """
+
+    protocol = "ZMQ"
+
+    def __init__(self, net):
+        OutputDriver.__init__(self, net)
+        self._encoder = LegacyEncoder()
+        self._mode = "RGB8"
+        self._publisher = None
+
+    def build(self, clients, strand_settings, extents):
+        if not clients:
+            return
+        if not USE_ZMQ:
+            log.error("pyzmq is not installed; ZMQ output is disabled")
+            return
+
+        groups = group_clients(clients)
+        self._mode = groups[0][0]
+        if len(groups) > 1:
+            log.warn("ZMQ clients have different color modes; publishing %s" % self._mode)
+
+        if self._publisher is None:
+            settings = self._net.settings
+            self._publisher = ZmqPublisher(zmq.Context.instance(), settings.get('zmq-port', 3020),
+                                           settings.get('zmq-hwm', 2))
+        self._encoder.build(strand_settings, extents, self._mode, self._net.settings.get('sequence-stamps', False))
+        self._publisher.reset(self._encoder)
+
+    def encode(self, frames):
+        if self._publisher is not None:
+            self._encoder.pack(frames.get(self._mode))
+            if frames.stamp is not None:
+                self._encoder.set_stamp(frames.stamp)
+
+    def send(self):
+        if self._publisher is not None:
+            self._publisher.send(self._encoder)
+
+    def stop(self):
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
+
+    def get_stats(self):
+        if self._publisher is None:
+            return {}
+        return {"publisher": self._publisher.get_stats()}
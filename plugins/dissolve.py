@@ -17,14 +17,17 @@
 
 import numpy as np
 
-from lib.colors import hls_blend
+from lib.color_kernels import ColorWorkspace, hls_blend, rgb_blend
 from lib.transition import Transition
 
 class Dissolve(Transition):
 
+    color_spaces = ["HLS", "RGB"]
+
     def __init__(self, app):
         Transition.__init__(self, app)
         self._buffer = None
+        self._workspace = ColorWorkspace()
 
     def __str__(self):
         return "Dissolve"
@@ -32,4 +35,9 @@ class Dissolve(Transition):
     def get(self, start, end, progress, fade_length = 1.0):
         if self._buffer is None:
             self._buffer = np.empty_like(start)
-        return hls_blend(start, end, self._buffer, progress, 'add', fade_length, 1.0)
+        return hls_blend(start, end, self._buffer, progress, 'add', self._workspace, fade_length, 1.0)
+
+    def get_rgb(self, start, end, progress, fade_length=1.0):
+        if self._buffer is None:
+            self._buffer = np.empty_like(start)
+        return rgb_blend(start, end, self._buffer, progress, self._workspace, fade_length, 1.0)
@@ -25,6 +25,8 @@ class FixtureStrobe(Transition):
     """
     """
 
+    color_spaces = ["HLS", "RGB"]
+
     def __init__(self, app):
         Transition.__init__(self, app)
         self._strobing = []
@@ -17,7 +17,7 @@
 
 import numpy as np
 
-from lib.colors import hls_blend
+from lib.color_kernels import ColorWorkspace, hls_blend
 from lib.transition import Transition
 
 class LinearBlend(Transition):
@@ -29,6 +29,7 @@ class LinearBlend(Transition):
     def __init__(self, app):
         Transition.__init__(self, app)
         self._buffer = None
+        self._workspace = ColorWorkspace()
 
     def __str__(self):
         return "Linear Blend"
@@ -36,4 +37,4 @@ class LinearBlend(Transition):
     def get(self, start, end, progress, fade_length=0.6):
         if self._buffer is None:
             self._buffer = np.empty_like(start)
-        return hls_blend(start, end, self._buffer, progress, 'add', fade_length, 1.0)
+        return hls_blend(start, end, self._buffer, progress, 'add', self._workspace, fade_length, 1.0)
@@ -17,7 +17,7 @@
 
 import numpy as np
 
-from lib.colors import hls_blend
+from lib.color_kernels import ColorWorkspace, hls_blend
 from lib.transition import Transition
 
 class MultiplyBlend(Transition):
@@ -28,6 +28,7 @@ class MultiplyBlend(Transition):
     def __init__(self, app):
         Transition.__init__(self, app)
         self._buffer = None
+        self._workspace = ColorWorkspace()
 
     def __str__(self):
         return "Multiply Blend"
@@ -35,4 +36,4 @@ class MultiplyBlend(Transition):
     def get(self, start, end, progress, fade_length=0.5):
         if self._buffer is None:
             self._buffer = np.empty_like(start)
-        return hls_blend(start, end, self._buffer, progress, 'multiply', fade_length, 0.5)
+        return hls_blend(start, end, self._buffer, progress, 'multiply', self._workspace, fade_length, 0.5)
@@ -28,6 +28,8 @@ class SimplexBlend(Transition):
     Blends using a simplex noise mask
     """
 
+    color_spaces = ["HLS", "RGB"]
+
     def __init__(self, app):
         Transition.__init__(self, app)
 
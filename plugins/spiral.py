@@ -28,6 +28,8 @@ class Spiral(Transition):
     Spiral wipe
     """
 
+    color_spaces = ["HLS", "RGB"]
+
     def __init__(self, app):
         Transition.__init__(self, app)
         self.revolutions = 3
@@ -19,12 +19,11 @@ import colorsys
 import random
 import math
 import numpy as np
-import ast
 
 from lib.raw_preset import RawPreset
 from lib.colors import clip
 from lib.parameters import FloatParameter, StringParameter
-from lib.color_fade import ColorFade
+from lib.color_fade import gradients
 
 class RadialGradient(RawPreset):
     """Radial gradient that responds to onsets"""
@@ -74,10 +73,12 @@ class RadialGradient(RawPreset):
         self.pixel_distances = np.sqrt(np.square(x) + np.square(y))
         self.pixel_angles = math.pi + np.arctan2(y, x)
         self.pixel_distances /= max(self.pixel_distances)
+        self._colors = np.zeros((len(self.locations), 3), dtype=np.float32)
+        self._audio_colors = np.zeros((len(self.locations), 3), dtype=np.float32)
+        self._color_index = np.zeros(len(self.locations), dtype=np.intp)
         
     def parameter_changed(self, parameter):
-        fade_colors = ast.literal_eval(self.parameter('color-gradient').get())
-        self._fader = ColorFade(fade_colors, self._fader_steps)
+        self._fader = gradients.get_fade(self.parameter('color-gradient').get(), self._fader_steps)
 
     def reset(self):
         pass
@@ -117,12 +118,12 @@ class RadialGradient(RawPreset):
 
         if self.parameter('audio-energy-lum-strength').get():
             lums = np.mod(np.int_(hues * self.parameter('audio-energy-lum-time').get()), self._luminance_steps)
-            lums = self._mixer.audio.fader.color_cache.T[0][lums] * self.parameter('audio-energy-lum-strength').get()
+            lums = self._mixer.audio.fader.get_colors(lums, self._audio_colors, self._color_index)[:, 0] * self.parameter('audio-energy-lum-strength').get()
         else:
             lums = hues
 
         luminance_indices = np.mod(np.abs(np.int_((self.luminance_offset + lums * luminance_scale) * self._luminance_steps)), self._luminance_steps)
-        LS = self._fader.color_cache[luminance_indices].T
+        LS = self._fader.get_colors(luminance_indices, self._colors, self._color_index).T
         luminances = LS[1]
         luminances += self._mixer.audio.getEnergy() * self.parameter('audio-brightness').get()
 
@@ -131,6 +132,8 @@ class RadialGradient(RawPreset):
         if self.parameter('audio-use-fader').get():
             #luminances *= self._mixer.audio.fader.color_cache.T[1][np.int_(luminance_indices * self.parameter('audio-fader-percent').get())] * self.parameter('audio-use-fader').get()
             #hues += self._mixer.audio.fader.color_cache.T[0][np.int_(hues * 255 * self.parameter('audio-fader-percent').get())] * self.parameter('audio-use-fader').get()
-            hues += self._mixer.audio.fader.color_cache.T[0][np.int_(luminance_indices * self.parameter('audio-fader-percent').get())] * self.parameter('audio-use-fader').get()
+            audio_colors = self._mixer.audio.fader.get_colors(luminance_indices * self.parameter('audio-fader-percent').get(),
+                                                              self._audio_colors, self._color_index)
+            hues += audio_colors[:, 0] * self.parameter('audio-use-fader').get()
 
         self.setAllHLS(hues, luminances, LS[2])
@@ -17,11 +17,10 @@
 
 from noise import snoise3
 import numpy as np
-import ast
 
 from profilehooks import profile
 
-from lib.color_fade import ColorFade
+from lib.color_fade import gradients
 from lib.raw_preset import RawPreset
 from lib.parameters import FloatParameter, IntParameter, StringParameter
 import math
@@ -71,8 +70,7 @@ class SimplexNoise(RawPreset):
         self.hue_max = self.parameter('hue-max').get()
         self.color_speed = self.parameter('color-speed').get()
         self.scale = self.parameter('scale').get() / 100.0
-        fade_colors = ast.literal_eval(self.parameter('luminance-map').get())
-        self.lum_fader = ColorFade(fade_colors, self._luminance_steps)
+        self.lum_fader = gradients.get_fade(self.parameter('luminance-map').get(), self._luminance_steps)
 
     @profile
     def draw(self, dt):
@@ -98,7 +96,7 @@ class SimplexNoise(RawPreset):
         brights = np.asarray([snoise3(luminance_scale * location[0], luminance_scale * location[1], self._offset_z, 1, 0.5, 0.5) for location in locations])
         brights = (1.0 + brights) / 2
         brights *= self._luminance_steps
-        LS = self.lum_fader.color_cache[np.int_(brights)].T
+        LS = self.lum_fader.get_colors(brights).T
         luminances = LS[1] + self._mixer.audio.getEnergy() * self.parameter('audio-brightness').get()
         hue_offset = self.parameter('hue-offset').get() + self._mixer.audio.getSmoothEnergy() * self.parameter('audio-hue-offset').get()
 
@@ -19,11 +19,10 @@ import numpy as np
 import colorsys
 import random
 import math
-import ast
 
 from lib.raw_preset import RawPreset
 from lib.parameters import FloatParameter, HLSParameter, StringParameter
-from lib.color_fade import ColorFade
+from lib.color_fade import gradients
 
 class SpiralGradient(RawPreset):
     """Spiral gradient that responds to onsets"""
@@ -61,11 +60,11 @@ class SpiralGradient(RawPreset):
         self.audio_twist = 0
 
     def parameter_changed(self, parameter):
-        fade_colors = ast.literal_eval(self.parameter('color-gradient').get())
-        self._fader = ColorFade(fade_colors, self._fader_steps)
+        self._fader = gradients.get_fade(self.parameter('color-gradient').get(), self._fader_steps)
 
     def reset(self):
         self.locations = self.scene().get_all_pixel_locations()
+        self._color_index = np.zeros(len(self.locations), dtype=np.intp)
 
     def draw(self, dt):
         if self._mixer.is_onset():
@@ -104,11 +103,7 @@ class SpiralGradient(RawPreset):
 
         angles = np.mod(1.0 - self.pixel_angles - np.sin(self.wave_offset + wave_amplitude * wave_hue_period) * (wave_hue_width + self.audio_twist), 1.0)
         hues = self.color_offset + (radius_hue_width * self.pixel_distances) + (2 * np.abs(angles - 0.5) * angle_hue_width)
-        hues = np.int_(np.mod(hues, 1.0) * self._fader_steps)
-        colors = self._fader.color_cache[hues]
-        colors = colors.T
+        self._fader.get_colors(np.mod(hues, 1.0) * self._fader_steps, self._pixel_buffer, self._color_index)
+        colors = self._pixel_buffer.T
         colors[0] = np.mod(colors[0] + self.hue_inner, 1.0)
         colors[1] += self._mixer.audio.getEnergy() * self.parameter('audio-brightness').get()
-        colors = colors.T
-
-        self._pixel_buffer = colors
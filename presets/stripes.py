@@ -19,11 +19,10 @@ import colorsys
 import random
 import math
 import numpy as np
-import ast
 
 from lib.raw_preset import RawPreset
 from lib.parameters import FloatParameter, IntParameter, StringParameter
-from lib.color_fade import ColorFade
+from lib.color_fade import gradients
 
 class StripeGradient(RawPreset):
     _fader = None
@@ -48,6 +47,7 @@ class StripeGradient(RawPreset):
 
         cx, cy = self.scene().center_point()
         self.locations = self.scene().get_all_pixel_locations()
+        self._color_index = np.zeros(len(self.locations), dtype=np.intp)
         x,y = self.locations.T
         x -= cx
         y -= cy
@@ -56,8 +56,7 @@ class StripeGradient(RawPreset):
         self.pixel_distances /= max(self.pixel_distances)
             
     def parameter_changed(self, parameter):
-        fade_colors = ast.literal_eval(self.parameter('color-gradient').get())
-        self._fader = ColorFade(fade_colors, self.parameter('posterization').get())
+        self._fader = gradients.get_fade(self.parameter('color-gradient').get(), self.parameter('posterization').get())
     
     def reset(self):
         pass
@@ -88,8 +87,6 @@ class StripeGradient(RawPreset):
         y = (y / stripe_width) % 1.0
         x = np.abs(x - sx)
         y = np.abs(y - sy)
-        hues = np.int_(np.mod(x+y, 1.0) * posterization)
-        colors = self._fader.color_cache[hues]
+        colors = self._fader.get_colors(np.mod(x+y, 1.0) * posterization, self._pixel_buffer, self._color_index)
         colors.T[1] += self._mixer.audio.getEnergy() * self.parameter('audio-brightness').get()
         colors.T[0] += self.hue_inner
-        self._pixel_buffer = colors
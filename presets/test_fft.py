@@ -17,12 +17,11 @@
 
 import numpy as np
 import math
-import ast
 
 from lib.raw_preset import RawPreset
 from lib.parameters import FloatParameter, StringParameter
 from lib.watch import Watch
-from lib.color_fade import ColorFade
+from lib.color_fade import gradients
 from scipy import signal
 
 class TestFFT(RawPreset):
@@ -57,8 +56,7 @@ class TestFFT(RawPreset):
         self.add_watch(Watch(self, 'color_angle'))
 
     def parameter_changed(self, parameter):
-        fade_colors = ast.literal_eval(self.parameter('color-gradient').get())
-        self._fader = ColorFade(fade_colors, self._fader_steps)
+        self._fader = gradients.get_fade(self.parameter('color-gradient').get(), self._fader_steps)
 
     def reset(self):
         self.locations = self.scene().get_all_pixel_locations()
@@ -165,7 +163,7 @@ class TestFFT(RawPreset):
                 self.pixel_amplitudes[mask] += self.parameter('linear').get()
                 hues = pd
 
-        colors = self._fader.color_cache[hues]
+        colors = self._fader.get_colors(hues)
         np.minimum(self.pixel_amplitudes, 1, self.pixel_amplitudes)
         colors.T[1] *= np.power(self.pixel_amplitudes - self.parameter('fft-bias').get(), self.parameter('fft-gamma').get())
         colors.T[1] = self._pixel_buffer.T[1] * self.parameter('ghosting').get() + colors.T[1]
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
 
+import colorsys
 import numpy as np
 
 from lib.raw_preset import RawPreset
@@ -23,6 +24,8 @@ from lib.buffer_utils import BufferUtils
 class TestPattern(RawPreset):
     """Array calibration pattern"""
 
+    color_space = "RGB"
+
     def setup(self):
         self._pixels = self.scene().get_all_pixels()
         self._logical = self.scene().get_all_pixels_logical()
@@ -34,7 +37,7 @@ class TestPattern(RawPreset):
 
     def draw(self, dt):
         self._hue = (self._hue + (dt * 0.1)) % 1.0
-        self.setAllHLS(self._hue, 0.2, 1.0)
+        self.setAllRGB(*colorsys.hls_to_rgb(self._hue, 0.2, 1.0))
         for strand in self._heirarchy:
             self.setPixelHLS(BufferUtils.logical_to_index((strand, 0, 0), scene=self.scene()), (0.33, 0.5, 1.0))
 
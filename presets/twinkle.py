@@ -17,11 +17,10 @@
 
 import random
 import numpy as np
-import ast
 import math
 
 from lib.raw_preset import RawPreset
-from lib.color_fade import ColorFade
+from lib.color_fade import gradients
 from lib.parameters import FloatParameter, HLSParameter, StringParameter
 
 
@@ -66,8 +65,7 @@ class Twinkle(RawPreset):
 
     def _setup_colors(self):
         #fade_colors = [self.parameter('black-color').get(), self.parameter('off-color').get(), self.parameter('on-color').get()]
-        fade_colors = ast.literal_eval(self.parameter('color-gradient').get())
-        self._fader = ColorFade(fade_colors, self._fader_steps)
+        self._fader = gradients.get_fade(self.parameter('color-gradient').get(), self._fader_steps)
         #self.add_parameter(StringParameter('color-gradient', str(fade_colors)))
 
     def reset(self):
@@ -102,9 +100,9 @@ class Twinkle(RawPreset):
             births = np.sum(fft_pixels)
             self.birthByFFT -= fft_pixels
             popped, self._idle = self._idle[:births], np.append(self._idle[births:], self._idle[:births])
-            colors = np.repeat(self._fader.color_cache[:256], fft_pixels, axis=0)
+            colors = self._fader.get_colors(np.repeat(np.arange(len(fft_pixels)), fft_pixels)[:len(popped)])
 
-            self.setPixelHLS(popped, colors[:len(popped)])
+            self.setPixelHLS(popped, colors)
 
         # spawn FFT-colored rings
         if len(fft):
@@ -126,13 +124,13 @@ class Twinkle(RawPreset):
 
             currentTimes = self._current_time - self.ringTimes
             ringLife = self.parameter('audio-ring-lifetime').get()
-            for pixel in np.where(currentTimes < ringLife)[0]:
+            living = np.where(currentTimes < ringLife)[0]
+            for pixel, color in zip(living, self._fader.get_colors(self.ringColors[living])):
                 if self.ringTimes[pixel] > 0:
                     #print pixel
                     ringWidth = self.parameter('audio-ring-width').get()
                     size_percent = currentTimes[np.int_(pixel)] / ringLife
                     ring = np.where(np.abs(self.parameter('audio-ring-diameter').get() * size_percent + self.parameter('audio-ring-start-radius').get() - self.scene().get_pixel_distances(np.int_(pixel))) < ringWidth)
-                    color = self._fader.color_cache[self.ringColors[pixel]]
 
                     # if self.parameter('audio-ring-use-fft-brightness').get():
                     #     # self._mixer.audio.getSmoothedFFT()[self.ringColors[pixel]]
@@ -151,13 +149,14 @@ class Twinkle(RawPreset):
                 eq_bands = self.parameter('audio-eq-bands').get()
                 if eq_bands:
                     band_size = np.int_(len(smooth_fft) / eq_bands)
+                    color_band_size = np.int_((self._fader_steps + 1) / eq_bands)
+                    band_colors = self._fader.get_colors((np.arange(np.int_(eq_bands)) + 0.5) * color_band_size)
                     for band in range(np.int_(eq_bands)):
                         neighbors = self.scene().get_pixel_neighbors(self.eq_centers[band])
                         self.eq_centers[band] = neighbors[np.int_(np.random.random() * len(neighbors))]
                         fft_amount = np.sum(smooth_fft[band * band_size : (band + 1) * band_size]) / band_size
                         pixel = self.eq_centers[band]
-                        color_band_size = np.int_(len(self._fader.color_cache) / eq_bands)
-                        color = self._fader.color_cache[np.int_((band + 0.5) * color_band_size)]
+                        color = band_colors[band]
                         ringWidth = self.parameter('audio-ring-width').get()
                         size_percent = fft_amount
                         ring = np.where(np.abs(self.parameter('audio-ring-diameter').get() * size_percent + self.parameter('audio-ring-start-radius').get() - self.scene().get_pixel_distances(np.int_(pixel))) < ringWidth)
@@ -173,7 +172,7 @@ class Twinkle(RawPreset):
             if births:
                 popped = self._idle[:births]
                 self._idle = np.append(self._idle[births:], popped)
-                self.setPixelHLS(popped, self._fader.color_cache[max])
+                self.setPixelHLS(popped, self._fader.get_color(max))
 
             # this doesn't belong here, just testing
             if self.parameter('pie-peaks').get():
@@ -209,7 +208,7 @@ class Twinkle(RawPreset):
         # growing
         if len(self._fading_up):
             progress = np.atleast_1d(np.int_((self._current_time - self._time[self._fading_up]) / float(self.parameter('fade-up-time').get()) * self._fader_steps))
-            colors = self._fader.color_cache[np.minimum(progress, self._fader_steps)]
+            colors = self._fader.get_colors(progress)
             self.setPixelHLS(self._fading_up, colors)
             finished = (progress >= self._fader_steps)
             if len(self._fading_up[finished]) > 0:
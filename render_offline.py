@@ -0,0 +1,243 @@
+# This file is part of Firemix.
+#
+# Copyright 2013-2015 Jonathan Evans <jon@craftyjon.com>
+#
+# Firemix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Firemix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Firemix.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Headless, faster-than-realtime renderer.
+
+Loads a scene and playlist and drives Mixer.tick() from a virtual clock as
+fast as the CPU allows: no tick scheduler, no Qt event loop and (by default)
+no network output.  Useful for capacity planning and for benchmarking
+presets and transitions without a live rig.
+"""
+
+import argparse
+import logging
+import sys
+
+import numpy as np
+
+from core.frame_recorder import FrameRecorder
+from core.mixer import Mixer
+from lib.buffer_utils import BufferUtils
+from lib.clock import monotonic
+from lib.colors import hls_to_rgb
+from lib.frame_stats import FrameStats
+from lib.playlist import Playlist
+from lib.plugin_loader import PluginLoader
+from lib.scene import Scene
+from lib.settings import Settings
+
+log = logging.getLogger("firemix.render_offline")
+
+
+class NullOutput:
+    """
+    Output that discards every frame
+    """
+
+    def __init__(self):
+        self.frame_stats = None
+
+    def write_buffer(self, buffer, stamp=None, color_space="HLS"):
+        pass
+
+    def close(self):
+        pass
+
+
+class FileOutput:
+    """
+    Output that appends every frame to a file as raw RGB8 (3 bytes per pixel)
+    """
+
+    def __init__(self, filename):
+        self.frame_stats = None
+        self._file = open(filename, "wb")
+        self._rgb8 = None
+
+    def write_buffer(self, buffer, stamp=None, color_space="HLS"):
+        if self._rgb8 is None:
+            self._rgb8 = np.zeros(buffer.shape, dtype=np.uint8)
+        rgb = hls_to_rgb(buffer) if color_space == "HLS" else buffer.copy()
+        np.multiply(rgb, 255, rgb)
+        np.clip(rgb, 0, 255, rgb)
+        self._rgb8[:] = rgb
+        self._file.write(self._rgb8.tostring())
+
+    def close(self):
+        self._file.close()
+
+
+class OfflineApp:
+    """
+    Stands in for FireMixApp: owns the settings, scene, plugins, mixer and
+    playlist, but doesn't run a Qt thread or start the tick scheduler.
+    """
+    playlist_changed = None
+
+    def __init__(self, args, net):
+        self._running = True
+        self.args = args
+        self.settings = Settings()
+        self.net = net
+        BufferUtils.set_app(self)
+        self.scene = Scene(self)
+        self.plugins = PluginLoader()
+        self.mixer = Mixer(self)
+        self.playlist = Playlist(self)
+
+        self.scene.warmup()
+
+        self.mixer.set_playlist(self.playlist)
+
+        if self.args.preset:
+            log.info("Setting constant preset %s" % args.preset)
+            self.mixer.set_constant_preset(args.preset)
+        else:
+            self.mixer.pause(False)
+
+    def stop(self):
+        self._running = False
+        self.mixer.stop()
+        # Stop watching the presets directory so the process can exit cleanly.
+        self.playlist.stop()
+
+
+class OfflineRenderer:
+    """
+    Renders frames from a mixer on a virtual clock.  The cost of each frame
+    outside of transitions is accounted to the preset that was playing, and
+    during a transition, the time the mixer spent blending (its "transition"
+    stage) is accounted to the transition.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._mixer = app.mixer
+        self.preset_stats = FrameStats()
+        self.transition_stats = FrameStats()
+        self.num_frames = 0
+        self.wall_time = 0.0
+
+    def render(self, num_frames):
+        """
+        Renders num_frames frames and returns the results dictionary
+        """
+        mixer = self._mixer
+        stats = mixer.frame_stats
+        dt = 1.0 / mixer.get_tick_rate()
+
+        start = monotonic()
+        for i in xrange(num_frames):
+            in_transition = mixer._in_transition
+            transition = mixer._transition
+            active_preset = mixer.playlist.get_active_preset()
+            blends = stats.count("transition")
+
+            frame_start = monotonic()
+            mixer.on_tick_timer(force_tick=True, dt=dt)
+            cost = monotonic() - frame_start
+
+            if in_transition and transition is not None:
+                if stats.count("transition") > blends:
+                    self.transition_stats.record(str(transition), stats.latest("transition"))
+            elif active_preset is not None:
+                self.preset_stats.record(active_preset.name(), cost)
+
+        self.wall_time += monotonic() - start
+        self.num_frames += num_frames
+
+        return self.results()
+
+    def results(self):
+        fps = self.num_frames / self.wall_time if self.wall_time > 0 else 0.0
+        tick_rate = self._mixer.get_tick_rate()
+        return {"frames": self.num_frames,
+                "wall-time": self.wall_time,
+                "fps": fps,
+                "realtime-factor": fps / tick_rate,
+                "pixels": BufferUtils.get_buffer_size(),
+                "presets": self.preset_stats.get_stats(),
+                "transitions": self.transition_stats.get_stats(),
+                "stages": self._mixer.get_frame_stats()}
+
+    def print_report(self):
+        r = self.results()
+        print "%d frames (%d pixels) in %0.2f seconds: %0.1f FPS sustained, %0.1fx realtime" % (
+            r["frames"], r["pixels"], r["wall-time"], r["fps"], r["realtime-factor"])
+        print "------ PRESET COST (ms/frame) ------"
+        print self.preset_stats.format_table()
+        print "------ TRANSITION BLEND COST (ms/frame) ------"
+        print self.transition_stats.format_table()
+        print "------ FRAME STAGE TIMES (ms) ------"
+        print self._mixer.frame_stats.format_table()
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+
+    parser = argparse.ArgumentParser(description="Render a FireMix playlist offline, as fast as possible")
+    parser.add_argument("scene", type=str, help="Name of the scene to load (a file in data/scenes, without .json)")
+    parser.add_argument("--playlist", type=str, help="Playlist file to load", default=None)
+    parser.add_argument("--preset", type=str, help="Specify a preset name to render only that preset")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Seconds of show time to render (default: one pass through the playlist)")
+    parser.add_argument("--frames", type=int, default=None, help="Number of frames to render (overrides --duration)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Write frames to this file as raw RGB8 (default: discard)")
+    parser.add_argument("--record", type=str, default=None,
+                        help="Record mixed frames to this file, for replay with firemix.py --replay")
+    parser.add_argument("--profile", action='store_const', const=True, default=False, help="Enable profiling")
+    parser.add_argument("--verbose", action='store_const', const=True, default=False, help="Enable verbose log output")
+    args = parser.parse_args()
+    args.yappi = False
+    args.noaudio = True
+
+    if args.verbose:
+        logging.getLogger("firemix").setLevel(logging.DEBUG)
+
+    if args.output:
+        net = FileOutput(args.output)
+    else:
+        net = NullOutput()
+
+    app = OfflineApp(args, net)
+    mixer = app.mixer
+
+    if args.frames is not None:
+        num_frames = args.frames
+    else:
+        duration = args.duration
+        if duration is None:
+            duration = max(1, len(app.playlist)) * (mixer.get_preset_duration() + mixer.get_transition_duration())
+        num_frames = int(duration * mixer.get_tick_rate())
+
+    if args.record:
+        mixer.set_recorder(FrameRecorder(args.record, app.scene, BufferUtils.get_buffer_size(),
+                                         mixer.get_tick_rate(), num_frames))
+
+    renderer = OfflineRenderer(app)
+    renderer.render(num_frames)
+    app.stop()
+    net.close()
+    renderer.print_report()
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
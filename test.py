@@ -1,13 +1,39 @@
 import unittest
 
+import core.color_correction
+import core.color_space
+import core.delta_filter
+import core.dither
+import core.dmx
+import core.frame_recorder
+import core.governor
 import core.mixer
 import core.networking
+import core.post_process
+import core.sanitizer
 
 import lib.preset
 import lib.basic_tickers
 import lib.color_fade
+import lib.color_kernels
+import lib.color_lut
+import lib.raw_preset
 
 
 if __name__ == "__main__":
-    suite = unittest.TestLoader().loadTestsFromModule(lib.color_fade)
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite([loader.loadTestsFromModule(lib.color_fade),
+                                loader.loadTestsFromModule(lib.color_kernels),
+                                loader.loadTestsFromModule(lib.color_lut),
+                                loader.loadTestsFromModule(lib.raw_preset),
+                                loader.loadTestsFromModule(core.color_correction),
+                                loader.loadTestsFromModule(core.color_space),
+                                loader.loadTestsFromModule(core.delta_filter),
+                                loader.loadTestsFromModule(core.dither),
+                                loader.loadTestsFromModule(core.dmx),
+                                loader.loadTestsFromModule(core.frame_recorder),
+                                loader.loadTestsFromModule(core.governor),
+                                loader.loadTestsFromModule(core.mixer),
+                                loader.loadTestsFromModule(core.post_process),
+                                loader.loadTestsFromModule(core.sanitizer)])
     unittest.TextTestRunner(verbosity=2).run(suite)
\ No newline at end of file
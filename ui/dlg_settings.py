@@ -20,9 +20,6 @@ from PySide import QtCore, QtGui
 from ui.ui_dlg_settings import Ui_DlgSettings
 from lib import color_modes
 
-# TODO: This is a hack
-PROTOCOLS = ["Legacy", "ZMQ", "OPC"]
-
 
 class DlgSettings(QtGui.QDialog, Ui_DlgSettings):
 
@@ -31,6 +28,7 @@ class DlgSettings(QtGui.QDialog, Ui_DlgSettings):
         self.playlist = parent._app.playlist
         self.setupUi(self)
         self.app = parent._app
+        self.protocols = self.app.net.get_protocols()
 
         # Setup tree view
         self.tree_settings.itemClicked.connect(self.on_tree_changed)
@@ -102,13 +100,18 @@ class DlgSettings(QtGui.QDialog, Ui_DlgSettings):
 
     def accept_networking(self):
         clients = []
+        old_clients = self.app.settings['networking']['clients']
         for i in range(self.tbl_networking_clients.rowCount()):
             host = self.tbl_networking_clients.item(i, 0).text()
             port = int(self.tbl_networking_clients.item(i, 1).text())
             enabled = (self.tbl_networking_clients.cellWidget(i, 2).checkState() == QtCore.Qt.Checked)
             color_mode = self.tbl_networking_clients.cellWidget(i, 3).currentText()
             proto = self.tbl_networking_clients.cellWidget(i, 4).currentText()
-            client = {"host": host, "port": port, "enabled": enabled, "color-mode": color_mode, "protocol": proto}
+            # Keep settings the table doesn't show (e.g. DMX universes) from the client
+            # the row was populated from; rows shift when one above them is deleted.
+            index = self.tbl_networking_clients.item(i, 0).data(QtCore.Qt.UserRole)
+            client = dict(old_clients[index]) if index is not None else {}
+            client.update({"host": host, "port": port, "enabled": enabled, "color-mode": color_mode, "protocol": proto})
             if client not in clients:
                 clients.append(client)
         self.app.settings['networking']['clients'] = clients
@@ -132,6 +135,7 @@ class DlgSettings(QtGui.QDialog, Ui_DlgSettings):
         self.tbl_networking_clients.setRowCount(len(clients))
         for i, client in enumerate(clients):
             item_host = QtGui.QTableWidgetItem(client["host"])
+            item_host.setData(QtCore.Qt.UserRole, i)
             item_port = QtGui.QTableWidgetItem(str(client["port"]))
             item_enabled = QtGui.QCheckBox()
 
@@ -144,11 +148,7 @@ class DlgSettings(QtGui.QDialog, Ui_DlgSettings):
             if client["enabled"]:
                 item_enabled.setCheckState(QtCore.Qt.Checked)
 
-            item_protocol = QtGui.QComboBox()
-            for proto in PROTOCOLS:
-                item_protocol.addItem(proto)
-
-            item_protocol.setCurrentIndex(PROTOCOLS.index(client["protocol"]))
+            item_protocol = self.create_protocol_combo_box(client.get("protocol", "Legacy"))
 
             self.tbl_networking_clients.setItem(i, 0, item_host)
             self.tbl_networking_clients.setItem(i, 1, item_port)
@@ -167,12 +167,23 @@ class DlgSettings(QtGui.QDialog, Ui_DlgSettings):
         for mode in color_modes.modes:
             item_color_mode.addItem(mode)
 
-        item_protocol = QtGui.QComboBox()
-        for proto in PROTOCOLS:
-            item_protocol.addItem(proto)
+        item_protocol = self.create_protocol_combo_box("Legacy")
         self.tbl_networking_clients.setCellWidget(row, 3, item_color_mode)
         self.tbl_networking_clients.setCellWidget(row, 4, item_protocol)
 
+    def create_protocol_combo_box(self, protocol):
+        """
+        Returns a combo box of the output driver protocols with protocol selected.  A protocol
+        without a loaded driver is kept as an entry, so accepting the dialog doesn't change it.
+        """
+        item_protocol = QtGui.QComboBox()
+        for proto in self.protocols:
+            item_protocol.addItem(proto)
+        if protocol not in self.protocols:
+            item_protocol.addItem(protocol)
+        item_protocol.setCurrentIndex(item_protocol.findText(protocol))
+        return item_protocol
+
     def del_networking_client_row(self):
         self.tbl_networking_clients.removeRow(self.tbl_networking_clients.currentRow())
 